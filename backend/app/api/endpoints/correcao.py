@@ -1,16 +1,23 @@
 """
 Endpoints para correção de redações
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
-from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
+import json
 import secrets
 from loguru import logger
 
-from app.models.schemas.redacao import RedacaoInput
+from celery.result import AsyncResult
+
+from app.models.schemas.redacao import RedacaoInput, CorrecaoJobInput, CorrecaoLoteInput
 from app.models.schemas.correcao import (
+    Correcao,
     CorrecaoResponse,
+    JobResponse,
     CompararRequest,
     CompararResponse,
     Comparacao,
@@ -18,8 +25,14 @@ from app.models.schemas.correcao import (
 )
 from app.models.schemas.feedback import FeedbackHumano, FeedbackResponse
 from app.services.corrector import get_corrector
+from app.services.inference_executor import FilaInferenciaCheiaError
 from app.services.pdf_service import get_pdf_service
-from app.db.supabase_client import SupabaseClient
+from app.utils.arquivos_lote import ler_arquivo_redacoes, LoteGrandeDemaisError
+from app.utils.webhook import validar_url_webhook
+from app.db.supabase_client import supabase_client
+from app.core.config import settings
+from workers.celery_app import celery_app
+from workers.tasks import corrigir_redacao as tarefa_corrigir_redacao
 
 router = APIRouter()
 
@@ -64,6 +77,13 @@ async def corrigir_redacao(redacao: RedacaoInput):
             correcao=correcao
         )
 
+    except FilaInferenciaCheiaError as e:
+        logger.warning(f"Correção recusada: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado corrigindo outras redações. Tente novamente em instantes.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error(f"Erro ao corrigir redação: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -72,6 +92,379 @@ async def corrigir_redacao(redacao: RedacaoInput):
         )
 
 
+def _formatar_sse(evento: str, dados: dict) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {evento}\ndata: {json.dumps(dados, default=str, ensure_ascii=False)}\n\n"
+
+
+@router.post(
+    "/corrigir/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Corrigir redação (streaming)",
+    description="Corrige uma redação enviando o resultado de cada etapa via Server-Sent Events"
+)
+async def corrigir_redacao_stream(redacao: RedacaoInput):
+    """
+    Corrige uma redação emitindo cada etapa assim que fica pronta
+    (text/event-stream), na ordem:
+
+    - **notas**: competências, score total e confiança
+    - **estrutura**: análise de estrutura, coesão e coerência
+    - **gramatica**: erros gramaticais e ortográficos
+    - **feedback**: feedback por competência e geral
+    - **explicacao**: trechos mais relevantes para a nota
+    - **concluido**: IDs da correção e da redação salvas
+
+    Em caso de falha no meio do processamento é emitido um evento **erro**.
+    """
+    logger.info(f"Nova requisição de correção (streaming) - Tamanho: {len(redacao.texto)} chars")
+
+    corrector = get_corrector()
+
+    # Recusar antes de abrir o stream, para responder com 503
+    try:
+        corrector.executor.verificar_capacidade()
+    except FilaInferenciaCheiaError as e:
+        logger.warning(f"Correção recusada: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado corrigindo outras redações. Tente novamente em instantes.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    async def eventos():
+        try:
+            async for evento, dados in corrector.corrigir_stream(
+                texto=redacao.texto,
+                titulo=redacao.titulo,
+                prompt_id=redacao.prompt_id,
+                usuario_id=redacao.usuario_id
+            ):
+                yield _formatar_sse(evento, dados)
+        except FilaInferenciaCheiaError as e:
+            logger.warning(f"Correção recusada: {str(e)}")
+            yield _formatar_sse("erro", {
+                "detail": "Servidor ocupado corrigindo outras redações. Tente novamente em instantes.",
+                "retry_after": e.retry_after
+            })
+        except Exception as e:
+            logger.error(f"Erro ao corrigir redação (streaming): {str(e)}", exc_info=True)
+            yield _formatar_sse("erro", {"detail": f"Erro ao processar correção: {str(e)}"})
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+def _formatar_ndjson(dados: dict) -> str:
+    """Formata uma linha NDJSON"""
+    return json.dumps(dados, default=str, ensure_ascii=False) + "\n"
+
+
+def _verificar_tamanho_lote(quantidade: int):
+    """Recusa lotes vazios ou acima de BULK_MAX_ITEMS"""
+    if quantidade == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nenhuma redação encontrada no lote"
+        )
+    if quantidade > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Máximo de {settings.BULK_MAX_ITEMS} redações por lote ({quantidade} enviadas)"
+        )
+
+
+def _resposta_lote(
+    redacoes: List[Dict[str, Any]],
+    indices: List[int],
+    invalidas: List[Dict[str, Any]]
+) -> StreamingResponse:
+    """
+    Stream NDJSON da correção em lote: uma linha por redação, na ordem em
+    que ficam prontas, e uma linha final com o resumo
+
+    Args:
+        redacoes: Redações válidas a corrigir
+        indices: Posição de cada redação válida no lote enviado
+        invalidas: Linhas de erro das redações que não passaram na validação
+    """
+    corrector = get_corrector()
+
+    # Recusar antes de abrir o stream, para responder com 503
+    try:
+        corrector.executor.verificar_capacidade()
+    except FilaInferenciaCheiaError as e:
+        logger.warning(f"Correção em lote recusada: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado corrigindo outras redações. Tente novamente em instantes.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    total = len(redacoes) + len(invalidas)
+
+    async def linhas():
+        sucessos = 0
+        pendentes = set(range(len(redacoes)))
+
+        for item in invalidas:
+            yield _formatar_ndjson(item)
+
+        try:
+            async for item in corrector.corrigir_lote(redacoes):
+                pendentes.discard(item["indice"])
+                sucessos += item["sucesso"]
+                item["indice"] = indices[item["indice"]]
+                yield _formatar_ndjson(item)
+        except Exception as e:
+            logger.error(f"Erro na correção em lote: {str(e)}", exc_info=True)
+            for i in sorted(pendentes):
+                yield _formatar_ndjson({
+                    "indice": indices[i],
+                    "sucesso": False,
+                    "erro": f"Erro ao processar correção: {str(e)}"
+                })
+
+        yield _formatar_ndjson({
+            "resumo": {"total": total, "sucesso": sucessos, "falhas": total - sucessos}
+        })
+
+    return StreamingResponse(
+        linhas(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post(
+    "/corrigir/lote",
+    status_code=status.HTTP_200_OK,
+    summary="Corrigir redações em lote",
+    description="Corrige várias redações de uma vez, enviando o resultado de cada uma em NDJSON"
+)
+async def corrigir_lote(lote: CorrecaoLoteInput):
+    """
+    Corrige até BULK_MAX_ITEMS redações (ex: uma turma inteira)
+
+    - **redacoes**: lista de redações no formato de /corrigir
+
+    Resposta application/x-ndjson, uma linha por redação:
+    - `{"indice": 0, "sucesso": true, "correcao": {...}}`
+    - `{"indice": 1, "sucesso": false, "erro": "..."}`
+
+    e uma última linha `{"resumo": {"total", "sucesso", "falhas"}}`.
+    Falhas de uma redação não interrompem as demais.
+    """
+    _verificar_tamanho_lote(len(lote.redacoes))
+    logger.info(f"Nova requisição de correção em lote - {len(lote.redacoes)} redações")
+
+    return _resposta_lote(
+        [r.dict() for r in lote.redacoes],
+        list(range(len(lote.redacoes))),
+        []
+    )
+
+
+@router.post(
+    "/corrigir/lote/arquivo",
+    status_code=status.HTTP_200_OK,
+    summary="Corrigir redações de um arquivo CSV ou ZIP",
+    description="Corrige as redações de um CSV ou de um ZIP de .txt, enviando o resultado de cada uma em NDJSON"
+)
+async def corrigir_lote_arquivo(
+    arquivo: UploadFile = File(..., description="CSV com a coluna texto, ou ZIP com um .txt por redação"),
+    prompt_id: Optional[int] = Form(None, description="Tema aplicado às redações sem prompt_id"),
+    usuario_id: Optional[str] = Form(None, description="Usuário aplicado às redações sem usuario_id")
+):
+    """
+    Corrige as redações de um arquivo
+
+    - **CSV**: coluna `texto` e, opcionalmente, `titulo`, `prompt_id`, `usuario_id`
+    - **ZIP**: um `.txt` por redação (o nome do arquivo vira o título)
+
+    O índice de cada linha da resposta é a posição da redação no arquivo
+    (linha do CSV sem o cabeçalho, ou ordem alfabética no ZIP). Redações
+    inválidas (ex: texto curto demais) são reportadas como falha.
+    """
+    limite_bytes = settings.BULK_MAX_UPLOAD_MB * 1024 * 1024
+    conteudo = await arquivo.read(limite_bytes + 1)
+
+    if len(conteudo) > limite_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Arquivo maior que {settings.BULK_MAX_UPLOAD_MB} MB"
+        )
+
+    # Descompactação e parsing são CPU-bound: fora do event loop
+    try:
+        brutas = await run_in_threadpool(ler_arquivo_redacoes, arquivo.filename, conteudo)
+    except LoteGrandeDemaisError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    _verificar_tamanho_lote(len(brutas))
+    logger.info(f"Nova requisição de correção em lote ({arquivo.filename}) - {len(brutas)} redações")
+
+    redacoes: List[Dict[str, Any]] = []
+    indices: List[int] = []
+    invalidas: List[Dict[str, Any]] = []
+
+    for i, bruta in enumerate(brutas):
+        bruta["prompt_id"] = bruta["prompt_id"] or prompt_id
+        bruta["usuario_id"] = bruta["usuario_id"] or usuario_id
+        try:
+            redacoes.append(RedacaoInput(**bruta).dict())
+            indices.append(i)
+        except ValidationError as e:
+            erros = "; ".join(
+                f"{'.'.join(str(c) for c in erro['loc'])}: {erro['msg']}"
+                for erro in e.errors()
+            )
+            invalidas.append({"indice": i, "sucesso": False, "erro": erros})
+
+    return _resposta_lote(redacoes, indices, invalidas)
+
+
+# Estados do Celery -> status do job
+ESTADOS_JOB = {
+    "PENDING": "na_fila",
+    "RECEIVED": "na_fila",
+    "RETRY": "na_fila",
+    "STARTED": "processando",
+    "SUCCESS": "concluido",
+    "FAILURE": "falhou",
+    "REVOKED": "cancelado"
+}
+
+
+def _job_response(job_id: str, estado: str, erro: Optional[str] = None) -> JobResponse:
+    status_job = ESTADOS_JOB.get(estado, "na_fila")
+    base = f"{settings.API_V1_PREFIX}/correcao/jobs/{job_id}"
+    return JobResponse(
+        success=True,
+        job_id=job_id,
+        status=status_job,
+        status_url=base,
+        resultado_url=f"{base}/resultado" if status_job == "concluido" else None,
+        erro=erro
+    )
+
+
+@router.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Enviar redação para a fila de correção",
+    description="Enfileira a correção nos workers de inferência e retorna o ID do job imediatamente"
+)
+async def criar_job_correcao(job: CorrecaoJobInput):
+    """
+    Enfileira uma correção para processamento assíncrono
+
+    - **texto**, **titulo**, **prompt_id**, **usuario_id**: como em /corrigir
+    - **webhook_url**: URL que recebe um POST com o status ao concluir (opcional)
+
+    Acompanhe por GET /jobs/{job_id} e busque a correção em
+    GET /jobs/{job_id}/resultado.
+    """
+    webhook_url = str(job.webhook_url) if job.webhook_url else None
+
+    if webhook_url:
+        # Resolve o host (bloqueante) fora do event loop
+        try:
+            await run_in_threadpool(validar_url_webhook, webhook_url)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+    try:
+        tarefa = tarefa_corrigir_redacao.apply_async(kwargs={
+            "redacao": job.dict(exclude={"webhook_url"}),
+            "webhook_url": webhook_url
+        })
+
+        logger.info(f"Job de correção enfileirado: {tarefa.id}")
+        return _job_response(tarefa.id, "PENDING")
+
+    except Exception as e:
+        logger.error(f"Erro ao enfileirar correção: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Fila de correção indisponível: {str(e)}"
+        )
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Status do job de correção",
+    description="Retorna o status de uma correção enfileirada"
+)
+async def status_job_correcao(job_id: str):
+    """
+    Status de um job de correção
+
+    - **job_id**: ID retornado por POST /jobs
+
+    IDs desconhecidos (ou com resultado expirado) aparecem como na_fila.
+    """
+    resultado = AsyncResult(job_id, app=celery_app)
+    erro = str(resultado.result) if resultado.state == "FAILURE" else None
+    return _job_response(job_id, resultado.state, erro)
+
+
+@router.get(
+    "/jobs/{job_id}/resultado",
+    response_model=CorrecaoResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Resultado do job de correção",
+    description="Retorna a correção de um job concluído"
+)
+async def resultado_job_correcao(job_id: str):
+    """
+    Correção completa de um job concluído
+
+    - **job_id**: ID retornado por POST /jobs
+
+    Retorna 409 enquanto o job não terminou.
+    """
+    resultado = AsyncResult(job_id, app=celery_app)
+
+    if resultado.state == "FAILURE":
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao processar correção: {resultado.result}"
+        )
+
+    if resultado.state != "SUCCESS":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job {job_id} ainda não concluído ({ESTADOS_JOB.get(resultado.state, 'na_fila')})"
+        )
+
+    return CorrecaoResponse(
+        success=True,
+        message="Redação corrigida com sucesso",
+        correcao=Correcao(**resultado.result)
+    )
+
+
 @router.get(
     "/correcao/{correcao_id}",
     status_code=status.HTTP_200_OK,
@@ -200,8 +593,7 @@ async def comparar_correcoes(request: CompararRequest):
             )
 
         # Buscar correções do banco
-        db = SupabaseClient()
-        correcoes_raw = await db.buscar_multiplas_correcoes(request.correcao_ids)
+        correcoes_raw = await supabase_client.buscar_multiplas_correcoes(request.correcao_ids)
 
         if len(correcoes_raw) != len(request.correcao_ids):
             raise HTTPException(
@@ -321,8 +713,7 @@ async def exportar_pdf(correcao_id: str):
     """
     try:
         # Buscar correção completa com redação
-        db = SupabaseClient()
-        correcao = await db.buscar_multiplas_correcoes([correcao_id])
+        correcao = await supabase_client.buscar_multiplas_correcoes([correcao_id])
 
         if not correcao or len(correcao) == 0:
             raise HTTPException(
@@ -396,8 +787,7 @@ async def criar_compartilhamento(
             )
 
         # Verificar se correção existe
-        db = SupabaseClient()
-        correcao = await db.buscar_correcao(correcao_id)
+        correcao = await supabase_client.buscar_correcao(correcao_id)
         if not correcao:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -411,7 +801,7 @@ async def criar_compartilhamento(
         expira_em = datetime.utcnow() + timedelta(days=dias_expiracao)
 
         # Criar compartilhamento
-        compartilhamento = await db.criar_compartilhamento(
+        compartilhamento = await supabase_client.criar_compartilhamento(
             correcao_id=correcao_id,
             usuario_id=usuario_id,
             token=token,
@@ -456,10 +846,8 @@ async def acessar_compartilhado(token: str):
     Retorna correção completa (incrementa contador de visualizações)
     """
     try:
-        db = SupabaseClient()
-
         # Buscar compartilhamento
-        compartilhamento = await db.buscar_compartilhamento_por_token(token)
+        compartilhamento = await supabase_client.buscar_compartilhamento_por_token(token)
 
         if not compartilhamento:
             raise HTTPException(
@@ -468,7 +856,7 @@ async def acessar_compartilhado(token: str):
             )
 
         # Incrementar visualizações
-        await db.incrementar_visualizacao(token)
+        await supabase_client.incrementar_visualizacao(token)
 
         # Extrair dados da correção
         correcao = compartilhamento.get('correcoes', {})
@@ -510,9 +898,7 @@ async def revogar_compartilhamento(token: str, usuario_id: Optional[str] = None)
     - **usuario_id**: ID do usuário (validação de permissão)
     """
     try:
-        db = SupabaseClient()
-
-        sucesso = await db.desativar_compartilhamento(token, usuario_id)
+        sucesso = await supabase_client.desativar_compartilhamento(token, usuario_id)
 
         if not sucesso:
             raise HTTPException(
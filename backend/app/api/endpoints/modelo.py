@@ -7,6 +7,8 @@ from loguru import logger
 
 from app.models.schemas.modelo import ModeloInfo, HealthCheck
 from app.ml.predictor import get_predictor
+from app.services.inference_executor import get_inference_executor
+from app.services.languagetool_pool import languagetool_pool_iniciado
 from app.core.config import settings
 from app.db.supabase_client import supabase_client
 
@@ -88,6 +90,42 @@ async def get_model_metrics():
         )
 
 
+@router.get(
+    "/inferencia",
+    summary="Estatísticas de inferência",
+    description="Retorna estatísticas do pool de inferência, do micro-batching (latência p50/p99), do cache e do LanguageTool"
+)
+async def get_inference_stats():
+    """
+    Retorna estatísticas de inferência:
+    - Ocupação do pool de inferência (pendentes, recusadas)
+    - Tamanho médio dos lotes agrupados
+    - Tempo de espera na fila (p50/p99)
+    - Latência total por requisição (p50/p99)
+    - Hits/misses do cache de predições, de análise linguística e de
+      erros gramaticais por parágrafo
+    - Instâncias do pool de LanguageTool (disponíveis, falhas, reinícios)
+    """
+    try:
+        predictor = get_predictor()
+        stats = predictor.get_inference_stats()
+        stats["executor"] = get_inference_executor().get_stats()
+        pool = languagetool_pool_iniciado()
+        stats["languagetool"] = pool.get_stats() if pool else None
+
+        return {
+            "success": True,
+            "inferencia": stats
+        }
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar estatísticas de inferência: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
 @router.get(
     "/health",
     response_model=HealthCheck,
@@ -101,23 +139,20 @@ async def health_check():
     - Status do modelo ML
     - Status do banco de dados
     - Status do Redis
+    - Status do LanguageTool
     """
     services_status = {
         "database": False,
         "redis": False,
-        "ml_model": False
+        "ml_model": False,
+        "languagetool": False
     }
 
     overall_status = "unhealthy"
 
     try:
         # Testar banco de dados
-        try:
-            # Fazer query simples
-            result = supabase_client.client.table("redacoes").select("count").limit(1).execute()
-            services_status["database"] = True
-        except:
-            services_status["database"] = False
+        services_status["database"] = await supabase_client.ping()
 
         # Testar modelo ML
         try:
@@ -127,6 +162,15 @@ async def health_check():
         except:
             services_status["ml_model"] = False
 
+        # Testar LanguageTool (ao menos uma instância do pool no ar). Só
+        # lê o pool iniciado no startup: criá-lo aqui subiria os servidores
+        # Java dentro do event loop
+        try:
+            pool = languagetool_pool_iniciado()
+            services_status["languagetool"] = pool is not None and pool.disponiveis > 0
+        except:
+            services_status["languagetool"] = False
+
         # Testar Redis (TODO: implementar quando configurar)
         services_status["redis"] = True  # Por enquanto assume que está ok
 
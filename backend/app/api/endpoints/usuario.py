@@ -1,8 +1,9 @@
 """
 Endpoints para gerenciamento de usuário
 """
+import asyncio
 from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from loguru import logger
 
 from app.models.schemas.usuario import Usuario
@@ -21,40 +22,46 @@ router = APIRouter()
 async def listar_correcoes_usuario(
     current_user: Usuario = Depends(get_current_active_user),
     limit: int = Query(10, ge=1, le=100, description="Número de resultados por página"),
-    offset: int = Query(0, ge=0, description="Offset para paginação"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
     ordem: str = Query("desc", regex="^(asc|desc)$", description="Ordem: asc ou desc")
 ):
     """
     Lista todas as correções do usuário autenticado
 
     - **limit**: Número de resultados (1-100)
-    - **offset**: Posição inicial para paginação
-    - **ordem**: Ordem cronológica (asc/desc)
+    - **cursor**: `pagination.next_cursor` da página anterior (omitir na primeira)
+    - **ordem**: Ordem cronológica (asc/desc); manter a mesma ao usar o cursor
 
     Requer autenticação
     """
     try:
-        correcoes = await supabase_client.buscar_correcoes_usuario(
-            usuario_id=current_user.id,
-            limit=limit,
-            offset=offset,
-            ordem=ordem
+        # Página e total (linha de estatísticas) em paralelo
+        (correcoes, proximo_cursor), total = await asyncio.gather(
+            supabase_client.buscar_correcoes_usuario(
+                usuario_id=current_user.id,
+                limit=limit,
+                cursor=cursor,
+                ordem=ordem
+            ),
+            supabase_client.contar_correcoes_usuario(current_user.id)
         )
 
-        # Contar total para paginação
-        total = await supabase_client.contar_correcoes_usuario(current_user.id)
-
         return {
             "success": True,
             "correcoes": correcoes,
             "pagination": {
                 "total": total,
                 "limit": limit,
-                "offset": offset,
-                "has_more": (offset + limit) < total
+                "next_cursor": proximo_cursor,
+                "has_more": proximo_cursor is not None
             }
         }
 
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Erro ao listar correções do usuário: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -63,6 +70,52 @@ async def listar_correcoes_usuario(
         )
 
 
+def _formatar_estatisticas(agregados: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Monta as estatísticas a partir da linha de estatisticas_usuario
+
+    Args:
+        agregados: Linha do usuário, ou None se ainda não há correções
+    """
+    if not agregados or not agregados["total_redacoes"]:
+        return {
+            "total_redacoes": 0,
+            "media_geral": 0,
+            "melhor_nota": 0,
+            "pior_nota": 0,
+            "medias_competencias": {
+                "c1": 0, "c2": 0, "c3": 0, "c4": 0, "c5": 0
+            },
+            "evolucao": [],
+            "distribuicao_notas": {
+                "0-200": 0, "200-400": 0, "400-600": 0,
+                "600-800": 0, "800-1000": 0
+            }
+        }
+
+    total_redacoes = agregados["total_redacoes"]
+
+    return {
+        "total_redacoes": total_redacoes,
+        "media_geral": round(agregados["soma_notas"] / total_redacoes, 1),
+        "melhor_nota": agregados["melhor_nota"],
+        "pior_nota": agregados["pior_nota"],
+        "medias_competencias": {
+            f"c{i}": round(agregados[f"soma_c{i}"] / total_redacoes, 1)
+            for i in range(1, 6)
+        },
+        # Últimas 10 correções, da mais antiga para a mais recente
+        "evolucao": agregados["ultimas_notas"],
+        "distribuicao_notas": {
+            "0-200": agregados["faixa_0_200"],
+            "200-400": agregados["faixa_200_400"],
+            "400-600": agregados["faixa_400_600"],
+            "600-800": agregados["faixa_600_800"],
+            "800-1000": agregados["faixa_800_1000"]
+        }
+    }
+
+
 @router.get(
     "/estatisticas",
     status_code=status.HTTP_200_OK,
@@ -80,75 +133,15 @@ async def obter_estatisticas_usuario(
     - Evolução temporal
     - Distribuição de notas
 
+    Lidas de estatisticas_usuario (uma linha, mantida por trigger).
     Requer autenticação
     """
     try:
-        # Buscar todas as correções do usuário
-        correcoes = await supabase_client.buscar_todas_correcoes_usuario(current_user.id)
-
-        if not correcoes:
-            return {
-                "success": True,
-                "estatisticas": {
-                    "total_redacoes": 0,
-                    "media_geral": 0,
-                    "melhor_nota": 0,
-                    "pior_nota": 0,
-                    "medias_competencias": {
-                        "c1": 0, "c2": 0, "c3": 0, "c4": 0, "c5": 0
-                    },
-                    "evolucao": [],
-                    "distribuicao_notas": {
-                        "0-200": 0, "200-400": 0, "400-600": 0,
-                        "600-800": 0, "800-1000": 0
-                    }
-                }
-            }
-
-        # Calcular estatísticas
-        total_redacoes = len(correcoes)
-        notas = [c["score_total"] for c in correcoes]
-        media_geral = sum(notas) / total_redacoes
-
-        # Médias por competência
-        medias_comp = {
-            "c1": sum(c["c1"] for c in correcoes) / total_redacoes,
-            "c2": sum(c["c2"] for c in correcoes) / total_redacoes,
-            "c3": sum(c["c3"] for c in correcoes) / total_redacoes,
-            "c4": sum(c["c4"] for c in correcoes) / total_redacoes,
-            "c5": sum(c["c5"] for c in correcoes) / total_redacoes,
-        }
-
-        # Evolução temporal (últimas 10 correções)
-        evolucao = [
-            {
-                "data": c["created_at"],
-                "nota": c["score_total"],
-                "redacao_id": c["redacao_id"]
-            }
-            for c in sorted(correcoes, key=lambda x: x["created_at"])[-10:]
-        ]
-
-        # Distribuição de notas
-        distribuicao = {
-            "0-200": len([n for n in notas if 0 <= n < 200]),
-            "200-400": len([n for n in notas if 200 <= n < 400]),
-            "400-600": len([n for n in notas if 400 <= n < 600]),
-            "600-800": len([n for n in notas if 600 <= n < 800]),
-            "800-1000": len([n for n in notas if 800 <= n <= 1000]),
-        }
+        agregados = await supabase_client.buscar_estatisticas_usuario(current_user.id)
 
         return {
             "success": True,
-            "estatisticas": {
-                "total_redacoes": total_redacoes,
-                "media_geral": round(media_geral, 1),
-                "melhor_nota": max(notas),
-                "pior_nota": min(notas),
-                "medias_competencias": {k: round(v, 1) for k, v in medias_comp.items()},
-                "evolucao": evolucao,
-                "distribuicao_notas": distribuicao
-            }
+            "estatisticas": _formatar_estatisticas(agregados)
         }
 
     except Exception as e:
@@ -187,10 +180,7 @@ async def deletar_correcao(
                 detail="Correção não encontrada"
             )
 
-        # Buscar redação para verificar se é do usuário
-        redacao = await supabase_client.buscar_redacao(correcao["redacao_id"])
-
-        if not redacao or redacao.get("usuario_id") != current_user.id:
+        if correcao.get("usuario_id") != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Você não tem permissão para deletar esta correção"
@@ -240,21 +230,20 @@ async def obter_dashboard(
     Requer autenticação
     """
     try:
-        # Buscar estatísticas
-        estatisticas = await obter_estatisticas_usuario(current_user)
-
-        # Buscar últimas 5 correções
-        ultimas = await supabase_client.buscar_correcoes_usuario(
-            usuario_id=current_user.id,
-            limit=5,
-            offset=0,
-            ordem="desc"
+        # Estatísticas (uma linha) e últimas 5 correções, em paralelo
+        agregados, (ultimas, _) = await asyncio.gather(
+            supabase_client.buscar_estatisticas_usuario(current_user.id),
+            supabase_client.buscar_correcoes_usuario(
+                usuario_id=current_user.id,
+                limit=5,
+                ordem="desc"
+            )
         )
 
         return {
             "success": True,
             "dashboard": {
-                "estatisticas": estatisticas["estatisticas"],
+                "estatisticas": _formatar_estatisticas(agregados),
                 "ultimas_correcoes": ultimas
             }
         }
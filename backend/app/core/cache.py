@@ -0,0 +1,218 @@
+"""
+Cache de predições - LRU em memória + Redis opcional
+
+Chaves são endereçadas por conteúdo (hash do texto normalizado e da
+versão do modelo), então uma redação reenviada reaproveita a correção
+anterior sem passar pelo ensemble nem pelo LanguageTool.
+"""
+import copy
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from loguru import logger
+
+from app.core.config import settings
+
+
+def normalizar_texto(texto: str) -> str:
+    """
+    Normaliza o texto para a chave de cache: Unicode NFC, quebras de linha
+    e espaços repetidos colapsados (diferenças que não mudam a predição)
+    """
+    texto = unicodedata.normalize("NFC", texto)
+    texto = texto.replace("\r\n", "\n").replace("\r", "\n")
+    texto = re.sub(r"[ \t]+", " ", texto)
+    texto = re.sub(r"\n\s*\n+", "\n\n", texto)
+    return texto.strip()
+
+
+def gerar_chave(namespace: str, *partes: Any) -> str:
+    """Gera chave sha256 a partir do namespace e das partes"""
+    conteudo = "\x1f".join(str(p) for p in partes)
+    digest = hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class PredictionCache:
+    """
+    Cache em dois níveis:
+    - LRU em memória do processo, um por namespace: as muitas entradas por
+      parágrafo de "gramatica" não expulsam as predições de redações
+      inteiras (CACHE_MAX_ITEMS, CACHE_MAX_ITEMS_ANALISE,
+      CACHE_MAX_ITEMS_GRAMATICA)
+    - Redis (opcional, CACHE_REDIS_ENABLED), compartilhado entre workers
+
+    Valores devem ser serializáveis em JSON.
+    """
+
+    def __init__(
+        self,
+        max_itens: int = settings.CACHE_MAX_ITEMS,
+        usar_redis: bool = settings.CACHE_REDIS_ENABLED,
+        ttl_segundos: int = settings.CACHE_TTL_SECONDS,
+        limites: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            max_itens: Limite do LRU de namespaces sem limite próprio (predicao)
+            usar_redis: Usar o Redis como segundo nível
+            ttl_segundos: TTL das entradas no Redis
+            limites: Limite do LRU por namespace
+        """
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self.limites = limites if limites is not None else {
+            "analise": settings.CACHE_MAX_ITEMS_ANALISE,
+            "gramatica": settings.CACHE_MAX_ITEMS_GRAMATICA
+        }
+
+        self._lrus: Dict[str, "OrderedDict[str, Any]"] = {}
+        self._lock = threading.Lock()
+        self._metricas: Dict[str, Dict[str, int]] = {}
+
+        self._redis = None
+        if usar_redis:
+            self._redis = self._conectar_redis()
+
+        logger.info(
+            f"PredictionCache inicializado - LRU: {max_itens} itens "
+            f"({', '.join(f'{n}: {l}' for n, l in self.limites.items())}), "
+            f"Redis: {'ativo' if self._redis is not None else 'inativo'}"
+        )
+
+    def _conectar_redis(self):
+        """Conecta ao Redis configurado em Settings; None se indisponível"""
+        try:
+            import redis
+
+            cliente = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                password=settings.REDIS_PASSWORD,
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5
+            )
+            cliente.ping()
+            return cliente
+        except Exception as e:
+            logger.warning(f"Redis indisponível para cache, usando apenas LRU: {str(e)}")
+            return None
+
+    @staticmethod
+    def _namespace(chave: str) -> str:
+        return chave.split(":", 1)[0]
+
+    def _lru(self, namespace: str) -> "OrderedDict[str, Any]":
+        """LRU do namespace (chamar com o lock)"""
+        lru = self._lrus.get(namespace)
+        if lru is None:
+            lru = self._lrus[namespace] = OrderedDict()
+        return lru
+
+    def _registrar(self, namespace: str, evento: str):
+        with self._lock:
+            metricas = self._metricas.setdefault(
+                namespace,
+                {"hits_memoria": 0, "hits_redis": 0, "misses": 0}
+            )
+            metricas[evento] += 1
+
+    def get(self, chave: str) -> Optional[Any]:
+        """Busca um valor (cópia) no LRU e depois no Redis"""
+        namespace = self._namespace(chave)
+
+        with self._lock:
+            lru = self._lru(namespace)
+            if chave in lru:
+                lru.move_to_end(chave)
+                valor = lru[chave]
+            else:
+                valor = None
+
+        if valor is not None:
+            self._registrar(namespace, "hits_memoria")
+            return copy.deepcopy(valor)
+
+        if self._redis is not None:
+            try:
+                bruto = self._redis.get(chave)
+                if bruto is not None:
+                    valor = json.loads(bruto)
+                    self._set_memoria(chave, valor)
+                    self._registrar(namespace, "hits_redis")
+                    return copy.deepcopy(valor)
+            except Exception as e:
+                logger.warning(f"Erro ao ler cache no Redis: {str(e)}")
+
+        self._registrar(namespace, "misses")
+        return None
+
+    def set(self, chave: str, valor: Any):
+        """Armazena um valor no LRU e no Redis"""
+        self._set_memoria(chave, copy.deepcopy(valor))
+
+        if self._redis is not None:
+            try:
+                self._redis.set(chave, json.dumps(valor), ex=self.ttl_segundos)
+            except Exception as e:
+                logger.warning(f"Erro ao gravar cache no Redis: {str(e)}")
+
+    def _set_memoria(self, chave: str, valor: Any):
+        namespace = self._namespace(chave)
+        limite = self.limites.get(namespace, self.max_itens)
+
+        with self._lock:
+            lru = self._lru(namespace)
+            lru[chave] = valor
+            lru.move_to_end(chave)
+            while len(lru) > limite:
+                lru.popitem(last=False)
+
+    def invalidar(self, namespace: str):
+        """
+        Remove do LRU as entradas de um namespace
+
+        Entradas no Redis expiram pelo TTL; como a chave inclui a versão
+        do modelo, entradas antigas deixam de ser consultadas.
+        """
+        with self._lock:
+            self._lrus.pop(namespace, None)
+        logger.info(f"Cache invalidado: {namespace}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna hits/misses por namespace e ocupação do LRU"""
+        with self._lock:
+            por_namespace = {}
+            for namespace, metricas in self._metricas.items():
+                total = sum(metricas.values())
+                hits = metricas["hits_memoria"] + metricas["hits_redis"]
+                por_namespace[namespace] = {
+                    **metricas,
+                    "hit_rate": hits / total if total else 0.0,
+                    "itens_memoria": len(self._lrus.get(namespace, ())),
+                    "max_itens": self.limites.get(namespace, self.max_itens)
+                }
+
+            return {
+                "itens_memoria": sum(len(lru) for lru in self._lrus.values()),
+                "max_itens": self.max_itens,
+                "redis": self._redis is not None,
+                "namespaces": por_namespace
+            }
+
+
+# Instância global
+_cache_instance: PredictionCache = None
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Retorna instância global do cache"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = PredictionCache()
+    return _cache_instance
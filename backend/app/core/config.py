@@ -24,6 +24,19 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_KEY: str
     SUPABASE_SERVICE_KEY: str
+    # Cliente PostgREST assíncrono: pool de conexões HTTP/2 com keep-alive;
+    # retries apenas para falhas de conexão (seguro para inserts)
+    SUPABASE_HTTP2: bool = True
+    SUPABASE_TIMEOUT_SECONDS: float = 10.0
+    SUPABASE_MAX_CONNECTIONS: int = 20
+    SUPABASE_MAX_KEEPALIVE: int = 10
+    SUPABASE_KEEPALIVE_SECONDS: float = 30.0
+    SUPABASE_RETRIES: int = 2
+    # Write-behind: correções salvas ao mesmo tempo são gravadas juntas
+    # (uma chamada à RPC salvar_correcoes por grupo)
+    PERSISTENCE_WRITE_BEHIND: bool = False
+    PERSISTENCE_BATCH_MAX_ITEMS: int = 16
+    PERSISTENCE_BATCH_MAX_WAIT_MS: int = 20
 
     # Redis
     REDIS_HOST: str = "localhost"
@@ -34,21 +47,109 @@ class Settings(BaseSettings):
     # Celery
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
+    # Correções assíncronas (POST /correcao/jobs): fila própria, consumida
+    # por workers de inferência escalados separadamente da API
+    CORRECTION_QUEUE: str = "correcoes"
+    CORRECTION_TASK_TIME_LIMIT: int = 600
+    # Reenvios à fila quando o pool de inferência do worker está cheio
+    # (cada um após INFERENCE_RETRY_AFTER_SECONDS); esgotados, o job falha
+    CORRECTION_MAX_QUEUE_RETRIES: int = 20
+    JOB_RESULT_EXPIRES_SECONDS: int = 24 * 3600
+    # Webhooks de conclusão (assinados com HMAC-SHA256 se houver segredo)
+    WEBHOOK_SECRET: Optional[str] = None
+    WEBHOOK_TIMEOUT_SECONDS: int = 10
+    WEBHOOK_MAX_RETRIES: int = 5
+    # Hosts aceitos como webhook, separados por vírgula (subdomínios
+    # incluídos); vazio aceita qualquer host público. Endereços internos
+    # são sempre recusados
+    WEBHOOK_ALLOWED_HOSTS: str = ""
 
     # ML Models
     MODEL_BASE_PATH: str = "./data/models"
+    # Intervalo para detectar uma versão promovida pelo re-treino e
+    # recarregar o predictor (0 = só ao reiniciar)
+    MODEL_RELOAD_CHECK_SECONDS: int = 30
     MODEL_NAME: str = "neuralmind/bert-base-portuguese-cased"
     ENSEMBLE_SIZE: int = 3
+    # independente: N modelos completos | multi_cabeca: 1 BERT + N cabeças
+    # mc_dropout: 1 modelo, N amostras com dropout ativo nas cabeças
+    ENSEMBLE_MODE: str = "independente"
+    ENSEMBLE_FREEZE_BACKBONE: bool = False
     CONFIDENCE_THRESHOLD: float = 0.85
     LOW_CONFIDENCE_THRESHOLD: float = 0.70
 
+    # Inferência (micro-batching)
+    INFERENCE_BATCHING_ENABLED: bool = True
+    INFERENCE_MAX_BATCH_SIZE: int = 8
+    INFERENCE_MAX_WAIT_MS: int = 10
+
+    # Inferência (executor fora do event loop)
+    INFERENCE_WORKERS: int = 8
+    INFERENCE_MAX_QUEUE: int = 32
+    INFERENCE_RETRY_AFTER_SECONDS: int = 5
+
+    # Correção em lote (turmas): redações por requisição, redações por
+    # forward do ensemble / insert no banco, e tamanho máximo do CSV/ZIP
+    BULK_MAX_ITEMS: int = 200
+    BULK_BATCH_SIZE: int = 32
+    BULK_MAX_UPLOAD_MB: int = 10
+
+    # Backend do encoder: pytorch (eager) | onnx (ONNX Runtime em CPU,
+    # requer os .onnx gerados por training/export_onnx.py)
+    INFERENCE_BACKEND: str = "pytorch"
+    ONNX_NUM_THREADS: int = 0  # 0 = padrão do ONNX Runtime
+    # Paridade conferida a cada exportação: diferença absoluta máxima do
+    # grafo fp32 e similaridade de cosseno mínima do int8 contra o eager
+    ONNX_PARITY_TOLERANCE: float = 1e-3
+    ONNX_PARITY_MIN_COSINE_INT8: float = 0.98
+    # Pesos int8 nas camadas Linear (CPU). Avaliar o impacto por
+    # deployment com training/compare_quantization.py
+    INFERENCE_QUANTIZE_INT8: bool = False
+
+    # LanguageTool: pool de servidores locais (um processo Java por
+    # instância, ~1 GB cada, em cada processo da API e worker) ou lista de
+    # URLs de servidores já em execução. Mais de uma instância é opt-in
+    LANGUAGETOOL_POOL_SIZE: int = 1
+    LANGUAGETOOL_SERVERS: str = ""  # ex: http://lt1:8010,http://lt2:8010
+    LANGUAGETOOL_HEALTHCHECK_SECONDS: int = 60  # 0 = sem health check
+
+    # Cache de predições (LRU em memória + Redis opcional)
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ITEMS: int = 1024  # predições (LRU por namespace)
+    CACHE_MAX_ITEMS_ANALISE: int = 1024
+    CACHE_MAX_ITEMS_GRAMATICA: int = 8192  # um item por parágrafo
+    CACHE_REDIS_ENABLED: bool = False
+    CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+
     # Training
     BATCH_SIZE: int = 8
     LEARNING_RATE: float = 2e-5
     MAX_LENGTH: int = 512
+    # truncar: apenas os primeiros MAX_LENGTH tokens | janelas: janelas
+    # sobrepostas de MAX_LENGTH tokens com média do [CLS] de cada janela
+    ENCODING_MODE: str = "truncar"
+    WINDOW_STRIDE: int = 128  # tokens de sobreposição entre janelas
+    MAX_WINDOWS: int = 4
     NUM_EPOCHS: int = 3
+    # Workers do DataLoader de treino (o cache memmap é compartilhado
+    # entre eles); 0 = carregamento no processo principal (Windows)
+    TRAIN_NUM_WORKERS: int = 0
+    # Membros do ensemble independente treinados ao mesmo tempo, cada um
+    # em um processo (<= 1 = sequencial)
+    TRAIN_PARALLEL_PROCESSES: int = 1
+    # Autocast bf16 no encoder (CPUs com AVX512-BF16/AMX ou GPUs Ampere+)
+    TRAIN_BF16: bool = False
+    # Lotes acumulados por passo do otimizador (batch efetivo = BATCH_SIZE x N)
+    TRAIN_GRAD_ACCUM_STEPS: int = 1
+    # Passos do otimizador entre checkpoints retomáveis (0 = só ao fim da época)
+    TRAIN_CHECKPOINT_STEPS: int = 200
     RETRAIN_INTERVAL_HOURS: int = 24
     MIN_SAMPLES_FOR_RETRAIN: int = 50
+    # Re-treino incremental (fine-tuning a partir da versão em produção)
+    RETRAIN_EPOCHS: int = 1
+    RETRAIN_LEARNING_RATE: float = 1e-5
+    RETRAIN_REPLAY_RATIO: float = 2.0  # redações do Essay-BR por amostra nova
+    RETRAIN_HOLDOUT_FRACTION: float = 0.2  # feedback humano reservado para avaliação
 
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -0,0 +1,205 @@
+"""
+Write-behind - Agrupa as correções concorrentes em uma chamada ao banco
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+from loguru import logger
+
+from app.db.supabase_client import supabase_client
+from app.core.config import settings
+
+
+class _Pendente:
+    """Correção aguardando a próxima gravação"""
+
+    def __init__(self, item: Dict[str, Any]):
+        self.item = item
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.chegada = time.perf_counter()
+
+
+class BufferCorrecoes:
+    """
+    Acumula as correções salvas ao mesmo tempo e grava cada grupo com uma
+    única chamada à RPC salvar_correcoes (group commit)
+
+    O grupo é gravado quando atinge max_itens ou quando a correção mais
+    antiga espera max_espera_ms. Quem salva aguarda a gravação do seu
+    grupo, então uma correção devolvida ao cliente já está no banco.
+    Se o grupo falha, os itens são regravados um a um, para que uma
+    correção inválida não derrube as demais.
+
+    Fila e tarefa de gravação são criadas por event loop (o do uvicorn ou
+    o de cada asyncio.run nas tasks do Celery).
+    """
+
+    def __init__(
+        self,
+        max_itens: int = settings.PERSISTENCE_BATCH_MAX_ITEMS,
+        max_espera_ms: int = settings.PERSISTENCE_BATCH_MAX_WAIT_MS
+    ):
+        self.max_itens = max(1, max_itens)
+        self.max_espera = max(0, max_espera_ms) / 1000.0
+
+        self._estados: Dict[asyncio.AbstractEventLoop, Tuple[asyncio.Queue, asyncio.Task]] = {}
+        self._lock = threading.Lock()
+        self._total_itens = 0
+        self._total_gravacoes = 0
+
+        logger.info(
+            f"BufferCorrecoes iniciado - max_itens: {self.max_itens}, "
+            f"max_espera: {max_espera_ms}ms"
+        )
+
+    def _fila(self) -> asyncio.Queue:
+        """Fila do event loop em execução (inicia a tarefa de gravação)"""
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            estado = self._estados.get(loop)
+            if estado is None:
+                for encerrado in [l for l in self._estados if l.is_closed()]:
+                    del self._estados[encerrado]
+
+                fila: asyncio.Queue = asyncio.Queue()
+                tarefa = loop.create_task(self._loop(fila))
+                estado = (fila, tarefa)
+                self._estados[loop] = estado
+
+        return estado[0]
+
+    async def salvar(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Enfileira uma correção e aguarda a gravação do seu grupo
+
+        Args:
+            item: {"redacao": {...}, "correcao": {...}} (ver salvar_correcoes)
+
+        Returns:
+            Dict com redacao_id e correcao_id
+        """
+        pendente = _Pendente(item)
+        await self._fila().put(pendente)
+        return await pendente.future
+
+    async def _coletar(self, fila: asyncio.Queue) -> Tuple[List[_Pendente], bool]:
+        """
+        Aguarda a primeira correção e agrupa as que chegarem na janela
+
+        Returns:
+            (grupo, encerrar) - encerrar quando fechar() sinalizou o fim (None)
+        """
+        primeira = await fila.get()
+        if primeira is None:
+            return [], True
+
+        grupo = [primeira]
+        prazo = primeira.chegada + self.max_espera
+
+        while len(grupo) < self.max_itens:
+            restante = prazo - time.perf_counter()
+            try:
+                if restante <= 0:
+                    pendente = fila.get_nowait()
+                else:
+                    pendente = await asyncio.wait_for(fila.get(), timeout=restante)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+
+            if pendente is None:
+                return grupo, True
+            grupo.append(pendente)
+
+        return grupo, False
+
+    async def _loop(self, fila: asyncio.Queue):
+        """Tarefa de gravação de um event loop"""
+        while True:
+            grupo, encerrar = await self._coletar(fila)
+            if grupo:
+                await self._gravar(grupo)
+            if encerrar:
+                return
+
+    async def _gravar(self, grupo: List[_Pendente]):
+        """Grava o grupo em uma chamada; se falhar, cada item separadamente"""
+        try:
+            resultados = await supabase_client.salvar_correcoes([p.item for p in grupo])
+            if len(resultados) != len(grupo):
+                raise RuntimeError(
+                    f"salvar_correcoes retornou {len(resultados)} de {len(grupo)} correções"
+                )
+            for pendente, resultado in zip(grupo, resultados):
+                if not pendente.future.done():
+                    pendente.future.set_result(resultado)
+        except Exception as e:
+            if len(grupo) == 1:
+                if not grupo[0].future.done():
+                    grupo[0].future.set_exception(e)
+                return
+
+            logger.warning(f"Falha ao gravar {len(grupo)} correções juntas, gravando uma a uma")
+            for pendente in grupo:
+                await self._gravar([pendente])
+            return
+
+        with self._lock:
+            self._total_itens += len(grupo)
+            self._total_gravacoes += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna totais de correções e de chamadas ao banco"""
+        with self._lock:
+            return {
+                "correcoes": self._total_itens,
+                "gravacoes": self._total_gravacoes,
+                "media_por_gravacao": (
+                    self._total_itens / self._total_gravacoes if self._total_gravacoes else 0.0
+                )
+            }
+
+    async def fechar(self):
+        """Grava as correções pendentes e encerra a tarefa do event loop em execução"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            estado = self._estados.pop(loop, None)
+        if estado is None:
+            return
+
+        # Sinaliza o fim: o que já está na fila é gravado antes
+        fila, tarefa = estado
+        await fila.put(None)
+        await tarefa
+
+        logger.info("BufferCorrecoes encerrado")
+
+
+# Instância global
+_buffer_instance: BufferCorrecoes = None
+
+
+def get_buffer_correcoes() -> BufferCorrecoes:
+    """Retorna instância global do buffer de correções"""
+    global _buffer_instance
+    if _buffer_instance is None:
+        _buffer_instance = BufferCorrecoes()
+    return _buffer_instance
+
+
+async def fechar_buffer_correcoes_loop():
+    """
+    Grava as correções pendentes do event loop em execução, sem descartar
+    o buffer global (outras threads do worker podem estar usando-o)
+    """
+    if _buffer_instance is not None:
+        await _buffer_instance.fechar()
+
+
+async def shutdown_buffer_correcoes():
+    """Grava as correções pendentes e encerra o buffer, se inicializado"""
+    global _buffer_instance
+    if _buffer_instance is not None:
+        await _buffer_instance.fechar()
+        _buffer_instance = None
@@ -1,5 +1,7 @@
 -- Migrations para criar tabelas no Supabase
--- Execute este SQL no SQL Editor do Supabase
+-- Execute este SQL no SQL Editor do Supabase e, em seguida, os arquivos de
+-- app/db/migrations/ em ordem numérica. Bancos já criados por este arquivo
+-- aplicam só os arquivos de migrations/ (todos podem ser reexecutados)
 
 -- ============= TABELA DE USUÁRIOS =============
 CREATE TABLE IF NOT EXISTS usuarios (
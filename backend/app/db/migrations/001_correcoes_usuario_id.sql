@@ -0,0 +1,22 @@
+-- Migration 001: correcoes.usuario_id
+-- Cópia de redacoes.usuario_id em correcoes: histórico, contagem e
+-- estatísticas do usuário sem join com redacoes.
+--
+-- Aplicar antes de 002 (a RPC salvar_correcoes grava a coluna) e de 003
+-- (o trigger e o backfill de estatisticas_usuario leem a coluna).
+-- Idempotente: pode ser reexecutada.
+
+ALTER TABLE correcoes
+    ADD COLUMN IF NOT EXISTS usuario_id UUID REFERENCES usuarios(id) ON DELETE SET NULL;
+
+-- Preenche as correções já existentes a partir das redações
+UPDATE correcoes c
+SET usuario_id = r.usuario_id
+FROM redacoes r
+WHERE r.id = c.redacao_id
+  AND c.usuario_id IS NULL
+  AND r.usuario_id IS NOT NULL;
+
+-- Histórico do usuário (paginação por cursor: created_at, id)
+CREATE INDEX IF NOT EXISTS idx_correcoes_usuario_created
+    ON correcoes(usuario_id, created_at DESC, id DESC);
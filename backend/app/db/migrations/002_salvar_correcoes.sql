@@ -0,0 +1,70 @@
+-- Migration 002: RPC salvar_correcoes
+-- Requer 001 (grava correcoes.usuario_id). Idempotente: pode ser reexecutada.
+
+-- ============= PERSISTÊNCIA DA CORREÇÃO (RPC) =============
+-- Insere cada redação com a sua correção na mesma transação, em uma única
+-- chamada: supabase.rpc("salvar_correcoes", {"itens": [...]}).
+-- Cada item: {"redacao": {id, texto, titulo, prompt_id, usuario_id},
+--             "correcao": {id, score_total, c1..c5, confianca, modelo_version,
+--                          tempo_processamento, feedback_geral, dados_completos}}
+-- Os IDs são gerados pelo backend (opcionais). Aceita vários itens para o
+-- write-behind agrupar correções concorrentes; se um item falha, nenhum é salvo.
+CREATE OR REPLACE FUNCTION salvar_correcoes(itens JSONB)
+RETURNS TABLE (redacao_id UUID, correcao_id UUID)
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+    item JSONB;
+    nova_redacao_id UUID;
+    nova_correcao_id UUID;
+BEGIN
+    FOR item IN SELECT * FROM jsonb_array_elements(itens)
+    LOOP
+        INSERT INTO redacoes (id, texto, titulo, prompt_id, usuario_id)
+        VALUES (
+            COALESCE((item->'redacao'->>'id')::UUID, gen_random_uuid()),
+            item->'redacao'->>'texto',
+            item->'redacao'->>'titulo',
+            (item->'redacao'->>'prompt_id')::INTEGER,
+            (item->'redacao'->>'usuario_id')::UUID
+        )
+        RETURNING id INTO nova_redacao_id;
+
+        INSERT INTO correcoes (
+            id, redacao_id, usuario_id, score_total, c1, c2, c3, c4, c5,
+            confianca, modelo_version, tempo_processamento,
+            feedback_geral, dados_completos
+        )
+        VALUES (
+            COALESCE((item->'correcao'->>'id')::UUID, gen_random_uuid()),
+            nova_redacao_id,
+            (item->'redacao'->>'usuario_id')::UUID,
+            (item->'correcao'->>'score_total')::INTEGER,
+            (item->'correcao'->>'c1')::INTEGER,
+            (item->'correcao'->>'c2')::INTEGER,
+            (item->'correcao'->>'c3')::INTEGER,
+            (item->'correcao'->>'c4')::INTEGER,
+            (item->'correcao'->>'c5')::INTEGER,
+            (item->'correcao'->>'confianca')::FLOAT,
+            item->'correcao'->>'modelo_version',
+            (item->'correcao'->>'tempo_processamento')::FLOAT,
+            item->'correcao'->>'feedback_geral',
+            item->'correcao'->'dados_completos'
+        )
+        RETURNING id INTO nova_correcao_id;
+
+        redacao_id := nova_redacao_id;
+        correcao_id := nova_correcao_id;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
+
+-- Só o backend (service_role) chama a RPC: sem isso, o PostgREST expõe
+-- /rpc/salvar_correcoes a quem tiver a chave anon, gravando correções
+-- para qualquer usuario_id
+REVOKE EXECUTE ON FUNCTION salvar_correcoes(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION salvar_correcoes(JSONB) TO service_role;
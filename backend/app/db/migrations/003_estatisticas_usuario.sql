@@ -0,0 +1,197 @@
+-- Migration 003: estatísticas por usuário
+-- Requer 001: o trigger e o backfill leem correcoes.usuario_id. Em bancos
+-- que já tinham a versão anterior deste trigger (com join em redacoes),
+-- reaplicar este arquivo depois de 001 substitui as funções e o trigger e
+-- recalcula as linhas. Idempotente: pode ser reexecutada.
+
+-- ============= ESTATÍSTICAS POR USUÁRIO =============
+-- Agregados mantidos por trigger a cada correção: /usuario/estatisticas e
+-- /usuario/dashboard leem uma linha, independente do histórico do usuário
+CREATE TABLE IF NOT EXISTS estatisticas_usuario (
+    usuario_id UUID PRIMARY KEY REFERENCES usuarios(id) ON DELETE CASCADE,
+    total_redacoes INTEGER NOT NULL DEFAULT 0,
+
+    -- Somas para as médias (média = soma / total_redacoes)
+    soma_notas BIGINT NOT NULL DEFAULT 0,
+    soma_c1 BIGINT NOT NULL DEFAULT 0,
+    soma_c2 BIGINT NOT NULL DEFAULT 0,
+    soma_c3 BIGINT NOT NULL DEFAULT 0,
+    soma_c4 BIGINT NOT NULL DEFAULT 0,
+    soma_c5 BIGINT NOT NULL DEFAULT 0,
+    melhor_nota INTEGER,
+    pior_nota INTEGER,
+
+    -- Distribuição de notas
+    faixa_0_200 INTEGER NOT NULL DEFAULT 0,
+    faixa_200_400 INTEGER NOT NULL DEFAULT 0,
+    faixa_400_600 INTEGER NOT NULL DEFAULT 0,
+    faixa_600_800 INTEGER NOT NULL DEFAULT 0,
+    faixa_800_1000 INTEGER NOT NULL DEFAULT 0,
+
+    -- Evolução: últimas 10 correções [{data, nota, redacao_id}], da mais antiga
+    ultimas_notas JSONB NOT NULL DEFAULT '[]'::JSONB,
+
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Recalcula a linha de um usuário a partir das correções (remoções e backfill)
+CREATE OR REPLACE FUNCTION recalcular_estatisticas_usuario(p_usuario_id UUID)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+BEGIN
+    DELETE FROM estatisticas_usuario WHERE usuario_id = p_usuario_id;
+
+    INSERT INTO estatisticas_usuario (
+        usuario_id, total_redacoes, soma_notas,
+        soma_c1, soma_c2, soma_c3, soma_c4, soma_c5,
+        melhor_nota, pior_nota,
+        faixa_0_200, faixa_200_400, faixa_400_600, faixa_600_800, faixa_800_1000,
+        ultimas_notas
+    )
+    SELECT
+        p_usuario_id,
+        COUNT(*),
+        SUM(c.score_total),
+        SUM(c.c1), SUM(c.c2), SUM(c.c3), SUM(c.c4), SUM(c.c5),
+        MAX(c.score_total),
+        MIN(c.score_total),
+        COUNT(*) FILTER (WHERE c.score_total < 200),
+        COUNT(*) FILTER (WHERE c.score_total >= 200 AND c.score_total < 400),
+        COUNT(*) FILTER (WHERE c.score_total >= 400 AND c.score_total < 600),
+        COUNT(*) FILTER (WHERE c.score_total >= 600 AND c.score_total < 800),
+        COUNT(*) FILTER (WHERE c.score_total >= 800),
+        COALESCE((
+            SELECT jsonb_agg(u.item ORDER BY u.created_at)
+            FROM (
+                SELECT
+                    c2.created_at,
+                    jsonb_build_object(
+                        'data', c2.created_at,
+                        'nota', c2.score_total,
+                        'redacao_id', c2.redacao_id
+                    ) AS item
+                FROM correcoes c2
+                WHERE c2.usuario_id = p_usuario_id
+                ORDER BY c2.created_at DESC
+                LIMIT 10
+            ) u
+        ), '[]'::JSONB)
+    FROM correcoes c
+    WHERE c.usuario_id = p_usuario_id
+    HAVING COUNT(*) > 0;
+END;
+$$;
+
+-- Uso interno (trigger e backfill): fora da API do PostgREST
+REVOKE EXECUTE ON FUNCTION recalcular_estatisticas_usuario(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION recalcular_estatisticas_usuario(UUID) TO service_role;
+
+-- Atualização incremental: cada correção nova soma na linha do usuário.
+-- Remoções e alterações recalculam a linha: melhor/pior nota e últimas
+-- notas não se desfazem por subtração
+CREATE OR REPLACE FUNCTION atualizar_estatisticas_usuario()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+-- Roda como o dono: mantém estatisticas_usuario e chama
+-- recalcular_estatisticas_usuario qualquer que seja o papel que altera
+-- correcoes (o EXECUTE da função de recálculo foi revogado)
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_usuario_id UUID;
+    v_item JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF OLD.usuario_id IS NOT NULL THEN
+            PERFORM recalcular_estatisticas_usuario(OLD.usuario_id);
+        END IF;
+        RETURN OLD;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        IF OLD.usuario_id IS NOT NULL THEN
+            PERFORM recalcular_estatisticas_usuario(OLD.usuario_id);
+        END IF;
+        -- Correção movida para outro usuário: recalcular os dois
+        IF NEW.usuario_id IS NOT NULL AND NEW.usuario_id IS DISTINCT FROM OLD.usuario_id THEN
+            PERFORM recalcular_estatisticas_usuario(NEW.usuario_id);
+        END IF;
+        RETURN NEW;
+    END IF;
+
+    v_usuario_id := NEW.usuario_id;
+    IF v_usuario_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+
+    v_item := jsonb_build_object(
+        'data', NEW.created_at,
+        'nota', NEW.score_total,
+        'redacao_id', NEW.redacao_id
+    );
+
+    INSERT INTO estatisticas_usuario (
+        usuario_id, total_redacoes, soma_notas,
+        soma_c1, soma_c2, soma_c3, soma_c4, soma_c5,
+        melhor_nota, pior_nota,
+        faixa_0_200, faixa_200_400, faixa_400_600, faixa_600_800, faixa_800_1000,
+        ultimas_notas
+    )
+    VALUES (
+        v_usuario_id, 1, NEW.score_total,
+        NEW.c1, NEW.c2, NEW.c3, NEW.c4, NEW.c5,
+        NEW.score_total, NEW.score_total,
+        (NEW.score_total < 200)::INT,
+        (NEW.score_total >= 200 AND NEW.score_total < 400)::INT,
+        (NEW.score_total >= 400 AND NEW.score_total < 600)::INT,
+        (NEW.score_total >= 600 AND NEW.score_total < 800)::INT,
+        (NEW.score_total >= 800)::INT,
+        jsonb_build_array(v_item)
+    )
+    ON CONFLICT (usuario_id) DO UPDATE SET
+        total_redacoes = estatisticas_usuario.total_redacoes + 1,
+        soma_notas = estatisticas_usuario.soma_notas + EXCLUDED.soma_notas,
+        soma_c1 = estatisticas_usuario.soma_c1 + EXCLUDED.soma_c1,
+        soma_c2 = estatisticas_usuario.soma_c2 + EXCLUDED.soma_c2,
+        soma_c3 = estatisticas_usuario.soma_c3 + EXCLUDED.soma_c3,
+        soma_c4 = estatisticas_usuario.soma_c4 + EXCLUDED.soma_c4,
+        soma_c5 = estatisticas_usuario.soma_c5 + EXCLUDED.soma_c5,
+        melhor_nota = GREATEST(estatisticas_usuario.melhor_nota, EXCLUDED.melhor_nota),
+        pior_nota = LEAST(estatisticas_usuario.pior_nota, EXCLUDED.pior_nota),
+        faixa_0_200 = estatisticas_usuario.faixa_0_200 + EXCLUDED.faixa_0_200,
+        faixa_200_400 = estatisticas_usuario.faixa_200_400 + EXCLUDED.faixa_200_400,
+        faixa_400_600 = estatisticas_usuario.faixa_400_600 + EXCLUDED.faixa_400_600,
+        faixa_600_800 = estatisticas_usuario.faixa_600_800 + EXCLUDED.faixa_600_800,
+        faixa_800_1000 = estatisticas_usuario.faixa_800_1000 + EXCLUDED.faixa_800_1000,
+        -- Mantém só as 10 mais recentes, da mais antiga para a mais nova
+        ultimas_notas = (
+            SELECT jsonb_agg(u.item ORDER BY u.ordem)
+            FROM (
+                SELECT item, ordem
+                FROM jsonb_array_elements(estatisticas_usuario.ultimas_notas || EXCLUDED.ultimas_notas)
+                    WITH ORDINALITY AS e(item, ordem)
+                ORDER BY ordem DESC
+                LIMIT 10
+            ) u
+        ),
+        updated_at = NOW();
+
+    RETURN NEW;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION atualizar_estatisticas_usuario() FROM PUBLIC, anon, authenticated;
+
+DROP TRIGGER IF EXISTS trg_correcoes_estatisticas_usuario ON correcoes;
+CREATE TRIGGER trg_correcoes_estatisticas_usuario
+AFTER INSERT OR DELETE
+    OR UPDATE OF usuario_id, redacao_id, score_total, c1, c2, c3, c4, c5, created_at
+ON correcoes
+FOR EACH ROW EXECUTE FUNCTION atualizar_estatisticas_usuario();
+
+-- Backfill das correções já existentes
+SELECT recalcular_estatisticas_usuario(u.id) FROM usuarios u;
@@ -1,24 +1,136 @@
 """
 Cliente Supabase para interação com banco de dados
+
+As consultas usam o cliente assíncrono do PostgREST (API REST do
+Supabase) sobre um pool de conexões HTTP/2 com keep-alive, sem bloquear o
+event loop. Chamadas concorrentes ao banco se sobrepõem em vez de
+serializar o worker.
 """
-from supabase import create_client, Client
-from typing import Optional, List, Dict, Any
+import asyncio
+import base64
+import json
+import threading
+import uuid
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
+import httpx
 from loguru import logger
+from postgrest import AsyncPostgrestClient
 
 from app.core.config import settings
 
 
+def _codificar_cursor(correcao: Dict[str, Any]) -> str:
+    """Cursor opaco com a posição (created_at, id) de uma correção"""
+    posicao = json.dumps([correcao["created_at"], correcao["id"]])
+    return base64.urlsafe_b64encode(posicao.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Posição (created_at, id) de um cursor de _codificar_cursor
+
+    Raises:
+        ValueError: se o cursor for inválido
+    """
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        criado, correcao_id = json.loads(base64.urlsafe_b64decode(preenchido))
+        # Validar formatos antes de montar o filtro do PostgREST
+        datetime.fromisoformat(criado)
+        return criado, str(uuid.UUID(correcao_id))
+    except Exception:
+        raise ValueError("Cursor de paginação inválido")
+
+
+class _PostgrestPool(AsyncPostgrestClient):
+    """AsyncPostgrestClient sobre um httpx.AsyncClient com pool, HTTP/2 e retries"""
+
+    def create_session(self, base_url, headers, timeout, verify=True) -> httpx.AsyncClient:
+        limites = httpx.Limits(
+            max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE,
+            keepalive_expiry=settings.SUPABASE_KEEPALIVE_SECONDS
+        )
+        # retries do transporte: só falhas ao abrir a conexão (a requisição
+        # não chegou ao servidor), então inserts não são duplicados
+        transporte = httpx.AsyncHTTPTransport(
+            http2=settings.SUPABASE_HTTP2,
+            limits=limites,
+            retries=settings.SUPABASE_RETRIES,
+            verify=verify
+        )
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=transporte,
+            follow_redirects=True
+        )
+
+
 class SupabaseClient:
-    """Cliente para interação com Supabase"""
+    """
+    Cliente para interação com Supabase
+
+    Um httpx.AsyncClient só pode ser usado no event loop em que foi criado:
+    o cliente PostgREST é criado sob demanda para cada loop (o do uvicorn,
+    ou um por asyncio.run nas tasks do Celery) e compartilhado por todas as
+    chamadas desse loop.
+    """
 
     def __init__(self):
-        self.client: Client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_SERVICE_KEY
-        )
+        self.base_url = f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1"
+        self._headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "apikey": settings.SUPABASE_SERVICE_KEY,
+            "Authorization": f"Bearer {settings.SUPABASE_SERVICE_KEY}"
+        }
+        self._clientes: Dict[asyncio.AbstractEventLoop, AsyncPostgrestClient] = {}
+        self._lock = threading.Lock()
         logger.info("Cliente Supabase inicializado")
 
+    @property
+    def client(self) -> AsyncPostgrestClient:
+        """Cliente PostgREST do event loop em execução"""
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            cliente = self._clientes.get(loop)
+            if cliente is None:
+                # Loops já encerrados sem fechar() (ver _executar_async nas
+                # tasks): o cliente não pode mais ser fechado, só descartado
+                for encerrado in [l for l in self._clientes if l.is_closed()]:
+                    del self._clientes[encerrado]
+
+                cliente = _PostgrestPool(
+                    self.base_url,
+                    headers=self._headers,
+                    timeout=settings.SUPABASE_TIMEOUT_SECONDS
+                )
+                self._clientes[loop] = cliente
+
+        return cliente
+
+    async def ping(self) -> bool:
+        """Verifica se o banco responde (health check)"""
+        try:
+            await self.client.table("redacoes").select("id").limit(1).execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Banco de dados não respondeu: {str(e)}")
+            return False
+
+    async def fechar(self):
+        """Fecha as conexões do cliente do event loop em execução"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            cliente = self._clientes.pop(loop, None)
+        if cliente is not None:
+            await cliente.aclose()
+            logger.debug("Conexões com o Supabase encerradas")
+
     # ============= USUÁRIOS =============
 
     async def criar_usuario(
@@ -38,7 +150,7 @@ class SupabaseClient:
                 "created_at": datetime.utcnow().isoformat()
             }
 
-            response = self.client.table("usuarios").insert(data).execute()
+            response = await self.client.table("usuarios").insert(data).execute()
             logger.info(f"Usuário criado: {response.data[0]['id']} - {email}")
             return response.data[0]
 
@@ -49,7 +161,7 @@ class SupabaseClient:
     async def buscar_usuario_por_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Busca um usuário por email"""
         try:
-            response = self.client.table("usuarios").select("*").eq("email", email).execute()
+            response = await self.client.table("usuarios").select("*").eq("email", email).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Erro ao buscar usuário por email {email}: {str(e)}")
@@ -58,7 +170,7 @@ class SupabaseClient:
     async def buscar_usuario_por_id(self, usuario_id: str) -> Optional[Dict[str, Any]]:
         """Busca um usuário por ID"""
         try:
-            response = self.client.table("usuarios").select("*").eq("id", usuario_id).execute()
+            response = await self.client.table("usuarios").select("*").eq("id", usuario_id).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Erro ao buscar usuário {usuario_id}: {str(e)}")
@@ -74,7 +186,7 @@ class SupabaseClient:
             # Adiciona updated_at automaticamente
             dados["updated_at"] = datetime.utcnow().isoformat()
 
-            response = (
+            response = await (
                 self.client.table("usuarios")
                 .update(dados)
                 .eq("id", usuario_id)
@@ -91,7 +203,7 @@ class SupabaseClient:
     async def verificar_email_existe(self, email: str) -> bool:
         """Verifica se já existe um usuário com o email"""
         try:
-            response = self.client.table("usuarios").select("id").eq("email", email).execute()
+            response = await self.client.table("usuarios").select("id").eq("email", email).execute()
             return len(response.data) > 0
         except Exception as e:
             logger.error(f"Erro ao verificar email: {str(e)}")
@@ -100,7 +212,7 @@ class SupabaseClient:
     async def desativar_usuario(self, usuario_id: str) -> bool:
         """Desativa um usuário (soft delete)"""
         try:
-            response = (
+            response = await (
                 self.client.table("usuarios")
                 .update({"is_active": False, "updated_at": datetime.utcnow().isoformat()})
                 .eq("id", usuario_id)
@@ -129,7 +241,7 @@ class SupabaseClient:
                 "created_at": datetime.utcnow().isoformat()
             }
 
-            response = self.client.table("refresh_tokens").insert(data).execute()
+            response = await self.client.table("refresh_tokens").insert(data).execute()
             logger.debug(f"Refresh token salvo para usuário: {usuario_id}")
             return response.data[0]
 
@@ -140,7 +252,7 @@ class SupabaseClient:
     async def buscar_refresh_token(self, token: str) -> Optional[Dict[str, Any]]:
         """Busca um refresh token"""
         try:
-            response = (
+            response = await (
                 self.client.table("refresh_tokens")
                 .select("*")
                 .eq("token", token)
@@ -155,7 +267,7 @@ class SupabaseClient:
     async def revogar_refresh_token(self, token: str) -> bool:
         """Revoga um refresh token"""
         try:
-            response = (
+            response = await (
                 self.client.table("refresh_tokens")
                 .update({"revoked": True})
                 .eq("token", token)
@@ -170,7 +282,7 @@ class SupabaseClient:
     async def revogar_todos_tokens_usuario(self, usuario_id: str) -> bool:
         """Revoga todos os refresh tokens de um usuário"""
         try:
-            response = (
+            response = await (
                 self.client.table("refresh_tokens")
                 .update({"revoked": True})
                 .eq("usuario_id", usuario_id)
@@ -201,7 +313,7 @@ class SupabaseClient:
                 "created_at": datetime.utcnow().isoformat()
             }
 
-            response = self.client.table("redacoes").insert(data).execute()
+            response = await self.client.table("redacoes").insert(data).execute()
             logger.info(f"Redação criada: {response.data[0]['id']}")
             return response.data[0]
 
@@ -212,7 +324,7 @@ class SupabaseClient:
     async def buscar_redacao(self, redacao_id: str) -> Optional[Dict[str, Any]]:
         """Busca uma redação por ID"""
         try:
-            response = self.client.table("redacoes").select("*").eq("id", redacao_id).execute()
+            response = await self.client.table("redacoes").select("*").eq("id", redacao_id).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Erro ao buscar redação {redacao_id}: {str(e)}")
@@ -232,12 +344,14 @@ class SupabaseClient:
         confianca: float,
         modelo_version: str,
         feedback_geral: str,
-        dados_completos: Dict[str, Any]
+        dados_completos: Dict[str, Any],
+        usuario_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Cria uma correção no banco"""
         try:
             data = {
                 "redacao_id": redacao_id,
+                "usuario_id": usuario_id,
                 "score_total": score_total,
                 "c1": c1,
                 "c2": c2,
@@ -251,7 +365,7 @@ class SupabaseClient:
                 "created_at": datetime.utcnow().isoformat()
             }
 
-            response = self.client.table("correcoes").insert(data).execute()
+            response = await self.client.table("correcoes").insert(data).execute()
             logger.info(f"Correção criada: {response.data[0]['id']}")
             return response.data[0]
 
@@ -259,10 +373,32 @@ class SupabaseClient:
             logger.error(f"Erro ao criar correção: {str(e)}")
             raise
 
+    async def salvar_correcoes(self, itens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Salva redações e correções em uma única chamada (RPC salvar_correcoes)
+
+        Cada redação é inserida com a sua correção na mesma transação: não
+        sobram redações sem correção quando algo falha.
+
+        Args:
+            itens: Dicts {"redacao": {...}, "correcao": {...}} (ver migrations.sql)
+
+        Returns:
+            Dicts com redacao_id e correcao_id, na mesma ordem
+        """
+        try:
+            response = await self.client.rpc("salvar_correcoes", {"itens": itens}).execute()
+            logger.info(f"{len(response.data)} correções salvas")
+            return response.data
+
+        except Exception as e:
+            logger.error(f"Erro ao salvar correções: {str(e)}")
+            raise
+
     async def buscar_correcao(self, correcao_id: str) -> Optional[Dict[str, Any]]:
         """Busca uma correção por ID"""
         try:
-            response = self.client.table("correcoes").select("*").eq("id", correcao_id).execute()
+            response = await self.client.table("correcoes").select("*").eq("id", correcao_id).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Erro ao buscar correção {correcao_id}: {str(e)}")
@@ -271,7 +407,7 @@ class SupabaseClient:
     async def buscar_multiplas_correcoes(self, correcao_ids: List[str]) -> List[Dict[str, Any]]:
         """Busca múltiplas correções por IDs com suas redações"""
         try:
-            response = (
+            response = await (
                 self.client.table("correcoes")
                 .select("*, redacoes(id, titulo, texto, created_at, usuario_id)")
                 .in_("id", correcao_ids)
@@ -285,7 +421,7 @@ class SupabaseClient:
     async def buscar_correcoes_por_redacao(self, redacao_id: str) -> List[Dict[str, Any]]:
         """Busca todas as correções de uma redação"""
         try:
-            response = (
+            response = await (
                 self.client.table("correcoes")
                 .select("*")
                 .eq("redacao_id", redacao_id)
@@ -301,64 +437,98 @@ class SupabaseClient:
         self,
         usuario_id: str,
         limit: int = 10,
-        offset: int = 0,
+        cursor: Optional[str] = None,
         ordem: str = "desc"
-    ) -> List[Dict[str, Any]]:
-        """Busca correções de um usuário com paginação"""
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Busca correções de um usuário com paginação por cursor
+
+        Usa o índice (usuario_id, created_at, id): cada página parte da
+        última correção da anterior, então páginas profundas custam o
+        mesmo que a primeira.
+
+        Args:
+            cursor: proximo_cursor da página anterior (None na primeira)
+
+        Returns:
+            (correções, proximo_cursor) - proximo_cursor None na última página
+
+        Raises:
+            ValueError: se o cursor for inválido
+            Exception: erro do PostgREST (o endpoint responde 500)
+        """
+        posicao = _decodificar_cursor(cursor) if cursor else None
+        desc = ordem == "desc"
+
         try:
-            # Buscar redações do usuário e suas correções
             query = (
                 self.client.table("correcoes")
                 .select("*, redacoes(id, titulo, texto, created_at)")
-                .eq("redacoes.usuario_id", usuario_id)
+                .eq("usuario_id", usuario_id)
             )
 
-            # Ordenar
-            query = query.order("created_at", desc=(ordem == "desc"))
+            if posicao is not None:
+                criado, ultimo_id = posicao
+                op = "lt" if desc else "gt"
+                query = query.or_(
+                    f'created_at.{op}."{criado}",'
+                    f'and(created_at.eq."{criado}",id.{op}.{ultimo_id})'
+                )
 
-            # Paginação
-            query = query.range(offset, offset + limit - 1)
+            # id desempata correções com o mesmo created_at (chamadas
+            # encadeadas de order viram um único order=created_at,id)
+            query = query.order("created_at", desc=desc).order("id", desc=desc)
 
-            response = query.execute()
-            return response.data
+            # Um a mais para saber se há próxima página
+            response = await query.limit(limit + 1).execute()
+            correcoes = response.data[:limit]
+
+            proximo_cursor = None
+            if len(response.data) > limit:
+                proximo_cursor = _codificar_cursor(correcoes[-1])
+
+            return correcoes, proximo_cursor
 
         except Exception as e:
+            # Propaga: uma página vazia seria confundida com "sem correções"
             logger.error(f"Erro ao buscar correções do usuário {usuario_id}: {str(e)}")
-            return []
+            raise
 
     async def contar_correcoes_usuario(self, usuario_id: str) -> int:
-        """Conta total de correções de um usuário"""
+        """Conta total de correções de um usuário (linha de estatisticas_usuario)"""
         try:
-            response = (
-                self.client.table("correcoes")
-                .select("id", count="exact")
-                .eq("redacoes.usuario_id", usuario_id)
+            response = await (
+                self.client.table("estatisticas_usuario")
+                .select("total_redacoes")
+                .eq("usuario_id", usuario_id)
                 .execute()
             )
-            return response.count if hasattr(response, 'count') else 0
+            return response.data[0]["total_redacoes"] if response.data else 0
         except Exception as e:
             logger.error(f"Erro ao contar correções do usuário: {str(e)}")
             return 0
 
-    async def buscar_todas_correcoes_usuario(self, usuario_id: str) -> List[Dict[str, Any]]:
-        """Busca todas as correções de um usuário (sem paginação) para estatísticas"""
+    async def buscar_estatisticas_usuario(self, usuario_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca os agregados do usuário (tabela estatisticas_usuario, mantida
+        por trigger a cada correção); None se ainda não há correções
+        """
         try:
-            response = (
-                self.client.table("correcoes")
-                .select("score_total, c1, c2, c3, c4, c5, created_at, redacao_id")
-                .eq("redacoes.usuario_id", usuario_id)
-                .order("created_at", desc=False)
+            response = await (
+                self.client.table("estatisticas_usuario")
+                .select("*")
+                .eq("usuario_id", usuario_id)
                 .execute()
             )
-            return response.data
+            return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Erro ao buscar todas correções do usuário: {str(e)}")
-            return []
+            logger.error(f"Erro ao buscar estatísticas do usuário {usuario_id}: {str(e)}")
+            raise
 
     async def deletar_correcao(self, correcao_id: str) -> bool:
         """Deleta uma correção"""
         try:
-            response = (
+            response = await (
                 self.client.table("correcoes")
                 .delete()
                 .eq("id", correcao_id)
@@ -396,7 +566,7 @@ class SupabaseClient:
                 "created_at": datetime.utcnow().isoformat()
             }
 
-            response = self.client.table("feedback_humano").insert(data).execute()
+            response = await self.client.table("feedback_humano").insert(data).execute()
             logger.info(f"Feedback criado: {response.data[0]['id']}")
             return response.data[0]
 
@@ -413,7 +583,7 @@ class SupabaseClient:
     ) -> List[Dict[str, Any]]:
         """Busca redações com alta confiança para re-treino"""
         try:
-            response = (
+            response = await (
                 self.client.table("correcoes")
                 .select("redacao_id, c1, c2, c3, c4, c5, score_total, redacoes(texto)")
                 .gte("confianca", confianca_minima)
@@ -429,7 +599,7 @@ class SupabaseClient:
     async def buscar_feedback_para_treino(self, limite: int = 100) -> List[Dict[str, Any]]:
         """Busca feedback humano para usar no re-treino"""
         try:
-            response = (
+            response = await (
                 self.client.table("feedback_humano")
                 .select("*, correcoes(redacao_id, redacoes(texto))")
                 .order("created_at", desc=True)
@@ -469,7 +639,7 @@ class SupabaseClient:
             # Ordenar e paginar
             query = query.order("id", desc=True).range(offset, offset + limit - 1)
 
-            response = query.execute()
+            response = await query.execute()
             return response.data
 
         except Exception as e:
@@ -496,7 +666,7 @@ class SupabaseClient:
             if origem:
                 query = query.eq("origem", origem)
 
-            response = query.execute()
+            response = await query.execute()
             return response.count if hasattr(response, 'count') else 0
 
         except Exception as e:
@@ -506,7 +676,7 @@ class SupabaseClient:
     async def buscar_tema(self, tema_id: int) -> Optional[Dict[str, Any]]:
         """Busca um tema por ID"""
         try:
-            response = self.client.table("prompts").select("*").eq("id", tema_id).execute()
+            response = await self.client.table("prompts").select("*").eq("id", tema_id).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Erro ao buscar tema {tema_id}: {str(e)}")
@@ -515,7 +685,7 @@ class SupabaseClient:
     async def listar_categorias_temas(self) -> List[str]:
         """Retorna lista de categorias únicas"""
         try:
-            response = self.client.table("prompts").select("categoria").execute()
+            response = await self.client.table("prompts").select("categoria").execute()
             categorias = list(set([t["categoria"] for t in response.data if t.get("categoria")]))
             return sorted(categorias)
         except Exception as e:
@@ -537,7 +707,7 @@ class SupabaseClient:
                 "created_at": datetime.utcnow().isoformat()
             }
 
-            response = self.client.table("modelo_metrics").insert(data).execute()
+            response = await self.client.table("modelo_metrics").insert(data).execute()
             logger.info(f"Métricas salvas para modelo {version}")
             return response.data[0]
 
@@ -548,7 +718,7 @@ class SupabaseClient:
     async def buscar_metricas_modelo(self, version: str) -> Optional[Dict[str, Any]]:
         """Busca métricas de uma versão do modelo"""
         try:
-            response = (
+            response = await (
                 self.client.table("modelo_metrics")
                 .select("*")
                 .eq("version", version)
@@ -582,7 +752,7 @@ class SupabaseClient:
                 "created_at": datetime.utcnow().isoformat()
             }
 
-            response = self.client.table("compartilhamentos").insert(data).execute()
+            response = await self.client.table("compartilhamentos").insert(data).execute()
             logger.info(f"Compartilhamento criado: {response.data[0]['id']}")
             return response.data[0]
 
@@ -593,7 +763,7 @@ class SupabaseClient:
     async def buscar_compartilhamento_por_token(self, token: str) -> Optional[Dict[str, Any]]:
         """Busca um compartilhamento pelo token"""
         try:
-            response = (
+            response = await (
                 self.client.table("compartilhamentos")
                 .select("*, correcoes(*, redacoes(*))")
                 .eq("token", token)
@@ -636,7 +806,7 @@ class SupabaseClient:
             # Incrementar visualizações
             new_count = (comp.get('visualizacoes', 0) or 0) + 1
 
-            response = (
+            response = await (
                 self.client.table("compartilhamentos")
                 .update({"visualizacoes": new_count})
                 .eq("token", token)
@@ -659,7 +829,7 @@ class SupabaseClient:
             if usuario_id:
                 query = query.eq("usuario_id", usuario_id)
 
-            response = query.execute()
+            response = await query.execute()
 
             if response.data:
                 logger.info(f"Compartilhamento {token} desativado")
@@ -674,7 +844,7 @@ class SupabaseClient:
     async def listar_compartilhamentos_usuario(self, usuario_id: str) -> List[Dict[str, Any]]:
         """Lista compartilhamentos de um usuário"""
         try:
-            response = (
+            response = await (
                 self.client.table("compartilhamentos")
                 .select("*, correcoes(redacao_id, score_total)")
                 .eq("usuario_id", usuario_id)
@@ -0,0 +1,203 @@
+"""
+Micro-batching - Agrupa requisições concorrentes em lotes para o ensemble
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from app.ml.ensemble import EnsembleRedacaoModel
+from app.core.config import settings
+
+
+class _Requisicao:
+    """Requisição de predição aguardando na fila"""
+
+    def __init__(self, texto: str, incluir_atencao: bool = False):
+        self.texto = texto
+        self.incluir_atencao = incluir_atencao
+        self.future: Future = Future()
+        self.chegada = time.perf_counter()
+
+
+class BatchScheduler:
+    """
+    Agrupa requisições concorrentes em uma janela de tempo e executa
+    um único forward por modelo do ensemble para o lote inteiro.
+
+    O lote é despachado quando atinge max_batch_size ou quando a
+    requisição mais antiga espera max_wait_ms, o que limita o custo
+    de latência adicionado pelo agrupamento.
+    """
+
+    def __init__(
+        self,
+        ensemble: EnsembleRedacaoModel,
+        max_batch_size: int = settings.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms: int = settings.INFERENCE_MAX_WAIT_MS,
+        historico: int = 1000
+    ):
+        self.ensemble = ensemble
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+
+        self._fila: "queue.Queue[_Requisicao]" = queue.Queue()
+        self._parar = threading.Event()
+
+        # Estatísticas das últimas requisições/lotes
+        self._lock = threading.Lock()
+        self._latencias = deque(maxlen=historico)  # segundos (fila + forward)
+        self._esperas = deque(maxlen=historico)  # segundos na fila
+        self._tamanhos_lote = deque(maxlen=historico)
+        self._total_requisicoes = 0
+        self._total_lotes = 0
+
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="batch-scheduler",
+            daemon=True
+        )
+        self._thread.start()
+
+        logger.info(
+            f"BatchScheduler iniciado - max_batch_size: {self.max_batch_size}, "
+            f"max_wait: {max_wait_ms}ms"
+        )
+
+    def submit(self, texto: str, incluir_atencao: bool = False) -> Future:
+        """
+        Enfileira uma redação para predição
+
+        Args:
+            texto: Texto da redação
+            incluir_atencao: Se True, o resultado inclui "atencao" (explainer)
+
+        Returns:
+            Future que recebe o resultado de ensemble.predict
+        """
+        if self._parar.is_set():
+            raise RuntimeError("BatchScheduler encerrado")
+
+        requisicao = _Requisicao(texto=texto, incluir_atencao=incluir_atencao)
+        self._fila.put(requisicao)
+        return requisicao.future
+
+    def predict(
+        self,
+        texto: str,
+        incluir_atencao: bool = False,
+        timeout: Optional[float] = None
+    ) -> Dict[str, any]:
+        """Enfileira uma redação e bloqueia até o resultado"""
+        return self.submit(texto, incluir_atencao=incluir_atencao).result(timeout=timeout)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Encerra o scheduler, processando o que ainda estiver na fila"""
+        self._parar.set()
+        self._thread.join(timeout=timeout)
+        logger.info("BatchScheduler encerrado")
+
+    def _coletar_lote(self) -> List[_Requisicao]:
+        """Aguarda a primeira requisição e agrupa as que chegarem na janela"""
+        try:
+            primeira = self._fila.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        lote = [primeira]
+        prazo = primeira.chegada + self.max_wait
+
+        while len(lote) < self.max_batch_size:
+            restante = prazo - time.perf_counter()
+            try:
+                if restante <= 0:
+                    # Janela expirou: aproveita apenas o que já está na fila
+                    lote.append(self._fila.get_nowait())
+                else:
+                    lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+
+        return lote
+
+    def _loop(self):
+        """Loop da thread de despacho"""
+        while not (self._parar.is_set() and self._fila.empty()):
+            lote = self._coletar_lote()
+            if lote:
+                self._processar(lote)
+
+    def _processar(self, lote: List[_Requisicao]):
+        """Executa o ensemble no lote e devolve cada resultado ao chamador"""
+        # Descarta requisições já canceladas pelo chamador e marca as
+        # demais como em execução: a partir daqui cancel() não as altera e
+        # set_result/set_exception não levantam InvalidStateError
+        lote = [r for r in lote if r.future.set_running_or_notify_cancel()]
+        if not lote:
+            return
+
+        inicio = time.perf_counter()
+
+        # Atenção é capturada no mesmo forward se algum chamador pediu
+        incluir_atencao = any(r.incluir_atencao for r in lote)
+
+        try:
+            resultados = self.ensemble.predict_batch(
+                [r.texto for r in lote],
+                incluir_atencao=incluir_atencao
+            )
+        except Exception as e:
+            logger.error(f"Erro ao processar lote de {len(lote)} redações: {str(e)}")
+            for requisicao in lote:
+                requisicao.future.set_exception(e)
+            return
+
+        fim = time.perf_counter()
+
+        for requisicao, resultado in zip(lote, resultados):
+            if not requisicao.incluir_atencao:
+                resultado.pop("atencao", None)
+            requisicao.future.set_result(resultado)
+
+        with self._lock:
+            self._total_lotes += 1
+            self._total_requisicoes += len(lote)
+            self._tamanhos_lote.append(len(lote))
+            for requisicao in lote:
+                self._esperas.append(inicio - requisicao.chegada)
+                self._latencias.append(fim - requisicao.chegada)
+
+        logger.debug(
+            f"Lote processado - Tamanho: {len(lote)}, "
+            f"Forward: {(fim - inicio) * 1000:.1f}ms"
+        )
+
+    def get_stats(self) -> Dict[str, any]:
+        """Retorna estatísticas de agrupamento e latência (ms)"""
+        with self._lock:
+            latencias = np.array(self._latencias) * 1000
+            esperas = np.array(self._esperas) * 1000
+            tamanhos = np.array(self._tamanhos_lote)
+            total_requisicoes = self._total_requisicoes
+            total_lotes = self._total_lotes
+
+        def percentil(valores: np.ndarray, q: float) -> float:
+            return float(np.percentile(valores, q)) if len(valores) else 0.0
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "total_requisicoes": total_requisicoes,
+            "total_lotes": total_lotes,
+            "tamanho_medio_lote": float(tamanhos.mean()) if len(tamanhos) else 0.0,
+            "fila_atual": self._fila.qsize(),
+            "espera_p50_ms": percentil(esperas, 50),
+            "espera_p99_ms": percentil(esperas, 99),
+            "latencia_p50_ms": percentil(latencias, 50),
+            "latencia_p99_ms": percentil(latencias, 99)
+        }
@@ -0,0 +1,213 @@
+"""
+Padding dinâmico e agrupamento por comprimento (bucketing)
+
+Redações são preenchidas apenas até a maior sequência do lote, e lotes
+são montados com redações de comprimento parecido, para que o custo de
+atenção acompanhe o tamanho real do texto em vez de MAX_LENGTH.
+"""
+import random
+import threading
+from typing import Dict, Iterator, List, Sequence
+
+import torch
+from torch.utils.data import Sampler
+from loguru import logger
+
+from app.core.config import settings
+
+
+class EstatisticasPadding:
+    """
+    Acumula quantos tokens foram processados com padding dinâmico
+    em comparação com o padding fixo em MAX_LENGTH
+    """
+
+    def __init__(self, nome: str, max_length: int = settings.MAX_LENGTH, log_a_cada: int = 100):
+        self.nome = nome
+        self.max_length = max_length
+        self.log_a_cada = log_a_cada
+
+        self._lock = threading.Lock()
+        self.lotes = 0
+        self.tokens_reais = 0  # tokens não-pad
+        self.tokens_processados = 0  # batch_size * seq_len do lote
+        self.tokens_max_length = 0  # batch_size * MAX_LENGTH (padding fixo)
+
+    def registrar(self, comprimentos: Sequence[int], seq_len: int):
+        """Registra um lote com os comprimentos reais e o seq_len após padding"""
+        with self._lock:
+            self.lotes += 1
+            self.tokens_reais += sum(comprimentos)
+            self.tokens_processados += len(comprimentos) * seq_len
+            self.tokens_max_length += len(comprimentos) * self.max_length
+            deve_logar = self.log_a_cada and self.lotes % self.log_a_cada == 0
+
+        if deve_logar:
+            self.logar()
+
+    def resumo(self) -> Dict[str, float]:
+        """Fração de padding restante e economizada em relação a MAX_LENGTH"""
+        with self._lock:
+            processados = self.tokens_processados
+            return {
+                "lotes": self.lotes,
+                "fracao_padding": (
+                    1.0 - self.tokens_reais / processados if processados else 0.0
+                ),
+                "fracao_padding_economizada": (
+                    1.0 - processados / self.tokens_max_length
+                    if self.tokens_max_length else 0.0
+                )
+            }
+
+    def logar(self):
+        """Loga o resumo acumulado"""
+        resumo = self.resumo()
+        logger.info(
+            f"Padding dinâmico ({self.nome}) - Lotes: {resumo['lotes']}, "
+            f"Padding restante: {resumo['fracao_padding'] * 100:.1f}%, "
+            f"Economizado vs MAX_LENGTH: {resumo['fracao_padding_economizada'] * 100:.1f}%"
+        )
+
+
+def pad_lote(
+    sequencias: Sequence[Sequence[int]],
+    pad_token_id: int,
+    device: str = "cpu"
+) -> Dict[str, torch.Tensor]:
+    """
+    Preenche as sequências até a maior do lote
+
+    Returns:
+        Dict com input_ids e attention_mask [batch_size, max(len)]
+    """
+    seq_len = max(len(seq) for seq in sequencias)
+
+    input_ids = torch.full((len(sequencias), seq_len), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequencias), seq_len), dtype=torch.long)
+
+    for i, seq in enumerate(sequencias):
+        input_ids[i, :len(seq)] = torch.as_tensor(seq, dtype=torch.long)
+        attention_mask[i, :len(seq)] = 1
+
+    return {
+        "input_ids": input_ids.to(device),
+        "attention_mask": attention_mask.to(device)
+    }
+
+
+def agrupar_por_comprimento(
+    comprimentos: Sequence[int],
+    tamanho_lote: int,
+    tolerancia: float = 0.25
+) -> List[List[int]]:
+    """
+    Agrupa índices em lotes de comprimentos parecidos
+
+    Ordena por comprimento e fecha o lote quando atinge tamanho_lote ou
+    quando a próxima sequência é mais de `tolerancia` maior que a menor
+    do lote (evitando que uma redação longa force padding nas curtas).
+
+    Returns:
+        Lista de lotes (listas de índices da entrada)
+    """
+    ordem = sorted(range(len(comprimentos)), key=lambda i: comprimentos[i])
+
+    lotes: List[List[int]] = []
+    atual: List[int] = []
+
+    for idx in ordem:
+        if atual and (
+            len(atual) >= tamanho_lote
+            or comprimentos[idx] > comprimentos[atual[0]] * (1 + tolerancia)
+        ):
+            lotes.append(atual)
+            atual = []
+        atual.append(idx)
+
+    if atual:
+        lotes.append(atual)
+
+    return lotes
+
+
+class LengthBucketBatchSampler(Sampler):
+    """
+    Batch sampler de treino que agrupa redações de comprimento parecido
+
+    Embaralha os índices, divide em janelas de batch_size * janela_lotes,
+    ordena cada janela por comprimento e corta em lotes; a ordem dos lotes
+    é embaralhada a cada época para manter a aleatoriedade do treino.
+    """
+
+    def __init__(
+        self,
+        comprimentos: Sequence[int],
+        batch_size: int,
+        shuffle: bool = True,
+        janela_lotes: int = 50,
+        seed: int = 42
+    ):
+        self.comprimentos = list(comprimentos)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.janela = batch_size * janela_lotes
+        self.seed = seed
+        self.epoca = 0
+
+    def set_epoch(self, epoca: int):
+        """Define a época (semente do embaralhamento)"""
+        self.epoca = epoca
+
+    def __iter__(self) -> Iterator[List[int]]:
+        indices = list(range(len(self.comprimentos)))
+        rng = random.Random(self.seed + self.epoca)
+        self.epoca += 1
+
+        if self.shuffle:
+            rng.shuffle(indices)
+
+        lotes = []
+        for inicio in range(0, len(indices), self.janela):
+            janela = sorted(
+                indices[inicio:inicio + self.janela],
+                key=lambda i: self.comprimentos[i]
+            )
+            lotes.extend(
+                janela[i:i + self.batch_size]
+                for i in range(0, len(janela), self.batch_size)
+            )
+
+        if self.shuffle:
+            rng.shuffle(lotes)
+
+        return iter(lotes)
+
+    def __len__(self) -> int:
+        return (len(self.comprimentos) + self.batch_size - 1) // self.batch_size
+
+
+class PadCollator:
+    """
+    collate_fn que aplica padding dinâmico aos itens de RedacaoDataset
+    (input_ids/attention_mask de tamanho variável) e empilha os alvos
+    """
+
+    def __init__(self, pad_token_id: int, nome: str = "treino"):
+        self.pad_token_id = pad_token_id
+        self.estatisticas = EstatisticasPadding(nome, log_a_cada=0)
+
+    def __call__(self, itens: List[Dict[str, torch.Tensor]]) -> Dict[str, torch.Tensor]:
+        sequencias = [item["input_ids"] for item in itens]
+        self.estatisticas.registrar(
+            [len(seq) for seq in sequencias],
+            max(len(seq) for seq in sequencias)
+        )
+
+        batch = pad_lote(sequencias, self.pad_token_id)
+
+        for chave in itens[0]:
+            if chave not in ("input_ids", "attention_mask"):
+                batch[chave] = torch.stack([item[chave] for item in itens])
+
+        return batch
@@ -3,39 +3,130 @@ Ensemble de modelos BERTimbau para maior confiabilidade
 """
 import torch
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 from loguru import logger
 
-from app.ml.model import RedacaoModel, ModeloTokenizer
+from app.ml.model import (
+    RedacaoModel,
+    MultiHeadRedacaoModel,
+    ModeloTokenizer,
+    matriz_agregacao
+)
+from app.ml.bucketing import agrupar_por_comprimento
 from app.core.config import settings
 
 
+MODOS_ENSEMBLE = ("independente", "multi_cabeca", "mc_dropout")
+
+BACKENDS_INFERENCIA = ("pytorch", "onnx")
+
+
 class EnsembleRedacaoModel:
     """
     Ensemble de múltiplos modelos RedacaoModel
     Usa média das predições e variância para estimar confiança
+
+    Modos (settings.ENSEMBLE_MODE):
+    - independente: num_models RedacaoModel completos (num_models forwards do BERT)
+    - multi_cabeca: um MultiHeadRedacaoModel com num_models cabeças (1 forward)
+    - mc_dropout: um RedacaoModel amostrado num_models vezes com dropout (1 forward)
+
+    Backends (settings.INFERENCE_BACKEND):
+    - pytorch: encoder eager
+    - onnx: encoder pelo ONNX Runtime (arquivos .onnx de export_onnx), em CPU
+
+    Com quantizar (settings.INFERENCE_QUANTIZE_INT8), as camadas Linear usam
+    pesos int8 com quantização dinâmica das ativações (apenas CPU): no
+    backend pytorch a conversão é feita ao carregar; no onnx são usados os
+    arquivos .int8.onnx gerados por export_onnx(quantizar=True).
     """
 
     def __init__(
         self,
         num_models: int = settings.ENSEMBLE_SIZE,
-        device: str = None
+        device: str = None,
+        modo: str = settings.ENSEMBLE_MODE,
+        backend: str = settings.INFERENCE_BACKEND,
+        quantizar: bool = settings.INFERENCE_QUANTIZE_INT8
     ):
+        if modo not in MODOS_ENSEMBLE:
+            raise ValueError(f"Modo de ensemble inválido: {modo}. Use um de {MODOS_ENSEMBLE}")
+        if backend not in BACKENDS_INFERENCIA:
+            raise ValueError(
+                f"Backend de inferência inválido: {backend}. Use um de {BACKENDS_INFERENCIA}"
+            )
+
         self.num_models = num_models
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        self.models: List[RedacaoModel] = []
+        self.modo = modo
+        self.backend = backend
+        self.quantizar = quantizar
+        if backend == "onnx" or quantizar:
+            # ONNX Runtime e kernels int8 dinâmicos servidos em CPU
+            self.device = "cpu"
+        else:
+            self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.models: List[torch.nn.Module] = []
+        # Encoder ONNX de cada membro (None = usar o BERT eager do modelo)
+        self.encoders: List[Optional[object]] = []
         self.tokenizer = ModeloTokenizer()
+        self.modo_codificacao = settings.ENCODING_MODE
+
+        logger.info(
+            f"Inicializando ensemble ({modo}, backend {backend}"
+            f"{', int8' if quantizar else ''}) com {num_models} membros no device {self.device}"
+        )
 
-        logger.info(f"Inicializando ensemble com {num_models} modelos no device {self.device}")
+    def add_model(self, model: RedacaoModel, encoder=None):
+        """
+        Adiciona um modelo ao ensemble
 
-    def add_model(self, model: RedacaoModel):
-        """Adiciona um modelo ao ensemble"""
+        Args:
+            model: Modelo (cabeças e, no backend pytorch, o BERT)
+            encoder: OnnxEncoder que substitui model.bert (backend onnx)
+        """
         model.to(self.device)
         model.eval()
         self.models.append(model)
+        self.encoders.append(encoder)
         logger.info(f"Modelo adicionado ao ensemble. Total: {len(self.models)}")
 
+    def _carregar_membro(self, model: torch.nn.Module, model_file: Path) -> bool:
+        """
+        Carrega os pesos do membro e, no backend onnx, o encoder exportado
+        (o BERT eager é descartado para liberar memória)
+
+        Returns:
+            True se o membro foi adicionado
+        """
+        model.load_state_dict(torch.load(model_file, map_location=self.device))
+
+        if self.backend != "onnx":
+            if self.quantizar:
+                model = torch.quantization.quantize_dynamic(
+                    model,
+                    {torch.nn.Linear},
+                    dtype=torch.qint8,
+                    inplace=True
+                )
+            self.add_model(model)
+            return True
+
+        from app.ml.export import OnnxEncoder
+
+        onnx_file = model_file.with_suffix(".int8.onnx" if self.quantizar else ".onnx")
+        if not onnx_file.exists():
+            logger.warning(
+                f"Encoder ONNX não encontrado: {onnx_file}. "
+                "Execute training/export_onnx.py para exportar o ensemble."
+            )
+            return False
+
+        encoder = OnnxEncoder(onnx_file)
+        model.bert = None
+        self.add_model(model, encoder=encoder)
+        return True
+
     def load_ensemble(self, model_dir: str, version: str):
         """
         Carrega ensemble de modelos salvos
@@ -49,13 +140,26 @@ class EnsembleRedacaoModel:
             logger.warning(f"Diretório do modelo não encontrado: {model_path}")
             return False
 
-        for i in range(self.num_models):
+        if self.modo == "multi_cabeca":
+            model_file = model_path / "model_multi_cabeca.pt"
+            if model_file.exists():
+                model = MultiHeadRedacaoModel(num_cabecas=self.num_models)
+                if self._carregar_membro(model, model_file):
+                    logger.info(f"Modelo multi-cabeça carregado: {model_file}")
+            else:
+                logger.warning(f"Modelo multi-cabeça não encontrado: {model_file}")
+
+            return len(self.models) > 0
+
+        # mc_dropout reaproveita o primeiro modelo do ensemble independente
+        num_arquivos = 1 if self.modo == "mc_dropout" else self.num_models
+
+        for i in range(num_arquivos):
             model_file = model_path / f"model_{i}.pt"
             if model_file.exists():
                 model = RedacaoModel()
-                model.load_state_dict(torch.load(model_file, map_location=self.device))
-                self.add_model(model)
-                logger.info(f"Modelo {i} carregado: {model_file}")
+                if self._carregar_membro(model, model_file):
+                    logger.info(f"Modelo {i} carregado: {model_file}")
             else:
                 logger.warning(f"Modelo {i} não encontrado: {model_file}")
 
@@ -69,13 +173,52 @@ class EnsembleRedacaoModel:
             model_dir: Diretório para salvar
             version: Versão do modelo
         """
+        if self.backend != "pytorch" or self.quantizar:
+            raise ValueError("save_ensemble requer o backend pytorch sem quantização")
+
         model_path = Path(model_dir) / version
         model_path.mkdir(parents=True, exist_ok=True)
 
-        for i, model in enumerate(self.models):
-            model_file = model_path / f"model_{i}.pt"
+        for model_file, model in zip(self._arquivos_membros(model_path), self.models):
             torch.save(model.state_dict(), model_file)
-            logger.info(f"Modelo {i} salvo: {model_file}")
+            logger.info(f"Modelo salvo: {model_file}")
+
+    def export_onnx(self, model_dir: str, version: str, quantizar: bool = False):
+        """
+        Exporta o encoder de cada membro para ONNX otimizado, ao lado do
+        .pt correspondente (model_{i}.onnx / model_multi_cabeca.onnx)
+
+        Args:
+            model_dir: Diretório base dos modelos
+            version: Versão do modelo
+            quantizar: Se True, grava também a versão int8 (.int8.onnx)
+        """
+        if self.backend != "pytorch" or self.quantizar:
+            raise ValueError("export_onnx requer o backend pytorch sem quantização")
+
+        from app.ml.export import (
+            exportar_encoder_onnx, quantizar_onnx, verificar_paridade_encoder
+        )
+
+        # Cada grafo é conferido contra o BERT eager antes de seguir:
+        # ParidadeOnnxError interrompe a exportação (e a promoção no re-treino)
+        model_path = Path(model_dir) / version
+        for model_file, model in zip(self._arquivos_membros(model_path), self.models):
+            onnx_file = exportar_encoder_onnx(model.bert, model_file.with_suffix(".onnx"))
+            verificar_paridade_encoder(model.bert, onnx_file)
+            if quantizar:
+                int8_file = quantizar_onnx(onnx_file, model_file.with_suffix(".int8.onnx"))
+                verificar_paridade_encoder(
+                    model.bert,
+                    int8_file,
+                    similaridade_minima=settings.ONNX_PARITY_MIN_COSINE_INT8
+                )
+
+    def _arquivos_membros(self, model_path: Path) -> List[Path]:
+        """Arquivos .pt dos membros carregados, conforme o modo"""
+        if self.modo == "multi_cabeca":
+            return [model_path / "model_multi_cabeca.pt"]
+        return [model_path / f"model_{i}.pt" for i in range(len(self.models))]
 
     @torch.no_grad()
     def predict(
@@ -93,34 +236,189 @@ class EnsembleRedacaoModel:
         Returns:
             Dict com predições médias, desvios padrão e confiança
         """
+        return self.predict_batch([texto], return_individual=return_individual)[0]
+
+    @torch.no_grad()
+    def predict_batch(
+        self,
+        textos: List[str],
+        return_individual: bool = False,
+        incluir_atencao: bool = False,
+        tamanho_lote: Optional[int] = None
+    ) -> List[Dict[str, any]]:
+        """
+        Faz predição de várias redações com um forward por modelo para cada
+        grupo de comprimento parecido (padding dinâmico)
+
+        Args:
+            textos: Lista de redações
+            return_individual: Se True, retorna predições individuais
+            incluir_atencao: Se True, inclui em "atencao" a atenção do [CLS]
+                do primeiro modelo, capturada no mesmo forward da predição
+            tamanho_lote: Redações por forward (padrão: INFERENCE_MAX_BATCH_SIZE)
+
+        Returns:
+            Lista de dicts (mesma ordem de textos) no formato de predict()
+        """
         if not self.models:
             raise ValueError("Nenhum modelo carregado no ensemble")
 
-        # Tokenizar
-        encoding = self.tokenizer.encode(texto, device=self.device)
+        # Tokenizar sem padding (uma ou mais janelas por redação) e agrupar
+        # redações de comprimento parecido; cada grupo é preenchido só até
+        # a sua maior janela
+        janelas = self._tokenizar(textos)
+        grupos = agrupar_por_comprimento(
+            [sum(len(janela) for janela in js) for js in janelas],
+            tamanho_lote=max(1, tamanho_lote or settings.INFERENCE_MAX_BATCH_SIZE)
+        )
+
+        resultados: List[Dict[str, any]] = [None] * len(textos)
+
+        for grupo in grupos:
+            # Todas as janelas de todas as redações do grupo em um só forward
+            sequencias: List[List[int]] = []
+            primeira_janela: List[int] = []
+            janela_para_redacao: List[int] = []
+
+            for j, idx in enumerate(grupo):
+                primeira_janela.append(len(sequencias))
+                sequencias.extend(janelas[idx])
+                janela_para_redacao.extend([j] * len(janelas[idx]))
+
+            encoding = self.tokenizer.montar_lote(sequencias, device=self.device)
+
+            matriz = None
+            if len(sequencias) > len(grupo):
+                matriz = matriz_agregacao(janela_para_redacao, len(grupo), device=self.device)
+
+            # Coletar predições de todos os membros
+            all_competencias, all_scores, atencao_cls = self._forward_membros(
+                encoding["input_ids"],
+                encoding["attention_mask"],
+                capturar_atencao=incluir_atencao,
+                matriz_agregacao=matriz
+            )
+
+            for j, idx in enumerate(grupo):
+                resultado = self._montar_resultado(
+                    all_competencias[:, j, :],
+                    all_scores[:, j, :],
+                    return_individual
+                )
+
+                if atencao_cls is not None:
+                    # Mesmo formato de get_attention_maps (sem a matriz completa),
+                    # usando a primeira janela da redação
+                    janela = janelas[idx][0]
+                    resultado["atencao"] = {
+                        "tokens": self.tokenizer.tokenizer.convert_ids_to_tokens(janela),
+                        "attention_weights": atencao_cls[primeira_janela[j], :len(janela)]
+                    }
+
+                resultados[idx] = resultado
+
+        return resultados
+
+    def _tokenizar(self, textos: List[str]) -> List[List[List[int]]]:
+        """
+        Tokeniza conforme ENCODING_MODE
+
+        Returns:
+            Para cada texto, a lista de janelas (uma só no modo truncar)
+        """
+        if self.modo_codificacao == "janelas":
+            return self.tokenizer.tokenizar_janelas(textos)
+        return [[seq] for seq in self.tokenizer.tokenizar(textos)]
+
+    def _forward_membros(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor,
+        capturar_atencao: bool = False,
+        matriz_agregacao: Optional[torch.Tensor] = None
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Executa todos os membros do ensemble conforme o modo
+
+        Args:
+            input_ids/attention_mask: [num_janelas, seq_len]
+            capturar_atencao: Se True, o primeiro encoder roda com
+                output_attentions e a atenção do [CLS] é retornada
+            matriz_agregacao: [batch_size, num_janelas] para combinar as
+                janelas de cada redação (None = uma janela por redação)
+
+        Returns:
+            competencias: [num_membros, batch_size, 5]
+            scores: [num_membros, batch_size, 1]
+            atencao_cls: [num_janelas, seq_len] ou None
+        """
+        atencao_cls = None
+
+        def codificar(i: int, capturar: bool) -> torch.Tensor:
+            nonlocal atencao_cls
+            model, encoder = self.models[i], self.encoders[i]
+            if encoder is not None:
+                # O grafo ONNX sempre produz a atenção do [CLS]
+                pooled_output, atencao = encoder.codificar(input_ids, attention_mask)
+                if capturar:
+                    atencao_cls = atencao.numpy()
+            elif capturar:
+                pooled_output, atencao = model.codificar_com_atencao(input_ids, attention_mask)
+                atencao_cls = atencao.cpu().numpy()
+            else:
+                pooled_output = model.codificar(input_ids, attention_mask)
+
+            # Média do [CLS] das janelas de cada redação
+            if matriz_agregacao is not None:
+                pooled_output = matriz_agregacao @ pooled_output
+
+            return pooled_output
+
+        if self.modo == "multi_cabeca":
+            model = self.models[0]
+            competencias, score_total = model.prever(codificar(0, capturar_atencao))
+            return competencias.cpu().numpy(), score_total.cpu().numpy(), atencao_cls
+
+        if self.modo == "mc_dropout":
+            model = self.models[0]
+            pooled_output = codificar(0, capturar_atencao)
+            competencias, score_total = model.prever_mc_dropout(pooled_output, self.num_models)
+            return competencias.cpu().numpy(), score_total.cpu().numpy(), atencao_cls
 
-        # Coletar predições de todos os modelos
         all_competencias = []
         all_scores = []
 
-        for model in self.models:
-            competencias, score_total = model(
-                input_ids=encoding["input_ids"],
-                attention_mask=encoding["attention_mask"]
+        for i, model in enumerate(self.models):
+            # Atenção apenas do primeiro modelo, no mesmo forward da predição
+            competencias, score_total = model.prever(
+                codificar(i, capturar_atencao and i == 0)
             )
             all_competencias.append(competencias.cpu().numpy())
             all_scores.append(score_total.cpu().numpy())
 
         # Converter para arrays numpy
-        all_competencias = np.array(all_competencias)  # [num_models, batch_size, 5]
-        all_scores = np.array(all_scores)  # [num_models, batch_size, 1]
+        return np.array(all_competencias), np.array(all_scores), atencao_cls
 
+    def _montar_resultado(
+        self,
+        competencias: np.ndarray,
+        scores: np.ndarray,
+        return_individual: bool = False
+    ) -> Dict[str, any]:
+        """
+        Agrega as predições dos modelos para uma redação
+
+        Args:
+            competencias: Predições por modelo [num_models, 5]
+            scores: Scores por modelo [num_models, 1]
+            return_individual: Se True, inclui predições individuais
+        """
         # Calcular médias e desvios padrão
-        competencias_mean = all_competencias.mean(axis=0)[0]  # [5]
-        competencias_std = all_competencias.std(axis=0)[0]  # [5]
+        competencias_mean = competencias.mean(axis=0)  # [5]
+        competencias_std = competencias.std(axis=0)  # [5]
 
-        score_mean = all_scores.mean()
-        score_std = all_scores.std()
+        score_mean = scores.mean()
+        score_std = scores.std()
 
         # Calcular confiança baseada na concordância entre modelos
         # Menor variância = maior confiança
@@ -140,13 +438,14 @@ class EnsembleRedacaoModel:
             },
             "confianca": float(confianca),
             "confianca_nivel": self._classificar_confianca(confianca),
-            "num_modelos": len(self.models)
+            "num_modelos": len(competencias)
         }
 
         if return_individual:
+            # Mantém o formato [num_models, 1, ...] das predições por modelo
             result["predicoes_individuais"] = {
-                "competencias": all_competencias.tolist(),
-                "scores": all_scores.tolist()
+                "competencias": competencias[:, None, :].tolist(),
+                "scores": scores[:, None, :].tolist()
             }
 
         return result
@@ -202,6 +501,21 @@ class EnsembleRedacaoModel:
 
         encoding = self.tokenizer.encode(texto, device=self.device)
 
+        tokens = self.tokenizer.tokenizer.convert_ids_to_tokens(
+            encoding["input_ids"][0].cpu().tolist()
+        )
+
+        if self.encoders[0] is not None:
+            # O grafo ONNX exporta apenas a linha do [CLS], sem a matriz completa
+            _, atencao = self.encoders[0].codificar(
+                encoding["input_ids"],
+                encoding["attention_mask"]
+            )
+            return {
+                "tokens": tokens,
+                "attention_weights": atencao[0].numpy()
+            }
+
         # Usar primeiro modelo
         attention_weights = self.models[0].get_attention_weights(
             input_ids=encoding["input_ids"],
@@ -215,11 +529,6 @@ class EnsembleRedacaoModel:
         # Atenção sobre [CLS] token (primeira posição)
         cls_attention = avg_attention[0, :].cpu().numpy()  # [seq_len]
 
-        # Decodificar tokens
-        tokens = self.tokenizer.tokenizer.convert_ids_to_tokens(
-            encoding["input_ids"][0].cpu().tolist()
-        )
-
         return {
             "tokens": tokens,
             "attention_weights": cls_attention,
@@ -2,7 +2,7 @@
 Explainer - Interpretabilidade das predições
 """
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
 
 from app.ml.ensemble import EnsembleRedacaoModel
@@ -19,7 +19,8 @@ class RedacaoExplainer:
     def explain(
         self,
         texto: str,
-        top_k: int = 10
+        top_k: int = 10,
+        attention_data: Optional[Dict[str, any]] = None
     ) -> Dict[str, any]:
         """
         Explica a predição destacando trechos importantes
@@ -27,13 +28,17 @@ class RedacaoExplainer:
         Args:
             texto: Texto da redação
             top_k: Número de tokens mais importantes a retornar
+            attention_data: Atenção já capturada no forward da predição
+                ("atencao" de ensemble.predict_batch). Se None, roda o
+                encoder novamente via get_attention_maps
 
         Returns:
             Dict com tokens e seus pesos de atenção
         """
         try:
             # Obter mapas de atenção
-            attention_data = self.ensemble.get_attention_maps(texto)
+            if attention_data is None:
+                attention_data = self.ensemble.get_attention_maps(texto)
 
             tokens = attention_data["tokens"]
             weights = attention_data["attention_weights"]
@@ -0,0 +1,312 @@
+"""
+Exportação ONNX - Grafo otimizado do encoder para servir em CPU
+
+Apenas o BERT de cada membro é exportado: as cabeças são MLPs pequenas e
+continuam em PyTorch, o que mantém a agregação por janelas e o modo
+mc_dropout (dropout ativo nas cabeças) iguais aos do backend pytorch.
+"""
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+import onnxruntime as ort
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from loguru import logger
+
+from app.ml.model import codificar_bert
+from app.core.config import settings
+
+
+ONNX_OPSET = 14
+
+# Lote da verificação de paridade: tamanho e comprimentos diferentes do
+# exemplo da exportação (2 x 16), com padding, para exercitar os eixos
+# dinâmicos e a máscara
+COMPRIMENTOS_PARIDADE = [48, 31, 7]
+
+
+class ParidadeOnnxError(RuntimeError):
+    """O grafo exportado não reproduz o encoder PyTorch dentro da tolerância"""
+
+
+class EncoderExportavel(nn.Module):
+    """Envolve o BERT para exportar [CLS] e atenção do [CLS] como saídas do grafo"""
+
+    def __init__(self, bert: nn.Module):
+        super(EncoderExportavel, self).__init__()
+        self.bert = bert
+
+    def forward(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        return codificar_bert(self.bert, input_ids, attention_mask, retornar_atencao=True)
+
+
+def exportar_encoder_onnx(
+    bert: nn.Module,
+    caminho: Path,
+    otimizar: bool = True
+) -> Path:
+    """
+    Exporta o encoder para ONNX com eixos dinâmicos de batch e sequência
+
+    Args:
+        bert: Backbone do modelo (model.bert)
+        caminho: Arquivo .onnx de destino
+        otimizar: Se True, grava o grafo já otimizado pelo ONNX Runtime
+
+    Returns:
+        Caminho do arquivo gerado
+    """
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+
+    encoder = EncoderExportavel(bert).cpu().eval()
+    exemplo = (
+        torch.ones((2, 16), dtype=torch.long),
+        torch.ones((2, 16), dtype=torch.long)
+    )
+
+    caminho_bruto = caminho.with_suffix(".bruto.onnx") if otimizar else caminho
+
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder,
+            exemplo,
+            str(caminho_bruto),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["pooled_output", "atencao_cls"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "seq"},
+                "attention_mask": {0: "batch", 1: "seq"},
+                "pooled_output": {0: "batch"},
+                "atencao_cls": {0: "batch", 1: "seq"}
+            },
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True
+        )
+
+    if otimizar:
+        otimizar_grafo(caminho_bruto, caminho)
+        os.remove(caminho_bruto)
+
+    logger.info(f"Encoder exportado para ONNX: {caminho}")
+    return caminho
+
+
+def otimizar_grafo(caminho_entrada: Path, caminho_saida: Path):
+    """
+    Aplica as otimizações de grafo do ONNX Runtime (constant folding,
+    fusões de GELU/LayerNorm/MatMul+Add) e grava o resultado
+
+    Usa o nível EXTENDED: o grafo salvo continua portável entre máquinas
+    com CPU, e o nível ALL é aplicado de novo ao carregar a sessão.
+    """
+    opcoes = ort.SessionOptions()
+    opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    opcoes.optimized_model_filepath = str(caminho_saida)
+
+    ort.InferenceSession(
+        str(caminho_entrada),
+        sess_options=opcoes,
+        providers=["CPUExecutionProvider"]
+    )
+
+
+def quantizar_onnx(caminho_entrada: Path, caminho_saida: Path) -> Path:
+    """
+    Quantização dinâmica int8 dos pesos do grafo (MatMul/Gemm); as
+    ativações são quantizadas em tempo de execução
+
+    Returns:
+        Caminho do arquivo gerado
+    """
+    quantize_dynamic(
+        str(caminho_entrada),
+        str(caminho_saida),
+        weight_type=QuantType.QInt8
+    )
+    logger.info(f"Encoder ONNX quantizado (int8): {caminho_saida}")
+    return Path(caminho_saida)
+
+
+class OnnxEncoder:
+    """
+    Encoder servido pelo ONNX Runtime, com a mesma saída de codificar_bert
+
+    Sessões do ONNX Runtime aceitam chamadas concorrentes, então uma
+    instância por membro atende o pool de inferência inteiro.
+    """
+
+    def __init__(self, caminho: Path, num_threads: int = settings.ONNX_NUM_THREADS):
+        opcoes = ort.SessionOptions()
+        opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            opcoes.intra_op_num_threads = num_threads
+
+        self.caminho = Path(caminho)
+        self.sessao = ort.InferenceSession(
+            str(self.caminho),
+            sess_options=opcoes,
+            providers=["CPUExecutionProvider"]
+        )
+        logger.info(f"Encoder ONNX carregado: {self.caminho}")
+
+    def codificar(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Returns:
+            pooled_output: [batch_size, hidden_size]
+            atencao_cls: [batch_size, seq_len]
+        """
+        pooled_output, atencao_cls = self.sessao.run(
+            ["pooled_output", "atencao_cls"],
+            {
+                "input_ids": input_ids.cpu().numpy().astype(np.int64),
+                "attention_mask": attention_mask.cpu().numpy().astype(np.int64)
+            }
+        )
+        return torch.from_numpy(pooled_output), torch.from_numpy(atencao_cls)
+
+
+def verificar_paridade_encoder(
+    bert: nn.Module,
+    caminho: Path,
+    tolerancia: float = settings.ONNX_PARITY_TOLERANCE,
+    similaridade_minima: Optional[float] = None
+) -> Dict[str, float]:
+    """
+    Compara o encoder exportado (carregado por OnnxEncoder, como em
+    produção) com o BERT eager em um lote sintético com padding dinâmico
+
+    Chamada a cada exportação (EnsembleRedacaoModel.export_onnx): uma
+    regressão nos eixos dinâmicos, no opset ou nos nomes das entradas
+    falha a exportação em vez de chegar à produção.
+
+    Args:
+        bert: Backbone exportado
+        caminho: Arquivo .onnx (fp32 ou int8)
+        tolerancia: Diferença absoluta máxima no [CLS] e na atenção (fp32)
+        similaridade_minima: Se informada, compara pela similaridade de
+            cosseno mínima do [CLS] em vez da diferença absoluta (int8)
+
+    Returns:
+        Dict com as diferenças e a similaridade mínima
+
+    Raises:
+        ParidadeOnnxError: fora da tolerância
+    """
+    bert = bert.cpu().eval()
+    gerador = torch.Generator().manual_seed(0)
+    pad_token_id = getattr(bert.config, "pad_token_id", None) or 0
+
+    seq_len = max(COMPRIMENTOS_PARIDADE)
+    input_ids = torch.randint(
+        5, bert.config.vocab_size, (len(COMPRIMENTOS_PARIDADE), seq_len), generator=gerador
+    )
+    attention_mask = torch.zeros_like(input_ids)
+    for i, comprimento in enumerate(COMPRIMENTOS_PARIDADE):
+        attention_mask[i, :comprimento] = 1
+        input_ids[i, comprimento:] = pad_token_id
+
+    with torch.no_grad():
+        pooled_eager, atencao_eager = codificar_bert(
+            bert, input_ids, attention_mask, retornar_atencao=True
+        )
+    pooled_onnx, atencao_onnx = OnnxEncoder(caminho, num_threads=1).codificar(
+        input_ids, attention_mask
+    )
+
+    resultado = {
+        "diff_max_pooled": float((pooled_eager - pooled_onnx).abs().max()),
+        "diff_max_atencao": float((atencao_eager - atencao_onnx).abs().max()),
+        "similaridade_min": float(
+            torch.nn.functional.cosine_similarity(pooled_eager, pooled_onnx, dim=1).min()
+        )
+    }
+
+    if similaridade_minima is None:
+        ok = (
+            resultado["diff_max_pooled"] <= tolerancia
+            and resultado["diff_max_atencao"] <= tolerancia
+        )
+    else:
+        ok = resultado["similaridade_min"] >= similaridade_minima
+
+    if not ok:
+        raise ParidadeOnnxError(f"Paridade do encoder {caminho} falhou: {resultado}")
+
+    logger.info(f"Paridade do encoder {Path(caminho).name} verificada: {resultado}")
+    return resultado
+
+
+def verificar_paridade(
+    model_dir: str,
+    version: str,
+    textos: List[str],
+    tolerancia: float = 0.5
+) -> Dict[str, float]:
+    """
+    Compara as predições do backend onnx com as do modelo eager
+
+    Args:
+        model_dir: Diretório base dos modelos
+        version: Versão com os .pt e os .onnx exportados
+        textos: Redações de referência
+        tolerancia: Diferença absoluta máxima aceita (em pontos da nota)
+
+    Returns:
+        Dict com as diferenças máximas e "ok"
+    """
+    # Import local: ensemble importa este módulo ao carregar o backend onnx
+    from app.ml.ensemble import EnsembleRedacaoModel, BACKENDS_INFERENCIA
+
+    ensembles = {}
+    for backend in BACKENDS_INFERENCIA:
+        ensemble = EnsembleRedacaoModel(device="cpu", backend=backend, quantizar=False)
+        if not ensemble.load_ensemble(model_dir, version):
+            raise ValueError(f"Falha ao carregar versão {version} com backend {backend}")
+        ensembles[backend] = ensemble
+
+    # Mesma semente: no modo mc_dropout as máscaras das cabeças coincidem
+    torch.manual_seed(0)
+    eager = ensembles["pytorch"].predict_batch(textos, return_individual=True)
+    torch.manual_seed(0)
+    onnx = ensembles["onnx"].predict_batch(textos, return_individual=True)
+
+    diff_competencias = max(
+        float(np.abs(
+            np.array(a["predicoes_individuais"]["competencias"])
+            - np.array(b["predicoes_individuais"]["competencias"])
+        ).max())
+        for a, b in zip(eager, onnx)
+    )
+    diff_score = max(
+        float(np.abs(
+            np.array(a["predicoes_individuais"]["scores"])
+            - np.array(b["predicoes_individuais"]["scores"])
+        ).max())
+        for a, b in zip(eager, onnx)
+    )
+
+    resultado = {
+        "num_textos": len(textos),
+        "diff_max_competencias": diff_competencias,
+        "diff_max_score": diff_score,
+        "ok": diff_competencias <= tolerancia and diff_score <= tolerancia
+    }
+
+    if resultado["ok"]:
+        logger.info(f"Paridade ONNX x PyTorch verificada: {resultado}")
+    else:
+        logger.error(f"Paridade ONNX x PyTorch falhou: {resultado}")
+
+    return resultado
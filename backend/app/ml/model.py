@@ -4,9 +4,10 @@ Modelo base BERTimbau para correção de redações
 import torch
 import torch.nn as nn
 from transformers import AutoModel, AutoTokenizer
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
 
+from app.ml.bucketing import EstatisticasPadding, pad_lote
 from app.core.config import settings
 
 
@@ -34,26 +35,10 @@ class RedacaoModel(nn.Module):
         self.dropout = nn.Dropout(dropout)
 
         # Camadas de predição para cada competência (0-200 cada)
-        self.competencia_heads = nn.ModuleList([
-            nn.Sequential(
-                nn.Linear(self.hidden_size, 256),
-                nn.ReLU(),
-                nn.Dropout(dropout),
-                nn.Linear(256, 1)  # Regressão para valor 0-200
-            )
-            for _ in range(5)  # 5 competências
-        ])
+        self.competencia_heads = criar_competencia_heads(self.hidden_size, dropout)
 
         # Camada de predição para score total (0-1000)
-        self.score_head = nn.Sequential(
-            nn.Linear(self.hidden_size, 512),
-            nn.ReLU(),
-            nn.Dropout(dropout),
-            nn.Linear(512, 256),
-            nn.ReLU(),
-            nn.Dropout(dropout),
-            nn.Linear(256, 1)  # Regressão para valor 0-1000
-        )
+        self.score_head = criar_score_head(self.hidden_size, dropout)
 
     def forward(
         self,
@@ -71,31 +56,79 @@ class RedacaoModel(nn.Module):
             competencias: Tensor com 5 competências preditas
             score_total: Tensor com score total predito
         """
-        # BERT encoding
-        outputs = self.bert(
-            input_ids=input_ids,
-            attention_mask=attention_mask
+        pooled_output = self.codificar(input_ids, attention_mask)
+        return self.prever(pooled_output)
+
+    def codificar(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        """
+        Passa a redação pelo BERT
+
+        Returns:
+            Representação [CLS] da redação [batch_size, hidden_size]
+        """
+        pooled_output, _ = codificar_bert(self.bert, input_ids, attention_mask)
+        return pooled_output
+
+    def codificar_com_atencao(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Passa a redação pelo BERT capturando a atenção da última camada
+        no mesmo forward (usada pelo explainer sem custo extra de encoder)
+
+        Returns:
+            pooled_output: [batch_size, hidden_size]
+            atencao_cls: Atenção do [CLS] sobre cada token [batch_size, seq_len]
+        """
+        return codificar_bert(self.bert, input_ids, attention_mask, retornar_atencao=True)
+
+    def prever(self, pooled_output: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Aplica as cabeças de predição sobre a representação [CLS]
+
+        Returns:
+            competencias: [batch_size, 5] (0-200)
+            score_total: [batch_size, 1] (0-1000)
+        """
+        return aplicar_heads(
+            self.dropout(pooled_output),
+            self.competencia_heads,
+            self.score_head
         )
 
-        # Usar [CLS] token (primeiro token) como representação da redação
-        pooled_output = outputs.last_hidden_state[:, 0, :]  # [batch_size, hidden_size]
-        pooled_output = self.dropout(pooled_output)
+    def prever_mc_dropout(
+        self,
+        pooled_output: torch.Tensor,
+        num_amostras: int
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        MC-dropout: repete as cabeças com dropout ativo sobre um único
+        encoding, estimando a incerteza sem novos forwards do BERT
 
-        # Predizer cada competência
-        competencias = []
-        for head in self.competencia_heads:
-            comp = head(pooled_output)  # [batch_size, 1]
-            # Aplicar sigmoid e escalar para 0-200
-            comp = torch.sigmoid(comp) * 200
-            competencias.append(comp)
+        Returns:
+            competencias: [num_amostras, batch_size, 5]
+            score_total: [num_amostras, batch_size, 1]
+        """
+        cabecas = [self.dropout, self.competencia_heads, self.score_head]
+        modos_anteriores = [m.training for m in cabecas]
 
-        competencias = torch.cat(competencias, dim=1)  # [batch_size, 5]
+        for modulo in cabecas:
+            modulo.train()
 
-        # Predizer score total
-        score_total = self.score_head(pooled_output)  # [batch_size, 1]
-        # Aplicar sigmoid e escalar para 0-1000
-        score_total = torch.sigmoid(score_total) * 1000
+        try:
+            amostras = [self.prever(pooled_output) for _ in range(num_amostras)]
+        finally:
+            for modulo, modo in zip(cabecas, modos_anteriores):
+                modulo.train(modo)
 
+        competencias = torch.stack([c for c, _ in amostras])
+        score_total = torch.stack([s for _, s in amostras])
         return competencias, score_total
 
     def get_attention_weights(
@@ -117,17 +150,228 @@ class RedacaoModel(nn.Module):
         return outputs.attentions  # Tupla de tensores, um por camada
 
 
+class MultiHeadRedacaoModel(nn.Module):
+    """
+    Ensemble com backbone compartilhado: um único BERT e N conjuntos
+    independentes de cabeças (competencia_heads + score_head).
+    Cada redação custa um forward do encoder, não N.
+    """
+
+    def __init__(
+        self,
+        num_cabecas: int = settings.ENSEMBLE_SIZE,
+        model_name: str = settings.MODEL_NAME,
+        dropout: float = 0.3,
+        congelar_backbone: bool = settings.ENSEMBLE_FREEZE_BACKBONE
+    ):
+        super(MultiHeadRedacaoModel, self).__init__()
+
+        self.model_name = model_name
+        self.num_cabecas = num_cabecas
+        logger.info(f"Inicializando modelo multi-cabeça: {model_name} ({num_cabecas} cabeças)")
+
+        # BERT backbone compartilhado
+        self.bert = AutoModel.from_pretrained(model_name)
+        self.hidden_size = self.bert.config.hidden_size
+
+        if congelar_backbone:
+            for param in self.bert.parameters():
+                param.requires_grad = False
+            logger.info("Backbone congelado - apenas as cabeças serão treinadas")
+
+        self.dropout = nn.Dropout(dropout)
+
+        # Um conjunto de cabeças por membro do ensemble
+        self.membros = nn.ModuleList([
+            nn.ModuleDict({
+                "competencia_heads": criar_competencia_heads(self.hidden_size, dropout),
+                "score_head": criar_score_head(self.hidden_size, dropout)
+            })
+            for _ in range(num_cabecas)
+        ])
+
+    def forward(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Forward pass com um encoder e todas as cabeças
+
+        Returns:
+            competencias: [num_cabecas, batch_size, 5]
+            score_total: [num_cabecas, batch_size, 1]
+        """
+        pooled_output = self.codificar(input_ids, attention_mask)
+        return self.prever(pooled_output)
+
+    def codificar(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        """Representação [CLS] do backbone compartilhado [batch_size, hidden_size]"""
+        pooled_output, _ = codificar_bert(self.bert, input_ids, attention_mask)
+        return pooled_output
+
+    def codificar_com_atencao(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Como codificar, retornando também a atenção do [CLS] [batch_size, seq_len]"""
+        return codificar_bert(self.bert, input_ids, attention_mask, retornar_atencao=True)
+
+    def prever(self, pooled_output: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Aplica todas as cabeças sobre a representação [CLS]
+
+        Returns:
+            competencias: [num_cabecas, batch_size, 5]
+            score_total: [num_cabecas, batch_size, 1]
+        """
+        pooled_output = self.dropout(pooled_output)
+
+        predicoes = [
+            aplicar_heads(pooled_output, membro["competencia_heads"], membro["score_head"])
+            for membro in self.membros
+        ]
+
+        competencias = torch.stack([c for c, _ in predicoes])
+        score_total = torch.stack([s for _, s in predicoes])
+        return competencias, score_total
+
+    def get_attention_weights(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        """Retorna attention weights do backbone compartilhado"""
+        outputs = self.bert(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            output_attentions=True
+        )
+        return outputs.attentions
+
+
+def codificar_bert(
+    bert: nn.Module,
+    input_ids: torch.Tensor,
+    attention_mask: torch.Tensor,
+    retornar_atencao: bool = False
+) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+    """
+    Forward do BERT retornando a representação [CLS] e, opcionalmente,
+    a atenção do [CLS] na última camada (média das cabeças)
+
+    Returns:
+        pooled_output: [batch_size, hidden_size]
+        atencao_cls: [batch_size, seq_len] ou None
+    """
+    outputs = bert(
+        input_ids=input_ids,
+        attention_mask=attention_mask,
+        output_attentions=retornar_atencao
+    )
+
+    # Usar [CLS] token (primeiro token) como representação da redação
+    pooled_output = outputs.last_hidden_state[:, 0, :]  # [batch_size, hidden_size]
+
+    atencao_cls = None
+    if retornar_atencao:
+        # Última camada [batch_size, num_heads, seq_len, seq_len] -> linha do [CLS]
+        atencao_cls = outputs.attentions[-1].mean(dim=1)[:, 0, :]
+
+    return pooled_output, atencao_cls
+
+
+def matriz_agregacao(
+    janela_para_redacao: List[int],
+    num_redacoes: int,
+    device: str = "cpu"
+) -> torch.Tensor:
+    """
+    Matriz [num_redacoes, num_janelas] que, multiplicada pelo [CLS] das
+    janelas, produz a média por redação (codificação por janelas)
+    """
+    num_janelas = len(janela_para_redacao)
+    matriz = torch.zeros(num_redacoes, num_janelas, device=device)
+    matriz[
+        torch.as_tensor(janela_para_redacao, device=device),
+        torch.arange(num_janelas, device=device)
+    ] = 1.0
+    return matriz / matriz.sum(dim=1, keepdim=True)
+
+
+def criar_competencia_heads(hidden_size: int, dropout: float) -> nn.ModuleList:
+    """Cria as 5 cabeças de regressão das competências (0-200 cada)"""
+    return nn.ModuleList([
+        nn.Sequential(
+            nn.Linear(hidden_size, 256),
+            nn.ReLU(),
+            nn.Dropout(dropout),
+            nn.Linear(256, 1)  # Regressão para valor 0-200
+        )
+        for _ in range(5)  # 5 competências
+    ])
+
+
+def criar_score_head(hidden_size: int, dropout: float) -> nn.Sequential:
+    """Cria a cabeça de regressão do score total (0-1000)"""
+    return nn.Sequential(
+        nn.Linear(hidden_size, 512),
+        nn.ReLU(),
+        nn.Dropout(dropout),
+        nn.Linear(512, 256),
+        nn.ReLU(),
+        nn.Dropout(dropout),
+        nn.Linear(256, 1)  # Regressão para valor 0-1000
+    )
+
+
+def aplicar_heads(
+    pooled_output: torch.Tensor,
+    competencia_heads: nn.ModuleList,
+    score_head: nn.Module
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Aplica um conjunto de cabeças à representação da redação
+
+    Returns:
+        competencias: [batch_size, 5] (0-200)
+        score_total: [batch_size, 1] (0-1000)
+    """
+    # Predizer cada competência
+    competencias = []
+    for head in competencia_heads:
+        comp = head(pooled_output)  # [batch_size, 1]
+        # Aplicar sigmoid e escalar para 0-200
+        comp = torch.sigmoid(comp) * 200
+        competencias.append(comp)
+
+    competencias = torch.cat(competencias, dim=1)  # [batch_size, 5]
+
+    # Predizer score total
+    score_total = score_head(pooled_output)  # [batch_size, 1]
+    # Aplicar sigmoid e escalar para 0-1000
+    score_total = torch.sigmoid(score_total) * 1000
+
+    return competencias, score_total
+
+
 class ModeloTokenizer:
     """Wrapper para tokenizer"""
 
     def __init__(self, model_name: str = settings.MODEL_NAME):
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.max_length = settings.MAX_LENGTH
+        self.estatisticas = EstatisticasPadding("inferência", max_length=self.max_length)
         logger.info(f"Tokenizer inicializado: {model_name}")
 
     def encode(self, texto: str, device: str = "cpu") -> Dict[str, torch.Tensor]:
         """
-        Tokeniza um texto
+        Tokeniza um texto (sem padding: seq_len = tamanho real, até max_length)
 
         Args:
             texto: Texto da redação
@@ -139,7 +383,7 @@ class ModeloTokenizer:
         encoding = self.tokenizer(
             texto,
             max_length=self.max_length,
-            padding="max_length",
+            padding="longest",
             truncation=True,
             return_tensors="pt"
         )
@@ -149,6 +393,83 @@ class ModeloTokenizer:
             "attention_mask": encoding["attention_mask"].to(device)
         }
 
+    def tokenizar(self, textos: List[str]) -> List[List[int]]:
+        """
+        Tokeniza vários textos sem padding (truncados em max_length)
+
+        Returns:
+            Lista de input_ids de tamanho variável
+        """
+        return self.tokenizer(
+            textos,
+            max_length=self.max_length,
+            truncation=True
+        )["input_ids"]
+
+    def tokenizar_janelas(self, textos: List[str]) -> List[List[List[int]]]:
+        """
+        Divide cada texto em janelas sobrepostas de até max_length tokens
+
+        Janelas consecutivas compartilham WINDOW_STRIDE tokens. Acima de
+        MAX_WINDOWS, mantém as primeiras e a última janela (a conclusão,
+        onde fica a proposta de intervenção da Competência 5).
+
+        Returns:
+            Para cada texto, a lista de input_ids de suas janelas
+        """
+        encoding = self.tokenizer(
+            textos,
+            max_length=self.max_length,
+            truncation=True,
+            stride=settings.WINDOW_STRIDE,
+            return_overflowing_tokens=True
+        )
+
+        janelas: List[List[List[int]]] = [[] for _ in textos]
+        for ids, idx in zip(encoding["input_ids"], encoding["overflow_to_sample_mapping"]):
+            janelas[idx].append(ids)
+
+        max_janelas = max(1, settings.MAX_WINDOWS)
+        return [
+            j if len(j) <= max_janelas else j[:max_janelas - 1] + j[-1:]
+            for j in janelas
+        ]
+
+    def montar_lote(
+        self,
+        sequencias: List[List[int]],
+        device: str = "cpu"
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Aplica padding dinâmico (até a maior sequência do lote)
+
+        Returns:
+            Dict com input_ids e attention_mask [batch_size, seq_len]
+        """
+        lote = pad_lote(sequencias, self.tokenizer.pad_token_id, device=device)
+        self.estatisticas.registrar(
+            [len(seq) for seq in sequencias],
+            lote["input_ids"].shape[1]
+        )
+        return lote
+
+    def encode_batch(
+        self,
+        textos: List[str],
+        device: str = "cpu"
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Tokeniza vários textos de uma vez, com padding até o maior do lote
+
+        Args:
+            textos: Lista de redações
+            device: Dispositivo (cpu ou cuda)
+
+        Returns:
+            Dict com input_ids e attention_mask [batch_size, seq_len]
+        """
+        return self.montar_lote(self.tokenizar(textos), device=device)
+
     def decode_tokens(self, input_ids: torch.Tensor) -> str:
         """Decodifica tokens de volta para texto"""
         return self.tokenizer.decode(input_ids[0], skip_special_tokens=True)
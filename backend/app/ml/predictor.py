@@ -1,12 +1,18 @@
 """
 Predictor - Interface principal para fazer predições
 """
+import hashlib
+import threading
 import time
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
 
 from app.ml.ensemble import EnsembleRedacaoModel
 from app.ml.explainer import RedacaoExplainer
+from app.ml.batching import BatchScheduler
+from app.ml.promocao import versao_promovida
+from app.core.cache import get_prediction_cache, gerar_chave, normalizar_texto
 from app.core.config import settings
 
 
@@ -20,6 +26,12 @@ class RedacaoPredictor:
         self.model_version = model_version
         self.ensemble: EnsembleRedacaoModel = None
         self.explainer: RedacaoExplainer = None
+        self.batch_scheduler: BatchScheduler = None
+        self.cache = get_prediction_cache()
+        self.assinatura_modelo: str = None
+        # Lido antes dos pesos: uma promoção durante o carregamento causa
+        # um reload a mais, nunca um reload perdido
+        self.versao_promovida = versao_promovida(model_version)
         self._initialize()
 
     def _initialize(self):
@@ -46,6 +58,15 @@ class RedacaoPredictor:
         # Criar explainer
         self.explainer = RedacaoExplainer(self.ensemble)
 
+        # Assinatura dos pesos carregados: muda quando "latest" é sobrescrito
+        # por um re-treino, invalidando as predições em cache
+        if success:
+            self.assinatura_modelo = self._calcular_assinatura()
+
+        # Agrupar requisições concorrentes em lotes
+        if success and settings.INFERENCE_BATCHING_ENABLED:
+            self.batch_scheduler = BatchScheduler(self.ensemble)
+
         logger.info("Predictor inicializado com sucesso")
 
     def predict(
@@ -65,47 +86,172 @@ class RedacaoPredictor:
         """
         start_time = time.time()
 
+        predicao, atencao = self.prever_notas(texto, incluir_atencao=incluir_explicacao)
+
+        # Adicionar explicação se solicitado (já presente em predições do cache)
+        if incluir_explicacao and "explicacao" not in predicao:
+            predicao["explicacao"] = self.explicar(texto, atencao)
+            predicao["tempo_processamento"] = time.time() - start_time
+            self.salvar_em_cache(texto, predicao)
+
+        return predicao
+
+    def prever_notas(
+        self,
+        texto: str,
+        incluir_atencao: bool = True
+    ) -> Tuple[Dict[str, any], Optional[Dict[str, any]]]:
+        """
+        Notas, confiança e (opcionalmente) a atenção capturada no forward,
+        sem gerar a explicação - usada pela correção em streaming para
+        enviar as notas antes da explicação
+
+        Uma predição completa em cache (com "explicacao" quando
+        incluir_atencao) é devolvida direto, com atenção None.
+
+        Returns:
+            (predicao, atencao)
+        """
+        start_time = time.time()
+
         logger.info(f"Iniciando predição - Tamanho texto: {len(texto)} chars")
 
-        # Fazer predição com ensemble
-        resultado = self.ensemble.predict(texto)
+        predicao = self.buscar_em_cache(texto, incluir_atencao)
+        if predicao is not None:
+            predicao["tempo_processamento"] = time.time() - start_time
+            logger.info(
+                f"Predição obtida do cache - Score: {predicao['score_total']}"
+            )
+            return predicao, None
+
+        # Fazer predição com ensemble (agrupada com requisições concorrentes)
+        # A atenção para a explicação é capturada no mesmo forward
+        if self.batch_scheduler is not None:
+            resultado = self.batch_scheduler.predict(texto, incluir_atencao=incluir_atencao)
+        else:
+            resultado = self.ensemble.predict_batch(
+                [texto],
+                incluir_atencao=incluir_atencao
+            )[0]
+
+        predicao = self._formatar_predicao(resultado, start_time)
+
+        # Sem explicação, a predição já está completa
+        if not incluir_atencao:
+            self.salvar_em_cache(texto, predicao)
+
+        logger.info(
+            f"Predição concluída - Score: {predicao['score_total']}, "
+            f"Confiança: {predicao['confianca']:.3f} ({predicao['confianca_nivel']}), "
+            f"Tempo: {predicao['tempo_processamento']:.2f}s"
+        )
+
+        return predicao, resultado.get("atencao")
+
+    def prever_lote(self, textos: List[str]) -> List[Dict[str, any]]:
+        """
+        Notas e confiança de várias redações (correção em lote), sem
+        explicação
+
+        As redações fora do cache vão direto ao ensemble em lotes de
+        BULK_BATCH_SIZE, sem passar pelo micro-batching das requisições
+        individuais.
+
+        Returns:
+            Predições na mesma ordem de textos
+        """
+        start_time = time.time()
+
+        predicoes: List[Optional[Dict[str, any]]] = [
+            self.buscar_em_cache(texto, incluir_explicacao=False) for texto in textos
+        ]
+        pendentes = [i for i, p in enumerate(predicoes) if p is None]
+
+        if pendentes:
+            resultados = self.ensemble.predict_batch(
+                [textos[i] for i in pendentes],
+                tamanho_lote=settings.BULK_BATCH_SIZE
+            )
+            for i, resultado in zip(pendentes, resultados):
+                predicoes[i] = self._formatar_predicao(resultado, start_time)
+                self.salvar_em_cache(textos[i], predicoes[i])
+
+        tempo = time.time() - start_time
+        for predicao in predicoes:
+            predicao["tempo_processamento"] = tempo
+
+        logger.info(
+            f"Predição em lote concluída - {len(textos)} redações "
+            f"({len(textos) - len(pendentes)} do cache), Tempo: {tempo:.2f}s"
+        )
+
+        return predicoes
 
+    def _formatar_predicao(self, resultado: Dict[str, any], start_time: float) -> Dict[str, any]:
+        """Converte a saída do ensemble em notas inteiras e confiança"""
         # Extrair competências
         competencias_dict = {}
         for comp_key, comp_data in resultado["competencias"].items():
             num = int(comp_key[1])  # c1 -> 1
             competencias_dict[f"c{num}"] = int(round(comp_data["nota"]))
 
-        score_total = int(round(resultado["score_total"]["nota"]))
-        confianca = resultado["confianca"]
-        confianca_nivel = resultado["confianca_nivel"]
-
-        # Preparar resultado
-        predicao = {
+        return {
             "competencias": competencias_dict,
-            "score_total": score_total,
-            "confianca": confianca,
-            "confianca_nivel": confianca_nivel,
+            "score_total": int(round(resultado["score_total"]["nota"])),
+            "confianca": float(resultado["confianca"]),
+            "confianca_nivel": resultado["confianca_nivel"],
             "modelo_version": self.model_version,
             "tempo_processamento": time.time() - start_time
         }
 
-        # Adicionar explicação se solicitado
-        if incluir_explicacao:
-            try:
-                explicacao = self.explainer.explain(texto)
-                predicao["explicacao"] = explicacao
-            except Exception as e:
-                logger.error(f"Erro ao gerar explicação: {str(e)}")
-                predicao["explicacao"] = None
+    def explicar(self, texto: str, atencao: Optional[Dict[str, any]]) -> Optional[Dict[str, any]]:
+        """
+        Explicação da predição a partir da atenção de prever_notas
 
-        logger.info(
-            f"Predição concluída - Score: {score_total}, "
-            f"Confiança: {confianca:.3f} ({confianca_nivel}), "
-            f"Tempo: {predicao['tempo_processamento']:.2f}s"
+        Returns:
+            Explicação, ou None em caso de erro
+        """
+        try:
+            return self.explainer.explain(texto, attention_data=atencao)
+        except Exception as e:
+            logger.error(f"Erro ao gerar explicação: {str(e)}")
+            return None
+
+    def buscar_em_cache(self, texto: str, incluir_explicacao: bool) -> Optional[Dict[str, any]]:
+        """Predição em cache para o texto, ou None"""
+        if not settings.CACHE_ENABLED or self.assinatura_modelo is None:
+            return None
+        return self.cache.get(self._chave_cache(texto, incluir_explicacao))
+
+    def salvar_em_cache(self, texto: str, predicao: Dict[str, any]):
+        """Armazena uma predição completa (com explicação, se houver)"""
+        if not settings.CACHE_ENABLED or self.assinatura_modelo is None:
+            return
+        self.cache.set(self._chave_cache(texto, "explicacao" in predicao), predicao)
+
+    def _chave_cache(self, texto: str, incluir_explicacao: bool) -> str:
+        """Chave da predição: texto normalizado + versão/pesos + codificação"""
+        return gerar_chave(
+            "predicao",
+            self.model_version,
+            self.assinatura_modelo,
+            self.ensemble.modo,
+            settings.MAX_LENGTH,
+            self.ensemble.modo_codificacao,
+            incluir_explicacao,
+            normalizar_texto(texto)
         )
 
-        return predicao
+    def _calcular_assinatura(self) -> str:
+        """Hash do nome, tamanho e mtime dos arquivos de pesos da versão"""
+        model_path = Path(settings.MODEL_BASE_PATH) / self.model_version
+        digest = hashlib.sha256()
+        digest.update(f"{self.ensemble.backend}:{self.ensemble.quantizar}".encode())
+        arquivos = list(model_path.glob("*.pt")) + list(model_path.glob("*.onnx"))
+        for arquivo in sorted(arquivos):
+            info = arquivo.stat()
+            digest.update(f"{arquivo.name}:{info.st_size}:{info.st_mtime_ns}".encode())
+        return digest.hexdigest()[:16]
 
     def should_use_for_training(self, confianca: float) -> bool:
         """
@@ -136,29 +282,101 @@ class RedacaoPredictor:
         return {
             "version": self.model_version,
             "ensemble_size": settings.ENSEMBLE_SIZE,
+            "ensemble_mode": self.ensemble.modo,
+            "inference_backend": self.ensemble.backend,
+            "quantizacao_int8": self.ensemble.quantizar,
             "num_modelos_carregados": len(self.ensemble.models),
             "device": self.ensemble.device,
             "confidence_threshold": settings.CONFIDENCE_THRESHOLD,
             "low_confidence_threshold": settings.LOW_CONFIDENCE_THRESHOLD
         }
 
+    def get_inference_stats(self) -> Dict[str, any]:
+        """Retorna estatísticas do micro-batching, padding dinâmico e cache"""
+        return {
+            "cache": self.cache.get_stats(),
+            "batching": (
+                self.batch_scheduler.get_stats()
+                if self.batch_scheduler is not None
+                else None
+            ),
+            "padding": self.ensemble.tokenizer.estatisticas.resumo()
+        }
+
+    def shutdown(self):
+        """Libera recursos de inferência (scheduler de lotes)"""
+        if self.batch_scheduler is not None:
+            self.batch_scheduler.shutdown()
+            self.batch_scheduler = None
+
 
 # Instância global do predictor
 # Será inicializado ao startar a aplicação
 _predictor_instance: RedacaoPredictor = None
 
 
+# Vigia de promoções (thread que chama reload_predictor)
+_vigia_parar: threading.Event = None
+
+
 def get_predictor() -> RedacaoPredictor:
     """Retorna instância global do predictor"""
     global _predictor_instance
     if _predictor_instance is None:
         _predictor_instance = RedacaoPredictor()
+        _iniciar_vigia_promocao()
     return _predictor_instance
 
 
+def _iniciar_vigia_promocao(intervalo: int = settings.MODEL_RELOAD_CHECK_SECONDS):
+    """
+    Verifica a cada `intervalo` segundos se o re-treino promoveu uma nova
+    versão (ver app.ml.promocao) e recarrega o predictor
+    """
+    global _vigia_parar
+    if intervalo <= 0 or _vigia_parar is not None:
+        return
+
+    parar = threading.Event()
+
+    def vigiar():
+        while not parar.wait(intervalo):
+            atual = _predictor_instance
+            if atual is None:
+                continue
+
+            versao = versao_promovida(atual.model_version)
+            if versao is None or versao == atual.versao_promovida:
+                continue
+
+            logger.info(f"Versão {versao} promovida para {atual.model_version} - recarregando")
+            try:
+                reload_predictor(atual.model_version)
+            except Exception as e:
+                logger.error(f"Erro ao recarregar o predictor: {str(e)}", exc_info=True)
+
+    _vigia_parar = parar
+    threading.Thread(target=vigiar, name="vigia-promocao", daemon=True).start()
+
+
 def reload_predictor(model_version: str = "latest"):
     """Recarrega predictor com nova versão do modelo"""
     global _predictor_instance
     logger.info(f"Recarregando predictor com versão {model_version}")
+    predictor_anterior = _predictor_instance
     _predictor_instance = RedacaoPredictor(model_version=model_version)
+    if predictor_anterior is not None:
+        predictor_anterior.shutdown()
+    # Predições da versão anterior não serão mais consultadas
+    get_prediction_cache().invalidar("predicao")
     return _predictor_instance
+
+
+def shutdown_predictor():
+    """Encerra o predictor global, se já tiver sido inicializado"""
+    global _vigia_parar
+    if _vigia_parar is not None:
+        _vigia_parar.set()
+        _vigia_parar = None
+    if _predictor_instance is not None:
+        _predictor_instance.shutdown()
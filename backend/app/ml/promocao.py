@@ -0,0 +1,38 @@
+"""
+Marcador de promoção - Avisa os processos em execução que o modelo mudou
+
+O re-treino grava, depois de trocar o diretório da versão, um arquivo
+.{destino}.versao em MODEL_BASE_PATH. Cada processo com predictor (API,
+workers de correção) compara esse marcador com o que leu ao carregar os
+pesos e chama reload_predictor quando ele muda.
+"""
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+
+def _arquivo_marcador(destino: str) -> Path:
+    return Path(settings.MODEL_BASE_PATH) / f".{destino}.versao"
+
+
+def registrar_promocao(versao: str, destino: str = "latest"):
+    """Grava (atomicamente) a versão promovida para `destino`"""
+    arquivo = _arquivo_marcador(destino)
+    temporario = arquivo.with_name(arquivo.name + ".tmp")
+
+    with open(temporario, "w") as f:
+        json.dump({"versao": versao, "promovida_em": datetime.utcnow().isoformat()}, f)
+    os.replace(temporario, arquivo)
+
+
+def versao_promovida(destino: str = "latest") -> Optional[str]:
+    """Última versão promovida para `destino`, ou None se nunca houve promoção"""
+    try:
+        with open(_arquivo_marcador(destino)) as f:
+            return json.load(f)["versao"]
+    except (OSError, ValueError, KeyError):
+        return None
@@ -148,6 +148,20 @@ class CorrecaoResponse(BaseModel):
     correcao: Correcao
 
 
+class JobResponse(BaseModel):
+    """Response dos endpoints de jobs de correção assíncrona"""
+
+    success: bool
+    job_id: str
+    status: str = Field(
+        ...,
+        description="na_fila, processando, concluido, falhou ou cancelado"
+    )
+    status_url: str
+    resultado_url: Optional[str] = None
+    erro: Optional[str] = None
+
+
 class Comparacao(BaseModel):
     """Schema para dados de uma correção na comparação"""
 
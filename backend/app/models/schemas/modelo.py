@@ -101,5 +101,5 @@ class HealthCheck(BaseModel):
     timestamp: datetime
     services: Dict[str, bool] = Field(
         ...,
-        description="Status dos serviços: database, redis, ml_model"
+        description="Status dos serviços: database, redis, ml_model, languagetool"
     )
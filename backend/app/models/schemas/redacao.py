@@ -1,7 +1,7 @@
 """
 Schemas Pydantic para Redação
 """
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, HttpUrl, validator
 from typing import Optional, List
 from datetime import datetime
 
@@ -47,6 +47,25 @@ class RedacaoInput(BaseModel):
         }
 
 
+class CorrecaoJobInput(RedacaoInput):
+    """Schema para enviar uma redação à fila de correção assíncrona"""
+
+    webhook_url: Optional[HttpUrl] = Field(
+        None,
+        description="URL que recebe um POST quando a correção terminar (opcional)"
+    )
+
+
+class CorrecaoLoteInput(BaseModel):
+    """Schema para corrigir várias redações de uma vez (ex: uma turma)"""
+
+    redacoes: List[RedacaoInput] = Field(
+        ...,
+        min_items=1,
+        description="Redações a corrigir (até BULK_MAX_ITEMS)"
+    )
+
+
 class Redacao(BaseModel):
     """Schema para representar uma redação armazenada"""
 
@@ -1,16 +1,22 @@
 """
 Corrector - Orquestrador principal do sistema de correção
 """
+import asyncio
+import functools
+import json
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, AsyncIterator, Dict, List, Tuple
 from loguru import logger
 
 from app.ml.predictor import get_predictor
 from app.services.linguistic_analyzer import get_linguistic_analyzer
 from app.services.feedback_generator import FeedbackGenerator
+from app.services.inference_executor import get_inference_executor, FilaInferenciaCheiaError
 from app.db.supabase_client import supabase_client
-from app.models.schemas.correcao import Correcao, Competencia
+from app.db.buffer_correcoes import get_buffer_correcoes
+from app.models.schemas.correcao import Correcao, Competencia, ErroGramatical, AnaliseEstrutura
 from app.core.config import settings
 
 
@@ -26,11 +32,21 @@ class RedacaoCorrector:
     """
 
     def __init__(self):
-        self.predictor = get_predictor()
         self.analyzer = get_linguistic_analyzer()
         self.feedback_gen = FeedbackGenerator()
+        self.executor = get_inference_executor()
         logger.info("RedacaoCorrector inicializado")
 
+    @property
+    def predictor(self):
+        """
+        Predictor global atual
+
+        Não é guardado na instância: reload_predictor troca o predictor
+        (novos pesos, novo BatchScheduler) e o corrector passa a usá-lo.
+        """
+        return get_predictor()
+
     async def corrigir(
         self,
         texto: str,
@@ -54,19 +70,18 @@ class RedacaoCorrector:
         logger.info("INICIANDO CORREÇÃO DE REDAÇÃO")
         logger.info("=" * 60)
 
-        # 1. Salvar redação no banco
-        redacao_data = await supabase_client.criar_redacao(
-            texto=texto,
-            titulo=titulo,
-            prompt_id=prompt_id,
-            usuario_id=usuario_id
+        # Backpressure: recusar antes de qualquer processamento
+        self.executor.verificar_capacidade()
+
+        # 1. Predição com ML e 2. Análise linguística
+        # Ambas bloqueiam (BERT / LanguageTool): executadas no pool de
+        # inferência, em paralelo, sem travar o event loop. As duas vagas
+        # são reservadas juntas: nenhuma roda se a outra for recusada
+        logger.info("Iniciando predição ML e análise linguística...")
+        predicao, analise = await self.executor.run_paralelo(
+            functools.partial(self.predictor.predict, texto, incluir_explicacao=True),
+            functools.partial(self.analyzer.analisar_completo, texto)
         )
-        redacao_id = redacao_data["id"]
-        logger.info(f"Redação salva: {redacao_id}")
-
-        # 2. Predição com ML
-        logger.info("Iniciando predição ML...")
-        predicao = self.predictor.predict(texto, incluir_explicacao=True)
 
         competencias_ml = predicao["competencias"]
         score_total = predicao["score_total"]
@@ -80,10 +95,6 @@ class RedacaoCorrector:
             f"Confiança: {confianca:.3f} ({confianca_nivel})"
         )
 
-        # 3. Análise linguística
-        logger.info("Iniciando análise linguística...")
-        analise = self.analyzer.analisar_completo(texto)
-
         erros_gramaticais = analise["erros_gramaticais"]
         num_erros_ortografia = analise["num_erros_ortografia"]
         num_erros_gramatica = analise["num_erros_gramatica"]
@@ -95,7 +106,331 @@ class RedacaoCorrector:
             f"Parágrafos: {analise_estrutura.num_paragrafos}"
         )
 
-        # 4. Gerar feedback por competência
+        # 3. Gerar feedback por competência e feedback geral
+        competencias, feedback_geral, resumo_avaliacao = self._gerar_feedback(
+            texto,
+            competencias_ml,
+            score_total,
+            confianca,
+            erros_gramaticais,
+            analise_estrutura
+        )
+
+        # 4. Montar correção completa (IDs gerados aqui; a redação só é
+        # gravada junto com a correção)
+        correcao = Correcao(
+            id=str(uuid.uuid4()),
+            redacao_id=str(uuid.uuid4()),
+            score_total=score_total,
+            competencias=competencias,
+            confianca=confianca,
+            confianca_nivel=confianca_nivel,
+            erros_gramaticais=erros_gramaticais,
+            num_erros_ortografia=num_erros_ortografia,
+            num_erros_gramatica=num_erros_gramatica,
+            analise_estrutura=analise_estrutura,
+            feedback_geral=feedback_geral,
+            resumo_avaliacao=resumo_avaliacao,
+            modelo_version=modelo_version,
+            tempo_processamento=tempo_processamento,
+            created_at=datetime.utcnow()
+        )
+
+        # 5. Salvar redação e correção no banco (uma chamada)
+        logger.info("Salvando correção no banco...")
+        await self._salvar_correcao(correcao, {
+            "texto": texto,
+            "titulo": titulo,
+            "prompt_id": prompt_id,
+            "usuario_id": usuario_id
+        })
+
+        # 6. Decidir se usa para re-treino
+        self._registrar_uso_treino(confianca)
+
+        logger.info("=" * 60)
+        logger.info("CORREÇÃO CONCLUÍDA COM SUCESSO")
+        logger.info("=" * 60)
+
+        return correcao
+
+    async def corrigir_stream(
+        self,
+        texto: str,
+        titulo: str = None,
+        prompt_id: int = None,
+        usuario_id: str = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Corrige uma redação emitindo o resultado de cada etapa assim que
+        fica pronto: notas, estrutura, erros gramaticais, feedback,
+        explicação e, por fim, os IDs da correção salva
+
+        O LanguageTool roda em paralelo com o ensemble, então as notas saem
+        após o custo do forward; redação e correção são gravadas juntas no
+        final.
+
+        Yields:
+            (evento, dados) - eventos: notas, estrutura, gramatica,
+            feedback, explicacao, concluido, erro
+        """
+        start_time = time.time()
+
+        # Backpressure: recusar antes de qualquer processamento
+        self.executor.verificar_capacidade()
+
+        # Mesmo predictor do início ao fim, mesmo com um reload no meio
+        predictor = self.predictor
+
+        tarefa_gramatica = asyncio.create_task(
+            self.executor.run(self.analyzer.analisar_gramatica, texto)
+        )
+        tarefas = [tarefa_gramatica]
+
+        try:
+            # 1. Notas (forward do ensemble, capturando a atenção)
+            predicao, atencao = await self.executor.run(predictor.prever_notas, texto)
+
+            confianca = predicao["confianca"]
+            yield "notas", {
+                "competencias": predicao["competencias"],
+                "score_total": predicao["score_total"],
+                "confianca": confianca,
+                "confianca_nivel": predicao["confianca_nivel"],
+                "modelo_version": predicao["modelo_version"]
+            }
+
+            # Explicação gerada em paralelo com as etapas seguintes
+            # (predições do cache já trazem a explicação)
+            tarefa_explicacao = None
+            if "explicacao" not in predicao:
+                tarefa_explicacao = asyncio.create_task(
+                    self.executor.run(predictor.explicar, texto, atencao)
+                )
+                tarefas.append(tarefa_explicacao)
+
+            # 2. Estrutura (sem LanguageTool, rápida)
+            analise_estrutura = await self.executor.run(self.analyzer.analisar_estrutura, texto)
+            yield "estrutura", analise_estrutura.dict()
+
+            # 3. Erros gramaticais (pool de LanguageTool)
+            erros_gramaticais, num_erros_ortografia, num_erros_gramatica = await tarefa_gramatica
+            yield "gramatica", {
+                "erros_gramaticais": [e.dict() for e in erros_gramaticais],
+                "num_erros_ortografia": num_erros_ortografia,
+                "num_erros_gramatica": num_erros_gramatica
+            }
+
+            # 4. Feedback por competência e geral
+            competencias, feedback_geral, resumo_avaliacao = self._gerar_feedback(
+                texto,
+                predicao["competencias"],
+                predicao["score_total"],
+                confianca,
+                erros_gramaticais,
+                analise_estrutura
+            )
+            yield "feedback", {
+                "competencias": [c.dict() for c in competencias],
+                "feedback_geral": feedback_geral,
+                "resumo_avaliacao": resumo_avaliacao
+            }
+
+            # 5. Explicação
+            if tarefa_explicacao is None:
+                explicacao = predicao["explicacao"]
+            else:
+                explicacao = await tarefa_explicacao
+                predictor.salvar_em_cache(texto, {**predicao, "explicacao": explicacao})
+
+            yield "explicacao", {"explicacao": explicacao}
+
+            # 6. Salvar redação e correção no banco (uma chamada)
+            correcao = Correcao(
+                id=str(uuid.uuid4()),
+                redacao_id=str(uuid.uuid4()),
+                score_total=predicao["score_total"],
+                competencias=competencias,
+                confianca=confianca,
+                confianca_nivel=predicao["confianca_nivel"],
+                erros_gramaticais=erros_gramaticais,
+                num_erros_ortografia=num_erros_ortografia,
+                num_erros_gramatica=num_erros_gramatica,
+                analise_estrutura=analise_estrutura,
+                feedback_geral=feedback_geral,
+                resumo_avaliacao=resumo_avaliacao,
+                modelo_version=predicao["modelo_version"],
+                tempo_processamento=time.time() - start_time,
+                created_at=datetime.utcnow()
+            )
+            await self._salvar_correcao(correcao, {
+                "texto": texto,
+                "titulo": titulo,
+                "prompt_id": prompt_id,
+                "usuario_id": usuario_id
+            })
+            self._registrar_uso_treino(confianca)
+
+            yield "concluido", {
+                "correcao_id": correcao.id,
+                "redacao_id": correcao.redacao_id,
+                "tempo_processamento": correcao.tempo_processamento
+            }
+
+        finally:
+            # Cliente desconectado ou erro: não deixar tarefas órfãs
+            for tarefa in tarefas:
+                if not tarefa.done():
+                    tarefa.cancel()
+
+    async def corrigir_lote(
+        self,
+        redacoes: List[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Corrige várias redações (ex: uma turma inteira), emitindo o
+        resultado de cada uma
+
+        As redações são processadas em lotes de BULK_BATCH_SIZE: um forward
+        do ensemble por grupo de comprimento, os parágrafos de todo o lote
+        distribuídos no pool de LanguageTool e uma única chamada ao banco
+        para as redações e correções do lote. Falhas são reportadas por
+        redação, sem interromper as demais.
+
+        Args:
+            redacoes: Dicts com texto, titulo, prompt_id e usuario_id
+
+        Yields:
+            {"indice", "sucesso": True, "correcao"} ou
+            {"indice", "sucesso": False, "erro"}, com indice na lista recebida
+        """
+        logger.info("=" * 60)
+        logger.info(f"INICIANDO CORREÇÃO EM LOTE - {len(redacoes)} redações")
+        logger.info("=" * 60)
+
+        tamanho = max(1, settings.BULK_BATCH_SIZE)
+        sucessos = 0
+
+        for inicio in range(0, len(redacoes), tamanho):
+            async for item in self._corrigir_sublote(inicio, redacoes[inicio:inicio + tamanho]):
+                sucessos += item["sucesso"]
+                yield item
+
+        logger.info("=" * 60)
+        logger.info(f"CORREÇÃO EM LOTE CONCLUÍDA - {sucessos}/{len(redacoes)} com sucesso")
+        logger.info("=" * 60)
+
+    async def _corrigir_sublote(
+        self,
+        inicio: int,
+        lote: List[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Corrige um lote de até BULK_BATCH_SIZE redações (ver corrigir_lote)"""
+        start_time = time.time()
+        textos = [r["texto"] for r in lote]
+
+        # Ensemble e LanguageTool em paralelo
+        try:
+            predicoes, analises = await self._executar_aguardando(
+                functools.partial(self.predictor.prever_lote, textos),
+                functools.partial(self.analyzer.analisar_lote, textos)
+            )
+        except Exception as e:
+            logger.error(f"Erro ao corrigir lote {inicio}-{inicio + len(lote) - 1}: {str(e)}")
+            for i in range(len(lote)):
+                yield {"indice": inicio + i, "sucesso": False, "erro": str(e)}
+            return
+
+        correcoes: Dict[int, Correcao] = {}
+        erros: Dict[int, str] = {}
+
+        for i, texto in enumerate(textos):
+            try:
+                predicao = predicoes[i]
+                analise = analises[i]
+
+                competencias, feedback_geral, resumo_avaliacao = self._gerar_feedback(
+                    texto,
+                    predicao["competencias"],
+                    predicao["score_total"],
+                    predicao["confianca"],
+                    analise["erros_gramaticais"],
+                    analise["analise_estrutura"]
+                )
+
+                correcoes[i] = Correcao(
+                    id=str(uuid.uuid4()),
+                    redacao_id=str(uuid.uuid4()),
+                    score_total=predicao["score_total"],
+                    competencias=competencias,
+                    confianca=predicao["confianca"],
+                    confianca_nivel=predicao["confianca_nivel"],
+                    erros_gramaticais=analise["erros_gramaticais"],
+                    num_erros_ortografia=analise["num_erros_ortografia"],
+                    num_erros_gramatica=analise["num_erros_gramatica"],
+                    analise_estrutura=analise["analise_estrutura"],
+                    feedback_geral=feedback_geral,
+                    resumo_avaliacao=resumo_avaliacao,
+                    modelo_version=predicao["modelo_version"],
+                    tempo_processamento=time.time() - start_time,
+                    created_at=datetime.utcnow()
+                )
+            except Exception as e:
+                logger.error(f"Erro ao montar correção {inicio + i}: {str(e)}")
+                erros[i] = str(e)
+
+        # Salvar redações e correções montadas em uma única chamada
+        if correcoes:
+            try:
+                await supabase_client.salvar_correcoes([
+                    self._item_persistencia(correcao, lote[i])
+                    for i, correcao in correcoes.items()
+                ])
+                for correcao in correcoes.values():
+                    self._registrar_uso_treino(correcao.confianca)
+            except Exception as e:
+                logger.error(f"Erro ao salvar correções do lote: {str(e)}")
+                for i in range(len(lote)):
+                    erros.setdefault(i, f"Erro ao salvar correção: {str(e)}")
+
+        for i in range(len(lote)):
+            if i in erros:
+                yield {"indice": inicio + i, "sucesso": False, "erro": erros[i]}
+            else:
+                yield {
+                    "indice": inicio + i,
+                    "sucesso": True,
+                    "correcao": json.loads(correcoes[i].json())
+                }
+
+    async def _executar_aguardando(self, *chamadas) -> List[Any]:
+        """
+        Executa as chamadas em paralelo no pool de inferência aguardando
+        vaga (para todas) quando a fila está cheia: a correção em lote cede
+        lugar às requisições individuais
+        """
+        while True:
+            try:
+                return await self.executor.run_paralelo(*chamadas)
+            except FilaInferenciaCheiaError as e:
+                logger.warning(f"Correção em lote aguardando o pool de inferência: {str(e)}")
+                await asyncio.sleep(e.retry_after)
+
+    def _gerar_feedback(
+        self,
+        texto: str,
+        competencias_ml: Dict[str, int],
+        score_total: int,
+        confianca: float,
+        erros_gramaticais: List[ErroGramatical],
+        analise_estrutura: AnaliseEstrutura
+    ) -> Tuple[List[Competencia], str, str]:
+        """
+        Feedback por competência, feedback geral e resumo da avaliação
+
+        Returns:
+            (competencias, feedback_geral, resumo_avaliacao)
+        """
         logger.info("Gerando feedback por competência...")
         competencias: List[Competencia] = []
 
@@ -114,7 +449,6 @@ class RedacaoCorrector:
 
         logger.info("Feedback por competência gerado")
 
-        # 5. Feedback geral
         feedback_geral = self.feedback_gen.gerar_feedback_geral(
             score_total=score_total,
             competencias=competencias,
@@ -123,32 +457,10 @@ class RedacaoCorrector:
 
         resumo_avaliacao = self.feedback_gen.gerar_resumo_avaliacao(score_total)
 
-        # 6. Montar correção completa
-        correcao_id = str(uuid.uuid4())
+        return competencias, feedback_geral, resumo_avaliacao
 
-        correcao = Correcao(
-            id=correcao_id,
-            redacao_id=redacao_id,
-            score_total=score_total,
-            competencias=competencias,
-            confianca=confianca,
-            confianca_nivel=confianca_nivel,
-            erros_gramaticais=erros_gramaticais,
-            num_erros_ortografia=num_erros_ortografia,
-            num_erros_gramatica=num_erros_gramatica,
-            analise_estrutura=analise_estrutura,
-            feedback_geral=feedback_geral,
-            resumo_avaliacao=resumo_avaliacao,
-            modelo_version=modelo_version,
-            tempo_processamento=tempo_processamento,
-            created_at=datetime.utcnow()
-        )
-
-        # 7. Salvar correção no banco
-        logger.info("Salvando correção no banco...")
-        await self._salvar_correcao(correcao)
-
-        # 8. Decidir se usa para re-treino
+    def _registrar_uso_treino(self, confianca: float):
+        """Registra se a correção será usada no re-treino ou precisa de revisão"""
         if self.predictor.should_use_for_training(confianca):
             logger.info(
                 f"✓ Correção com alta confiança ({confianca:.3f}) - "
@@ -160,49 +472,73 @@ class RedacaoCorrector:
                 f"Recomenda-se feedback humano"
             )
 
-        logger.info("=" * 60)
-        logger.info("CORREÇÃO CONCLUÍDA COM SUCESSO")
-        logger.info("=" * 60)
-
-        return correcao
-
-    async def _salvar_correcao(self, correcao: Correcao):
-        """Salva correção no Supabase"""
-        try:
-            # Converter competências para dict simples
-            competencias_dict = {
-                f"c{i+1}": comp.nota
-                for i, comp in enumerate(correcao.competencias)
-            }
-
-            # Preparar dados completos em JSON
-            dados_completos = {
-                "score_total": correcao.score_total,
-                "competencias": [comp.dict() for comp in correcao.competencias],
-                "confianca": correcao.confianca,
-                "confianca_nivel": correcao.confianca_nivel,
-                "erros_gramaticais": [e.dict() for e in correcao.erros_gramaticais],
-                "num_erros_ortografia": correcao.num_erros_ortografia,
-                "num_erros_gramatica": correcao.num_erros_gramatica,
-                "analise_estrutura": correcao.analise_estrutura.dict(),
-                "feedback_geral": correcao.feedback_geral,
-                "resumo_avaliacao": correcao.resumo_avaliacao
+    @staticmethod
+    def _linha_correcao(correcao: Correcao) -> Dict[str, Any]:
+        """Campos da tabela correcoes (argumentos de criar_correcao)"""
+        # Converter competências para dict simples
+        competencias_dict = {
+            f"c{i+1}": comp.nota
+            for i, comp in enumerate(correcao.competencias)
+        }
+
+        # Preparar dados completos em JSON
+        dados_completos = {
+            "score_total": correcao.score_total,
+            "competencias": [comp.dict() for comp in correcao.competencias],
+            "confianca": correcao.confianca,
+            "confianca_nivel": correcao.confianca_nivel,
+            "erros_gramaticais": [e.dict() for e in correcao.erros_gramaticais],
+            "num_erros_ortografia": correcao.num_erros_ortografia,
+            "num_erros_gramatica": correcao.num_erros_gramatica,
+            "analise_estrutura": correcao.analise_estrutura.dict(),
+            "feedback_geral": correcao.feedback_geral,
+            "resumo_avaliacao": correcao.resumo_avaliacao
+        }
+
+        return {
+            "redacao_id": correcao.redacao_id,
+            "score_total": correcao.score_total,
+            "c1": competencias_dict["c1"],
+            "c2": competencias_dict["c2"],
+            "c3": competencias_dict["c3"],
+            "c4": competencias_dict["c4"],
+            "c5": competencias_dict["c5"],
+            "confianca": correcao.confianca,
+            "modelo_version": correcao.modelo_version,
+            "feedback_geral": correcao.feedback_geral,
+            "dados_completos": dados_completos
+        }
+
+    def _item_persistencia(self, correcao: Correcao, redacao: Dict[str, Any]) -> Dict[str, Any]:
+        """Item da RPC salvar_correcoes: a redação e a sua correção"""
+        return {
+            "redacao": {
+                "id": correcao.redacao_id,
+                "texto": redacao["texto"],
+                "titulo": redacao.get("titulo"),
+                "prompt_id": redacao.get("prompt_id"),
+                "usuario_id": redacao.get("usuario_id")
+            },
+            "correcao": {
+                **self._linha_correcao(correcao),
+                "id": correcao.id,
+                "tempo_processamento": correcao.tempo_processamento
             }
+        }
 
-            await supabase_client.criar_correcao(
-                redacao_id=correcao.redacao_id,
-                score_total=correcao.score_total,
-                c1=competencias_dict["c1"],
-                c2=competencias_dict["c2"],
-                c3=competencias_dict["c3"],
-                c4=competencias_dict["c4"],
-                c5=competencias_dict["c5"],
-                confianca=correcao.confianca,
-                modelo_version=correcao.modelo_version,
-                feedback_geral=correcao.feedback_geral,
-                dados_completos=dados_completos
-            )
+    async def _salvar_correcao(self, correcao: Correcao, redacao: Dict[str, Any]):
+        """
+        Salva a redação e a correção no Supabase em uma única chamada
 
+        Com PERSISTENCE_WRITE_BEHIND, a gravação é agrupada com as de
+        outras correções concorrentes.
+        """
+        try:
+            item = self._item_persistencia(correcao, redacao)
+            if settings.PERSISTENCE_WRITE_BEHIND:
+                await get_buffer_correcoes().salvar(item)
+            else:
+                await supabase_client.salvar_correcoes([item])
             logger.info(f"Correção salva no banco: {correcao.id}")
 
         except Exception as e:
@@ -0,0 +1,181 @@
+"""
+Executor de Inferência - Executa ML e LanguageTool fora do event loop
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+from loguru import logger
+
+from app.core.config import settings
+
+
+class FilaInferenciaCheiaError(Exception):
+    """Levantada quando a fila de inferência atingiu o limite configurado"""
+
+    def __init__(self, pendentes: int, retry_after: int = settings.INFERENCE_RETRY_AFTER_SECONDS):
+        self.pendentes = pendentes
+        self.retry_after = retry_after
+        super().__init__(
+            f"Fila de inferência cheia ({pendentes} tarefas pendentes). "
+            f"Tente novamente em {retry_after}s"
+        )
+
+
+class InferenceExecutor:
+    """
+    Pool dedicado para as etapas bloqueantes da correção (forward do
+    ensemble, LanguageTool), para que o event loop do uvicorn continue
+    atendendo outras requisições enquanto redações são avaliadas.
+
+    Tarefas acima de max_workers aguardam na fila do pool; acima de
+    max_fila pendentes, novas tarefas são recusadas (backpressure).
+    """
+
+    def __init__(
+        self,
+        max_workers: int = settings.INFERENCE_WORKERS,
+        max_fila: int = settings.INFERENCE_MAX_QUEUE
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_fila = max(self.max_workers, max_fila)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="inferencia"
+        )
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._recusadas = 0
+        self._concluidas = 0
+
+        logger.info(
+            f"InferenceExecutor iniciado - workers: {self.max_workers}, "
+            f"fila máxima: {self.max_fila}"
+        )
+
+    def verificar_capacidade(self):
+        """
+        Recusa antecipadamente quando a fila está cheia, antes de qualquer
+        efeito colateral (ex: inserir a redação no banco)
+
+        Raises:
+            FilaInferenciaCheiaError: se já houver max_fila tarefas pendentes
+        """
+        with self._lock:
+            if self._pendentes >= self.max_fila:
+                self._recusadas += 1
+                raise FilaInferenciaCheiaError(self._pendentes)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Executa func no pool e aguarda o resultado sem bloquear o event loop
+
+        A tarefa deixa de contar como pendente quando a thread termina (ou
+        quando é cancelada antes de começar), não quando quem aguarda
+        desiste: um cliente que desconecta não libera a vaga de um forward
+        que continua rodando.
+
+        Raises:
+            FilaInferenciaCheiaError: se já houver max_fila tarefas pendentes
+        """
+        self._reservar(1)
+        return await self._submeter(functools.partial(func, *args, **kwargs))
+
+    async def run_paralelo(self, *chamadas: Callable[[], Any]) -> List[Any]:
+        """
+        Executa as chamadas (functools.partial) em paralelo no pool
+
+        As vagas de todas são reservadas de uma vez: ou todas entram na
+        fila ou nenhuma, sem deixar uma etapa rodando quando a outra é
+        recusada. Se uma falha, as que ainda não começaram são canceladas
+        antes de propagar o erro (as que já rodam seguem ocupando a vaga
+        até terminar, como em run).
+
+        Raises:
+            FilaInferenciaCheiaError: se não houver vaga para todas
+        """
+        self._reservar(len(chamadas))
+
+        futuros = []
+        try:
+            for chamada in chamadas:
+                futuros.append(self._submeter(chamada))
+        except Exception:
+            # A chamada que falhou já liberou a própria vaga
+            for _ in range(len(chamadas) - len(futuros) - 1):
+                self._liberar(None)
+            for futuro in futuros:
+                futuro.cancel()
+            await asyncio.gather(*futuros, return_exceptions=True)
+            raise
+
+        try:
+            return await asyncio.gather(*futuros)
+        except BaseException:
+            for futuro in futuros:
+                futuro.cancel()
+            await asyncio.gather(*futuros, return_exceptions=True)
+            raise
+
+    def _reservar(self, quantidade: int):
+        """Reserva vagas na fila, todas ou nenhuma (pool vazio sempre aceita)"""
+        with self._lock:
+            if self._pendentes and self._pendentes + quantidade > self.max_fila:
+                self._recusadas += 1
+                raise FilaInferenciaCheiaError(self._pendentes)
+            self._pendentes += quantidade
+
+    def _submeter(self, chamada: Callable[[], Any]) -> asyncio.Future:
+        """Envia ao pool uma chamada com vaga já reservada"""
+        try:
+            futuro = self._executor.submit(chamada)
+        except Exception:
+            self._liberar(None)
+            raise
+
+        futuro.add_done_callback(self._liberar)
+        return asyncio.wrap_future(futuro)
+
+    def _liberar(self, futuro):
+        """Libera a vaga na fila ao fim da tarefa (thread do pool ou cancelamento)"""
+        with self._lock:
+            self._pendentes -= 1
+            self._concluidas += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """Retorna ocupação atual do pool"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_fila": self.max_fila,
+                "pendentes": self._pendentes,
+                "concluidas": self._concluidas,
+                "recusadas": self._recusadas
+            }
+
+    def shutdown(self):
+        """Encerra o pool aguardando as tarefas em andamento"""
+        self._executor.shutdown(wait=True)
+        logger.info("InferenceExecutor encerrado")
+
+
+# Instância global
+_executor_instance: InferenceExecutor = None
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Retorna instância global do executor de inferência"""
+    global _executor_instance
+    if _executor_instance is None:
+        _executor_instance = InferenceExecutor()
+    return _executor_instance
+
+
+def shutdown_inference_executor():
+    """Encerra o executor global, se já tiver sido inicializado"""
+    global _executor_instance
+    if _executor_instance is not None:
+        _executor_instance.shutdown()
+        _executor_instance = None
@@ -0,0 +1,255 @@
+"""
+Pool de servidores LanguageTool - Verificação gramatical em paralelo
+
+Cada instância local de language_tool_python.LanguageTool sobe o seu
+próprio servidor Java; com LANGUAGETOOL_SERVERS o pool usa servidores já
+em execução (ex: containers do LanguageTool) em vez de processos locais.
+Os parágrafos de uma redação são distribuídos entre as instâncias e
+verificados ao mesmo tempo.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from loguru import logger
+import language_tool_python
+
+from app.core.config import settings
+
+
+class LanguageToolIndisponivelError(Exception):
+    """Levantada quando uma instância do pool não pôde ser (re)iniciada"""
+
+
+class LanguageToolPool:
+    """
+    Pool de instâncias do LanguageTool com health check e reinício
+
+    Cada instância atende uma verificação por vez; uma chamada que falha
+    (servidor encerrado, conexão recusada) reinicia a instância e é
+    repetida uma vez. Um monitor em background verifica periodicamente as
+    instâncias ociosas e reinicia as que não respondem.
+    """
+
+    def __init__(
+        self,
+        tamanho: int = settings.LANGUAGETOOL_POOL_SIZE,
+        servidores: str = settings.LANGUAGETOOL_SERVERS,
+        idioma: str = "pt-BR",
+        intervalo_saude: int = settings.LANGUAGETOOL_HEALTHCHECK_SECONDS
+    ):
+        self.idioma = idioma
+        self.servidores = [s.strip() for s in servidores.split(",") if s.strip()]
+        self.tamanho = len(self.servidores) if self.servidores else max(1, tamanho)
+
+        self._instancias: List[Optional[language_tool_python.LanguageTool]] = [None] * self.tamanho
+        self._livres: "queue.Queue[int]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._verificacoes = 0
+        self._falhas = 0
+        self._reinicios = 0
+
+        for indice in range(self.tamanho):
+            self._instancias[indice] = self._criar(indice)
+            self._livres.put(indice)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.tamanho,
+            thread_name_prefix="languagetool"
+        )
+
+        self._parar = threading.Event()
+        self._monitor = None
+        if intervalo_saude > 0:
+            self._monitor = threading.Thread(
+                target=self._monitorar,
+                args=(intervalo_saude,),
+                name="languagetool-saude",
+                daemon=True
+            )
+            self._monitor.start()
+
+        logger.info(
+            f"LanguageToolPool iniciado - {self.disponiveis}/{self.tamanho} instâncias "
+            f"({'remotas' if self.servidores else 'locais'})"
+        )
+
+    def _criar(self, indice: int) -> Optional[language_tool_python.LanguageTool]:
+        """Cria a instância `indice` (servidor local ou remoto); None se falhar"""
+        try:
+            if self.servidores:
+                return language_tool_python.LanguageTool(
+                    self.idioma,
+                    remote_server=self.servidores[indice]
+                )
+            return language_tool_python.LanguageTool(self.idioma)
+        except Exception as e:
+            logger.error(f"Erro ao inicializar LanguageTool #{indice}: {str(e)}")
+            return None
+
+    def _reiniciar(self, indice: int) -> Optional[language_tool_python.LanguageTool]:
+        """Encerra a instância `indice` e cria outra no lugar"""
+        antiga = self._instancias[indice]
+        if antiga is not None:
+            try:
+                antiga.close()
+            except Exception:
+                pass
+
+        logger.warning(f"Reiniciando LanguageTool #{indice}")
+        self._instancias[indice] = self._criar(indice)
+
+        with self._lock:
+            self._reinicios += 1
+
+        return self._instancias[indice]
+
+    def _instancia(self, indice: int) -> language_tool_python.LanguageTool:
+        tool = self._instancias[indice]
+        if tool is None:
+            tool = self._reiniciar(indice)
+        if tool is None:
+            raise LanguageToolIndisponivelError(f"LanguageTool #{indice} indisponível")
+        return tool
+
+    @property
+    def disponiveis(self) -> int:
+        """Número de instâncias iniciadas"""
+        return sum(1 for tool in self._instancias if tool is not None)
+
+    def verificar(self, texto: str) -> List[Any]:
+        """
+        Verifica um texto na primeira instância livre
+
+        Returns:
+            Lista de Match do language_tool_python (offsets relativos a `texto`)
+
+        Raises:
+            LanguageToolIndisponivelError: se a instância não puder ser iniciada
+        """
+        indice = self._livres.get()
+        try:
+            try:
+                matches = self._instancia(indice).check(texto)
+            except LanguageToolIndisponivelError:
+                raise
+            except Exception as e:
+                # Servidor encerrado ou sem resposta: reinicia e tenta de novo
+                logger.warning(f"Falha no LanguageTool #{indice}: {str(e)}")
+                with self._lock:
+                    self._falhas += 1
+                self._reiniciar(indice)
+                matches = self._instancia(indice).check(texto)
+
+            with self._lock:
+                self._verificacoes += 1
+            return matches
+        finally:
+            self._livres.put(indice)
+
+    def verificar_paragrafos(self, paragrafos: List[str]) -> List[List[Any]]:
+        """
+        Verifica os parágrafos em paralelo, distribuídos entre as instâncias
+
+        Returns:
+            Matches de cada parágrafo, na mesma ordem (offsets relativos ao parágrafo)
+        """
+        if len(paragrafos) <= 1:
+            return [self.verificar(p) for p in paragrafos]
+        return list(self._executor.map(self.verificar, paragrafos))
+
+    def verificar_saude(self) -> Dict[str, int]:
+        """
+        Verifica cada instância com um texto curto, reiniciando as que não
+        respondem (aguarda a instância ficar ociosa)
+
+        Returns:
+            Dict com instâncias saudáveis e reiniciadas
+        """
+        saudaveis = 0
+        reiniciadas = 0
+
+        for _ in range(self.tamanho):
+            indice = self._livres.get()
+            try:
+                tool = self._instancias[indice]
+                try:
+                    if tool is None:
+                        raise LanguageToolIndisponivelError(f"LanguageTool #{indice} indisponível")
+                    tool.check("Teste.")
+                    saudaveis += 1
+                except Exception:
+                    reiniciadas += 1
+                    if self._reiniciar(indice) is not None:
+                        saudaveis += 1
+            finally:
+                self._livres.put(indice)
+
+        return {"saudaveis": saudaveis, "reiniciadas": reiniciadas}
+
+    def _monitorar(self, intervalo: int):
+        while not self._parar.wait(intervalo):
+            try:
+                resultado = self.verificar_saude()
+                if resultado["reiniciadas"]:
+                    logger.warning(f"Health check do LanguageTool: {resultado}")
+            except Exception as e:
+                logger.error(f"Erro no health check do LanguageTool: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna ocupação e contadores do pool"""
+        with self._lock:
+            return {
+                "tamanho": self.tamanho,
+                "modo": "remoto" if self.servidores else "local",
+                "disponiveis": self.disponiveis,
+                "livres": self._livres.qsize(),
+                "verificacoes": self._verificacoes,
+                "falhas": self._falhas,
+                "reinicios": self._reinicios
+            }
+
+    def shutdown(self):
+        """Encerra o monitor, o executor e os servidores locais"""
+        self._parar.set()
+        self._executor.shutdown(wait=True)
+
+        for indice, tool in enumerate(self._instancias):
+            if tool is not None:
+                try:
+                    tool.close()
+                except Exception:
+                    pass
+            self._instancias[indice] = None
+
+        logger.info("LanguageToolPool encerrado")
+
+
+# Instância global
+_pool_instance: LanguageToolPool = None
+
+
+def get_languagetool_pool() -> LanguageToolPool:
+    """Retorna instância global do pool de LanguageTool"""
+    global _pool_instance
+    if _pool_instance is None:
+        _pool_instance = LanguageToolPool()
+    return _pool_instance
+
+
+def languagetool_pool_iniciado() -> Optional[LanguageToolPool]:
+    """
+    Retorna o pool global sem criá-lo (None se ainda não foi iniciado)
+
+    Para leituras de status no event loop: criar o pool sobe os servidores
+    Java e bloqueia.
+    """
+    return _pool_instance
+
+
+def shutdown_languagetool_pool():
+    """Encerra o pool global, se já tiver sido inicializado"""
+    global _pool_instance
+    if _pool_instance is not None:
+        _pool_instance.shutdown()
+        _pool_instance = None
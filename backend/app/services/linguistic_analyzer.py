@@ -2,11 +2,14 @@
 Analisador Linguístico - Gramática, Ortografia, Coesão e Coerência
 """
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from loguru import logger
-import language_tool_python
 
 from app.models.schemas.correcao import ErroGramatical, AnaliseEstrutura
+from app.services.languagetool_pool import get_languagetool_pool
+from app.utils.aho_corasick import AhoCorasick
+from app.core.cache import get_prediction_cache, gerar_chave
+from app.core.config import settings
 
 
 class LinguisticAnalyzer:
@@ -20,13 +23,10 @@ class LinguisticAnalyzer:
 
     def __init__(self):
         logger.info("Inicializando LinguisticAnalyzer")
-        # Inicializar LanguageTool para português
-        try:
-            self.tool = language_tool_python.LanguageTool('pt-BR')
-            logger.info("LanguageTool inicializado (pt-BR)")
-        except Exception as e:
-            logger.error(f"Erro ao inicializar LanguageTool: {str(e)}")
-            self.tool = None
+        # Pool de servidores LanguageTool (pt-BR)
+        self.pool = get_languagetool_pool()
+
+        self.cache = get_prediction_cache()
 
         # Lista de conectivos comuns em redações
         self.conectivos = [
@@ -44,6 +44,27 @@ class LinguisticAnalyzer:
             "primeiramente", "em seguida", "posteriormente", "finalmente", "por fim"
         ]
 
+        # Palavras/expressões comuns em introduções
+        self.indicadores_introducao = [
+            "atualmente", "nos dias de hoje", "é sabido", "é notório",
+            "a sociedade", "o brasil", "no contexto", "diante",
+            "questão", "tema", "problema", "debate"
+        ]
+
+        # Palavras/expressões comuns em conclusões
+        self.indicadores_conclusao = [
+            "portanto", "logo", "assim", "dessa forma", "desse modo",
+            "conclui-se", "concluo", "por fim", "finalmente",
+            "medidas", "solução", "proposta", "necessário", "deve-se"
+        ]
+
+        # Autômato único: a redação é percorrida uma vez para todas as listas
+        self.matcher = AhoCorasick({
+            "conectivos": self.conectivos,
+            "introducao": self.indicadores_introducao,
+            "conclusao": self.indicadores_conclusao
+        })
+
     def analisar_completo(self, texto: str) -> Dict[str, any]:
         """
         Análise linguística completa
@@ -56,6 +77,16 @@ class LinguisticAnalyzer:
         """
         logger.info("Iniciando análise linguística completa")
 
+        # Sem LanguageTool o resultado é parcial e não vai para o cache.
+        # A chave usa o texto exato: as posições dos erros dependem dele.
+        chave_cache = None
+        if settings.CACHE_ENABLED and self.pool.disponiveis > 0:
+            chave_cache = gerar_chave("analise", texto)
+            em_cache = self.cache.get(chave_cache)
+            if em_cache is not None:
+                logger.info("Análise linguística obtida do cache")
+                return self._desserializar(em_cache)
+
         # Análise de erros gramaticais
         erros_gramaticais, num_ortografia, num_gramatica = self._analisar_erros(texto)
 
@@ -74,8 +105,83 @@ class LinguisticAnalyzer:
             f"Parágrafos: {analise_estrutura.num_paragrafos}"
         )
 
+        if chave_cache is not None:
+            self.cache.set(chave_cache, self._serializar(resultado))
+
         return resultado
 
+    def analisar_lote(self, textos: List[str]) -> List[Dict[str, any]]:
+        """
+        Análise linguística completa de várias redações (correção em lote)
+
+        Os parágrafos de todas as redações fora do cache vão juntos para o
+        pool de LanguageTool, ocupando todas as instâncias.
+
+        Returns:
+            Resultados no formato de analisar_completo, na ordem de textos
+        """
+        logger.info(f"Iniciando análise linguística em lote - {len(textos)} redações")
+
+        usar_cache = settings.CACHE_ENABLED and self.pool.disponiveis > 0
+        resultados: List[Optional[Dict[str, any]]] = [None] * len(textos)
+
+        if usar_cache:
+            for i, texto in enumerate(textos):
+                em_cache = self.cache.get(gerar_chave("analise", texto))
+                if em_cache is not None:
+                    resultados[i] = self._desserializar(em_cache)
+
+        pendentes = [i for i, r in enumerate(resultados) if r is None]
+        erros_lote = self._analisar_erros_lote([textos[i] for i in pendentes])
+
+        for i, (erros_gramaticais, num_ortografia, num_gramatica) in zip(pendentes, erros_lote):
+            resultados[i] = {
+                "erros_gramaticais": erros_gramaticais,
+                "num_erros_ortografia": num_ortografia,
+                "num_erros_gramatica": num_gramatica,
+                "analise_estrutura": self._analisar_estrutura(textos[i])
+            }
+            if usar_cache:
+                self.cache.set(gerar_chave("analise", textos[i]), self._serializar(resultados[i]))
+
+        logger.info(
+            f"Análise em lote concluída - {len(pendentes)} analisadas, "
+            f"{len(textos) - len(pendentes)} do cache"
+        )
+
+        return resultados
+
+    def analisar_gramatica(self, texto: str) -> Tuple[List[ErroGramatical], int, int]:
+        """
+        Apenas erros gramaticais e ortográficos (etapa da correção em streaming)
+
+        Returns:
+            (lista_erros, num_ortografia, num_gramatica)
+        """
+        return self._analisar_erros(texto)
+
+    def analisar_estrutura(self, texto: str) -> AnaliseEstrutura:
+        """Apenas estrutura, coesão e coerência (sem LanguageTool)"""
+        return self._analisar_estrutura(texto)
+
+    @staticmethod
+    def _serializar(resultado: Dict[str, any]) -> Dict[str, any]:
+        """Converte o resultado da análise para JSON (cache)"""
+        return {
+            **resultado,
+            "erros_gramaticais": [e.dict() for e in resultado["erros_gramaticais"]],
+            "analise_estrutura": resultado["analise_estrutura"].dict()
+        }
+
+    @staticmethod
+    def _desserializar(dados: Dict[str, any]) -> Dict[str, any]:
+        """Reconstrói os schemas a partir do resultado em cache"""
+        return {
+            **dados,
+            "erros_gramaticais": [ErroGramatical(**e) for e in dados["erros_gramaticais"]],
+            "analise_estrutura": AnaliseEstrutura(**dados["analise_estrutura"])
+        }
+
     def _analisar_erros(
         self,
         texto: str
@@ -86,41 +192,123 @@ class LinguisticAnalyzer:
         Returns:
             (lista_erros, num_ortografia, num_gramatica)
         """
-        erros = []
-        num_ortografia = 0
-        num_gramatica = 0
+        return self._analisar_erros_lote([texto])[0]
+
+    def _analisar_erros_lote(
+        self,
+        textos: List[str]
+    ) -> List[Tuple[List[ErroGramatical], int, int]]:
+        """
+        Analisa erros gramaticais e ortográficos de uma ou mais redações
+
+        Os parágrafos de todas as redações são verificados em paralelo no
+        pool de LanguageTool e as posições dos erros convertidas de volta
+        para o texto completo. Os erros de cada parágrafo ficam em cache
+        (posições relativas ao parágrafo): ao reenviar uma redação revisada,
+        só os parágrafos alterados voltam ao LanguageTool.
 
-        if not self.tool:
+        Returns:
+            (lista_erros, num_ortografia, num_gramatica) de cada redação
+        """
+        resultados = [([], 0, 0) for _ in textos]
+
+        if self.pool.disponiveis == 0:
             logger.warning("LanguageTool não disponível")
-            return erros, num_ortografia, num_gramatica
+            return resultados
 
         try:
-            matches = self.tool.check(texto)
-
-            for match in matches:
-                # Classificar tipo de erro
-                categoria = match.ruleId.split("_")[0].lower()
-                if "spell" in categoria or "orthography" in categoria:
-                    tipo = "ortografia"
-                    num_ortografia += 1
-                else:
-                    tipo = "gramática"
-                    num_gramatica += 1
-
-                erro = ErroGramatical(
-                    tipo=tipo,
-                    mensagem=match.message,
-                    trecho=match.context,
-                    sugestao=match.replacements[0] if match.replacements else None,
-                    posicao_inicio=match.offset,
-                    posicao_fim=match.offset + match.errorLength
+            # Parágrafos de todas as redações: (redação, posição inicial, trecho)
+            trechos = [
+                (r, inicio, trecho)
+                for r, texto in enumerate(textos)
+                for inicio, trecho in self._segmentar_paragrafos(texto)
+            ]
+            erros_por_trecho = [None] * len(trechos)
+
+            if settings.CACHE_ENABLED:
+                for i, (_, _, trecho) in enumerate(trechos):
+                    erros_por_trecho[i] = self.cache.get(gerar_chave("gramatica", trecho))
+
+            pendentes = [i for i, e in enumerate(erros_por_trecho) if e is None]
+            verificados = self.pool.verificar_paragrafos([trechos[i][2] for i in pendentes])
+
+            for i, matches in zip(pendentes, verificados):
+                erros_por_trecho[i] = [self._converter_match(m) for m in matches]
+                if settings.CACHE_ENABLED:
+                    self.cache.set(gerar_chave("gramatica", trechos[i][2]), erros_por_trecho[i])
+
+            if pendentes:
+                logger.debug(
+                    f"Gramática: {len(pendentes)}/{len(trechos)} parágrafos verificados "
+                    f"({len(trechos) - len(pendentes)} do cache)"
                 )
-                erros.append(erro)
+
+            erros: List[List[ErroGramatical]] = [[] for _ in textos]
+            num_ortografia = [0] * len(textos)
+            num_gramatica = [0] * len(textos)
+
+            for (r, inicio, _), erros_trecho in zip(trechos, erros_por_trecho):
+                for erro in erros_trecho:
+                    if erro["tipo"] == "ortografia":
+                        num_ortografia[r] += 1
+                    else:
+                        num_gramatica[r] += 1
+
+                    erros[r].append(ErroGramatical(
+                        tipo=erro["tipo"],
+                        mensagem=erro["mensagem"],
+                        trecho=erro["trecho"],
+                        sugestao=erro["sugestao"],
+                        posicao_inicio=inicio + erro["inicio"],
+                        posicao_fim=inicio + erro["fim"]
+                    ))
+
+            resultados = list(zip(erros, num_ortografia, num_gramatica))
 
         except Exception as e:
             logger.error(f"Erro ao analisar gramática: {str(e)}")
 
-        return erros, num_ortografia, num_gramatica
+        return resultados
+
+    @staticmethod
+    def _converter_match(match) -> Dict[str, any]:
+        """Converte um Match do LanguageTool (posições relativas ao parágrafo)"""
+        # Classificar tipo de erro
+        categoria = match.ruleId.split("_")[0].lower()
+        if "spell" in categoria or "orthography" in categoria:
+            tipo = "ortografia"
+        else:
+            tipo = "gramática"
+
+        return {
+            "tipo": tipo,
+            "mensagem": match.message,
+            "trecho": match.context,
+            "sugestao": match.replacements[0] if match.replacements else None,
+            "inicio": match.offset,
+            "fim": match.offset + match.errorLength
+        }
+
+    @staticmethod
+    def _segmentar_paragrafos(texto: str) -> List[Tuple[int, str]]:
+        """
+        Divide o texto em parágrafos (separados por linha em branco) para a
+        verificação gramatical
+
+        Quebras de linha simples ficam dentro do trecho: texto com quebra
+        fixa (colado de PDF/OCR) não tem frases cortadas ao meio.
+
+        Returns:
+            Lista de (posição inicial no texto, trecho)
+        """
+        segmentos = []
+        inicio = 0
+        for separador in re.finditer(r'\n\s*\n', texto):
+            segmentos.append((inicio, texto[inicio:separador.start()]))
+            inicio = separador.end()
+        segmentos.append((inicio, texto[inicio:]))
+
+        return [(pos, trecho) for pos, trecho in segmentos if trecho.strip()]
 
     def _analisar_estrutura(self, texto: str) -> AnaliseEstrutura:
         """
@@ -133,16 +321,19 @@ class LinguisticAnalyzer:
         paragrafos = self._extrair_paragrafos(texto)
         num_paragrafos = len(paragrafos)
 
+        # Conectivos e indicadores em uma única passada pelo texto
+        ocorrencias = self.matcher.buscar(texto)
+
         # Detectar partes da redação
-        tem_introducao = self._detectar_introducao(paragrafos)
+        tem_introducao = self._detectar_introducao(texto, paragrafos, ocorrencias)
         tem_desenvolvimento = num_paragrafos >= 3  # Pelo menos 2 parágrafos de desenvolvimento
-        tem_conclusao = self._detectar_conclusao(paragrafos)
+        tem_conclusao = self._detectar_conclusao(texto, paragrafos, ocorrencias)
 
         # Analisar uso de conectivos
-        uso_conectivos = self._analisar_conectivos(texto)
+        uso_conectivos = self._analisar_conectivos(ocorrencias)
 
         # Calcular scores de coesão e coerência
-        coesao_score = self._calcular_coesao(texto, paragrafos)
+        coesao_score = self._calcular_coesao(texto, ocorrencias)
         coerencia_score = self._calcular_coerencia(paragrafos)
 
         return AnaliseEstrutura(
@@ -163,50 +354,50 @@ class LinguisticAnalyzer:
         paragrafos = [p.strip() for p in paragrafos if p.strip()]
         return paragrafos
 
-    def _detectar_introducao(self, paragrafos: List[str]) -> bool:
+    @staticmethod
+    def _ocorre_entre(
+        ocorrencias: Dict[str, Dict[str, List[int]]],
+        grupo: str,
+        inicio: int,
+        fim: int
+    ) -> bool:
+        """True se alguma expressão do grupo começa em texto[inicio:fim]"""
+        return any(
+            inicio <= posicao < fim
+            for posicoes in ocorrencias[grupo].values()
+            for posicao in posicoes
+        )
+
+    def _detectar_introducao(
+        self,
+        texto: str,
+        paragrafos: List[str],
+        ocorrencias: Dict[str, Dict[str, List[int]]]
+    ) -> bool:
         """Detecta se há introdução adequada"""
         if not paragrafos:
             return False
 
-        primeiro_paragrafo = paragrafos[0].lower()
-
-        # Palavras/expressões comuns em introduções
-        indicadores = [
-            "atualmente", "nos dias de hoje", "é sabido", "é notório",
-            "a sociedade", "o brasil", "no contexto", "diante",
-            "questão", "tema", "problema", "debate"
-        ]
-
-        # Se tiver algum indicador, considerar que tem introdução
-        return any(ind in primeiro_paragrafo for ind in indicadores)
+        # Se o primeiro parágrafo tiver algum indicador, considerar que tem introdução
+        inicio = texto.find(paragrafos[0])
+        return self._ocorre_entre(ocorrencias, "introducao", inicio, inicio + len(paragrafos[0]))
 
-    def _detectar_conclusao(self, paragrafos: List[str]) -> bool:
+    def _detectar_conclusao(
+        self,
+        texto: str,
+        paragrafos: List[str],
+        ocorrencias: Dict[str, Dict[str, List[int]]]
+    ) -> bool:
         """Detecta se há conclusão adequada"""
         if len(paragrafos) < 2:
             return False
 
-        ultimo_paragrafo = paragrafos[-1].lower()
+        inicio = texto.rfind(paragrafos[-1])
+        return self._ocorre_entre(ocorrencias, "conclusao", inicio, inicio + len(paragrafos[-1]))
 
-        # Palavras/expressões comuns em conclusões
-        indicadores = [
-            "portanto", "logo", "assim", "dessa forma", "desse modo",
-            "conclui-se", "concluo", "portanto", "por fim", "finalmente",
-            "medidas", "solução", "proposta", "necessário", "deve-se"
-        ]
-
-        return any(ind in ultimo_paragrafo for ind in indicadores)
-
-    def _analisar_conectivos(self, texto: str) -> str:
-        """Analisa uso de conectivos"""
-        texto_lower = texto.lower()
-
-        # Contar conectivos encontrados
-        conectivos_encontrados = [
-            c for c in self.conectivos
-            if c in texto_lower
-        ]
-
-        num_conectivos = len(conectivos_encontrados)
+    def _analisar_conectivos(self, ocorrencias: Dict[str, Dict[str, List[int]]]) -> str:
+        """Analisa uso de conectivos (número de conectivos distintos)"""
+        num_conectivos = len(ocorrencias["conectivos"])
 
         if num_conectivos >= 8:
             return "excelente"
@@ -217,7 +408,11 @@ class LinguisticAnalyzer:
         else:
             return "insuficiente"
 
-    def _calcular_coesao(self, texto: str, paragrafos: List[str]) -> float:
+    def _calcular_coesao(
+        self,
+        texto: str,
+        ocorrencias: Dict[str, Dict[str, List[int]]]
+    ) -> float:
         """
         Calcula score de coesão (0-1)
         Baseado em: uso de conectivos, repetições, progressão
@@ -225,13 +420,12 @@ class LinguisticAnalyzer:
         score = 0.5  # Base
 
         # Bonus por conectivos
-        texto_lower = texto.lower()
-        num_conectivos = sum(1 for c in self.conectivos if c in texto_lower)
+        num_conectivos = len(ocorrencias["conectivos"])
         conectivos_score = min(num_conectivos / 10.0, 0.3)
         score += conectivos_score
 
         # Penalidade por repetições excessivas
-        palavras = texto_lower.split()
+        palavras = texto.lower().split()
         if len(palavras) > 0:
             palavras_unicas = set(palavras)
             diversidade = len(palavras_unicas) / len(palavras)
@@ -0,0 +1,102 @@
+"""
+Busca de múltiplas expressões em uma única passada (Aho-Corasick)
+
+O autômato é construído uma vez com grupos de expressões (ex: conectivos,
+indicadores de introdução) e percorre o texto caractere a caractere,
+ignorando maiúsculas e aceitando apenas ocorrências que começam e
+terminam em limite de palavra ("mas" não casa dentro de "temas").
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+def _normalizar_caractere(c: str) -> str:
+    """Minúscula e espaços unificados, preservando o comprimento do texto"""
+    if c.isspace():
+        return " "
+    minuscula = c.lower()
+    return minuscula if len(minuscula) == 1 else c
+
+
+class AhoCorasick:
+    """
+    Autômato de Aho-Corasick sobre grupos nomeados de expressões
+
+    Exemplo:
+        automato = AhoCorasick({"conectivos": ["mas", "no entanto"]})
+        automato.buscar("Mas, no entanto, os temas...")
+        # {"conectivos": {"mas": [0], "no entanto": [5]}}
+    """
+
+    def __init__(self, grupos: Dict[str, Iterable[str]]):
+        self.grupos = list(grupos)
+
+        # Trie: transições, link de falha e saídas (grupo, expressão) por nó
+        self._transicoes: List[Dict[str, int]] = [{}]
+        self._falha: List[int] = [0]
+        self._saidas: List[List[Tuple[str, str]]] = [[]]
+
+        for grupo, expressoes in grupos.items():
+            for expressao in dict.fromkeys(e.lower() for e in expressoes):
+                self._inserir(expressao, grupo)
+
+        self._construir_falhas()
+
+    def _inserir(self, expressao: str, grupo: str):
+        no = 0
+        for c in expressao:
+            proximo = self._transicoes[no].get(c)
+            if proximo is None:
+                proximo = len(self._transicoes)
+                self._transicoes[no][c] = proximo
+                self._transicoes.append({})
+                self._falha.append(0)
+                self._saidas.append([])
+            no = proximo
+        self._saidas[no].append((grupo, expressao))
+
+    def _construir_falhas(self):
+        """Links de falha em largura; cada nó herda as saídas do seu link"""
+        fila = deque(self._transicoes[0].values())
+
+        while fila:
+            no = fila.popleft()
+            for c, filho in self._transicoes[no].items():
+                fila.append(filho)
+
+                falha = self._falha[no]
+                while falha and c not in self._transicoes[falha]:
+                    falha = self._falha[falha]
+
+                destino = self._transicoes[falha].get(c, 0)
+                self._falha[filho] = destino if destino != filho else 0
+                self._saidas[filho] = self._saidas[filho] + self._saidas[self._falha[filho]]
+
+    @staticmethod
+    def _limite_palavra(texto: str, posicao: int) -> bool:
+        return posicao < 0 or posicao >= len(texto) or not texto[posicao].isalnum()
+
+    def buscar(self, texto: str) -> Dict[str, Dict[str, List[int]]]:
+        """
+        Percorre o texto uma vez e localiza todas as expressões
+
+        Returns:
+            Dict grupo -> expressão -> posições iniciais no texto (apenas
+            expressões encontradas; a contagem é o tamanho da lista)
+        """
+        resultado: Dict[str, Dict[str, List[int]]] = {grupo: {} for grupo in self.grupos}
+        no = 0
+
+        for i, c in enumerate(texto):
+            c = _normalizar_caractere(c)
+
+            while no and c not in self._transicoes[no]:
+                no = self._falha[no]
+            no = self._transicoes[no].get(c, 0)
+
+            for grupo, expressao in self._saidas[no]:
+                inicio = i - len(expressao) + 1
+                if self._limite_palavra(texto, inicio - 1) and self._limite_palavra(texto, i + 1):
+                    resultado[grupo].setdefault(expressao, []).append(inicio)
+
+        return resultado
@@ -0,0 +1,169 @@
+"""
+Leitura de redações enviadas em arquivo para a correção em lote
+
+CSV: uma redação por linha, com a coluna "texto" e, opcionalmente,
+"titulo", "prompt_id" e "usuario_id".
+ZIP: um arquivo .txt por redação; o nome do arquivo vira o título.
+
+Os limites são verificados antes de descompactar: um ZIP pequeno pode
+expandir para gigabytes (zip bomb).
+"""
+import csv
+import io
+import zipfile
+from pathlib import PurePosixPath
+from typing import Any, Dict, List
+
+from app.core.config import settings
+
+# Bem acima das 5000 letras aceitas por RedacaoInput, mesmo em UTF-8
+MAX_BYTES_REDACAO = 64 * 1024
+
+
+class LoteGrandeDemaisError(ValueError):
+    """Arquivo com mais redações do que o permitido por lote"""
+
+    def __init__(self, max_itens: int):
+        super().__init__(f"Máximo de {max_itens} redações por lote")
+        self.max_itens = max_itens
+
+
+def _decodificar(conteudo: bytes) -> str:
+    """UTF-8 (com ou sem BOM), com fallback para Latin-1 (Excel no Windows)"""
+    try:
+        return conteudo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return conteudo.decode("latin-1")
+
+
+def ler_redacoes_csv(
+    conteudo: bytes,
+    max_itens: int = settings.BULK_MAX_ITEMS
+) -> List[Dict[str, Any]]:
+    """
+    Lê as redações de um CSV (separador vírgula ou ponto e vírgula)
+
+    Raises:
+        ValueError: se o CSV não tiver a coluna "texto"
+        LoteGrandeDemaisError: mais de max_itens linhas
+    """
+    texto = _decodificar(conteudo)
+
+    try:
+        dialeto = csv.Sniffer().sniff(texto[:4096], delimiters=",;")
+    except csv.Error:
+        dialeto = csv.excel
+
+    leitor = csv.DictReader(io.StringIO(texto), dialect=dialeto)
+    colunas = [c.strip().lower() for c in (leitor.fieldnames or [])]
+    if "texto" not in colunas:
+        raise ValueError('O CSV precisa ter a coluna "texto"')
+
+    redacoes = []
+    for linha in leitor:
+        if len(redacoes) >= max_itens:
+            raise LoteGrandeDemaisError(max_itens)
+
+        linha = {
+            (chave or "").strip().lower(): (valor.strip() if isinstance(valor, str) else valor)
+            for chave, valor in linha.items()
+        }
+        redacoes.append({
+            "texto": linha.get("texto") or "",
+            "titulo": linha.get("titulo") or None,
+            "prompt_id": linha.get("prompt_id") or None,
+            "usuario_id": linha.get("usuario_id") or None
+        })
+
+    return redacoes
+
+
+def ler_redacoes_zip(
+    conteudo: bytes,
+    max_itens: int = settings.BULK_MAX_ITEMS,
+    max_bytes_total: int = settings.BULK_MAX_UPLOAD_MB * 1024 * 1024
+) -> List[Dict[str, Any]]:
+    """
+    Lê as redações dos arquivos .txt de um ZIP, em ordem alfabética
+
+    Quantidade e tamanho descompactado (por redação e total) são checados
+    no índice do ZIP antes de ler qualquer arquivo; a leitura também para
+    no tamanho declarado, caso o índice minta.
+
+    Raises:
+        ValueError: ZIP inválido ou arquivos grandes demais
+        LoteGrandeDemaisError: mais de max_itens arquivos .txt
+    """
+    try:
+        arquivo = zipfile.ZipFile(io.BytesIO(conteudo))
+    except zipfile.BadZipFile:
+        raise ValueError("Arquivo ZIP inválido")
+
+    with arquivo:
+        membros = []
+        for info in sorted(arquivo.infolist(), key=lambda i: i.filename):
+            caminho = PurePosixPath(info.filename)
+            if (
+                info.is_dir()
+                or caminho.suffix.lower() != ".txt"
+                or caminho.name.startswith(".")
+                or "__MACOSX" in caminho.parts
+            ):
+                continue
+            membros.append((info, caminho))
+
+        if len(membros) > max_itens:
+            raise LoteGrandeDemaisError(max_itens)
+
+        for info, caminho in membros:
+            if info.file_size > MAX_BYTES_REDACAO:
+                raise ValueError(
+                    f"{caminho.name} tem mais de {MAX_BYTES_REDACAO // 1024} KB descompactado"
+                )
+        if sum(info.file_size for info, _ in membros) > max_bytes_total:
+            raise ValueError(
+                f"Conteúdo descompactado maior que {max_bytes_total // (1024 * 1024)} MB"
+            )
+
+        redacoes = []
+        for info, caminho in membros:
+            try:
+                with arquivo.open(info) as membro:
+                    dados = membro.read(MAX_BYTES_REDACAO + 1)
+            except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, RuntimeError):
+                raise ValueError(f"Não foi possível ler {caminho.name} do ZIP")
+
+            if len(dados) > MAX_BYTES_REDACAO:
+                raise ValueError(
+                    f"{caminho.name} tem mais de {MAX_BYTES_REDACAO // 1024} KB descompactado"
+                )
+
+            redacoes.append({
+                "texto": _decodificar(dados),
+                "titulo": caminho.stem,
+                "prompt_id": None,
+                "usuario_id": None
+            })
+
+    return redacoes
+
+
+def ler_arquivo_redacoes(nome_arquivo: str, conteudo: bytes) -> List[Dict[str, Any]]:
+    """
+    Lê as redações de um CSV ou ZIP conforme a extensão
+
+    Faz a descompactação e o parsing de forma síncrona: em código async,
+    chamar pelo threadpool.
+
+    Raises:
+        ValueError: extensão não suportada ou arquivo inválido
+        LoteGrandeDemaisError: mais redações do que BULK_MAX_ITEMS
+    """
+    extensao = PurePosixPath(nome_arquivo or "").suffix.lower()
+
+    if extensao == ".csv":
+        return ler_redacoes_csv(conteudo)
+    if extensao == ".zip":
+        return ler_redacoes_zip(conteudo)
+
+    raise ValueError("Formato não suportado. Envie um arquivo .csv ou .zip")
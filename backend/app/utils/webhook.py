@@ -0,0 +1,70 @@
+"""
+Validação das URLs de webhook informadas pelos clientes
+
+O worker faz um POST para a URL do cliente; sem validação, qualquer um
+poderia apontá-la para serviços internos (redis, localhost, metadados da
+nuvem em 169.254.169.254). A URL é validada ao criar o job e de novo
+antes de cada envio, já que o DNS pode mudar entre um e outro.
+"""
+import ipaddress
+import socket
+from typing import List
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+
+
+def _hosts_permitidos() -> List[str]:
+    """Hosts de WEBHOOK_ALLOWED_HOSTS (separados por vírgula)"""
+    return [
+        host.strip().lower().lstrip(".")
+        for host in settings.WEBHOOK_ALLOWED_HOSTS.split(",")
+        if host.strip()
+    ]
+
+
+def _host_permitido(host: str, permitidos: List[str]) -> bool:
+    """O host é um dos permitidos ou subdomínio de um deles"""
+    return any(host == p or host.endswith(f".{p}") for p in permitidos)
+
+
+def validar_url_webhook(url: str) -> None:
+    """
+    Garante que a URL do webhook aponta para um endereço público
+
+    Faz resolução de DNS (bloqueante): em código async, chamar pelo
+    threadpool.
+
+    Raises:
+        ValueError: esquema não suportado, host fora de WEBHOOK_ALLOWED_HOSTS,
+            host que não resolve ou que resolve para endereço interno
+            (loopback, privado, link-local, reservado, multicast)
+    """
+    partes = urlsplit(url)
+    if partes.scheme not in ("http", "https"):
+        raise ValueError("O webhook precisa usar http ou https")
+
+    host = (partes.hostname or "").lower()
+    if not host:
+        raise ValueError("URL de webhook sem host")
+
+    permitidos = _hosts_permitidos()
+    if permitidos and not _host_permitido(host, permitidos):
+        raise ValueError(f"Host de webhook não permitido: {host}")
+
+    try:
+        enderecos = {
+            info[4][0]
+            for info in socket.getaddrinfo(host, partes.port or None, proto=socket.IPPROTO_TCP)
+        }
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"Host de webhook não encontrado: {host}")
+
+    for endereco in enderecos:
+        ip = ipaddress.ip_address(endereco.split("%", 1)[0])
+        # IPv4 mapeado em IPv6 (::ffff:127.0.0.1) é avaliado como IPv4
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"Webhook aponta para endereço interno: {host} ({ip})")
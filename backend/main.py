@@ -133,6 +133,18 @@ async def shutdown_event():
     logger.info(f"🛑 Encerrando {settings.APP_NAME}")
     logger.info("=" * 70)
 
+    from app.ml.predictor import shutdown_predictor
+    from app.services.inference_executor import shutdown_inference_executor
+    from app.services.languagetool_pool import shutdown_languagetool_pool
+    shutdown_inference_executor()
+    shutdown_predictor()
+    shutdown_languagetool_pool()
+
+    from app.db.buffer_correcoes import shutdown_buffer_correcoes
+    from app.db.supabase_client import supabase_client
+    await shutdown_buffer_correcoes()
+    await supabase_client.fechar()
+
 
 @app.get("/")
 async def root():
@@ -0,0 +1,179 @@
+"""
+Script para comparar o ensemble fp32 com a variante int8 (quantização
+dinâmica): regressão de acurácia, latência e tamanho dos pesos
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import torch
+from loguru import logger
+
+from app.ml.ensemble import EnsembleRedacaoModel
+from app.core.config import settings
+from build_dataset import Corpus
+from training.evaluate import avaliar_modelo
+
+
+def medir_tamanho_mb(ensemble: EnsembleRedacaoModel) -> float:
+    """Tamanho dos pesos em memória: state_dicts serializados + encoders ONNX"""
+    total = 0
+    for model, encoder in zip(ensemble.models, ensemble.encoders):
+        buffer = io.BytesIO()
+        torch.save(model.state_dict(), buffer)
+        total += buffer.tell()
+        if encoder is not None:
+            total += encoder.caminho.stat().st_size
+    return total / (1024 ** 2)
+
+
+def medir_latencia(
+    ensemble: EnsembleRedacaoModel,
+    textos: List[str],
+    aquecimento: int = 3
+) -> Dict[str, float]:
+    """
+    Latência por redação (lotes de 1) e vazão com lotes de INFERENCE_MAX_BATCH_SIZE
+
+    Returns:
+        Dict com p50/p95 em ms e redações por segundo
+    """
+    for texto in textos[:aquecimento]:
+        ensemble.predict_batch([texto])
+
+    latencias = []
+    for texto in textos:
+        inicio = time.perf_counter()
+        ensemble.predict_batch([texto])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    tamanho_lote = max(1, settings.INFERENCE_MAX_BATCH_SIZE)
+    for i in range(0, len(textos), tamanho_lote):
+        ensemble.predict_batch(textos[i:i + tamanho_lote])
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "latencia_p50_ms": float(np.percentile(latencias, 50)),
+        "latencia_p95_ms": float(np.percentile(latencias, 95)),
+        "redacoes_por_segundo": len(textos) / duracao
+    }
+
+
+def comparar(
+    model_version: str = "latest",
+    backend: str = "pytorch",
+    num_amostras_latencia: int = 50
+) -> Dict[str, Any]:
+    """
+    Avalia as variantes fp32 e int8 do mesmo backend
+
+    Args:
+        model_version: Versão do modelo
+        backend: pytorch (quantização ao carregar) ou onnx (.int8.onnx exportado)
+        num_amostras_latencia: Redações do test set usadas na medição de latência
+
+    Returns:
+        Dict com as métricas de cada variante e os deltas (int8 - fp32)
+    """
+    logger.info("=" * 70)
+    logger.info(f"COMPARAÇÃO FP32 x INT8 - Versão: {model_version}, Backend: {backend}")
+    logger.info("=" * 70)
+
+    test = Corpus.load('test', columns=['essay'])
+    textos = [
+        ' '.join(essay) if isinstance(essay, list) else str(essay)
+        for essay in test['essay'].head(num_amostras_latencia)
+    ]
+
+    relatorio = {}
+    for nome, quantizar in (("fp32", False), ("int8", True)):
+        ensemble = EnsembleRedacaoModel(
+            num_models=settings.ENSEMBLE_SIZE,
+            device="cpu",
+            backend=backend,
+            quantizar=quantizar
+        )
+        if not ensemble.load_ensemble(settings.MODEL_BASE_PATH, model_version):
+            logger.error(f"Falha ao carregar variante {nome}")
+            return None
+
+        metricas = avaliar_modelo(model_version, ensemble=ensemble)
+        if metricas is None:
+            return None
+
+        relatorio[nome] = {
+            **metricas,
+            **medir_latencia(ensemble, textos),
+            "tamanho_mb": medir_tamanho_mb(ensemble)
+        }
+
+        del ensemble
+
+    fp32, int8 = relatorio["fp32"], relatorio["int8"]
+    relatorio["delta"] = {
+        "rmse": int8["rmse"] - fp32["rmse"],
+        "qwk": int8["qwk"] - fp32["qwk"],
+        "competencias_rmse": {
+            comp: int8["competencias"][comp]["rmse"] - fp32["competencias"][comp]["rmse"]
+            for comp in fp32["competencias"]
+        },
+        "speedup_p50": fp32["latencia_p50_ms"] / int8["latencia_p50_ms"],
+        "reducao_tamanho": 1.0 - int8["tamanho_mb"] / fp32["tamanho_mb"]
+    }
+
+    logger.info("\n" + "=" * 70)
+    logger.info("RELATÓRIO DE QUANTIZAÇÃO")
+    logger.info("=" * 70)
+    for nome in ("fp32", "int8"):
+        r = relatorio[nome]
+        logger.info(
+            f"  {nome}: RMSE {r['rmse']:.2f} | QWK {r['qwk']:.3f} | "
+            f"p50 {r['latencia_p50_ms']:.0f}ms | p95 {r['latencia_p95_ms']:.0f}ms | "
+            f"{r['redacoes_por_segundo']:.1f} redações/s | {r['tamanho_mb']:.0f}MB"
+        )
+
+    delta = relatorio["delta"]
+    logger.info(
+        f"  Delta: RMSE {delta['rmse']:+.2f} | QWK {delta['qwk']:+.3f} | "
+        f"Speedup {delta['speedup_p50']:.2f}x | Tamanho -{delta['reducao_tamanho'] * 100:.0f}%"
+    )
+    for comp, d in delta["competencias_rmse"].items():
+        logger.info(f"    {comp.upper()} - RMSE {d:+.2f}")
+    logger.info("=" * 70)
+
+    return relatorio
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Comparar ensemble fp32 e int8")
+    parser.add_argument(
+        "--version",
+        type=str,
+        default="latest",
+        help="Versão do modelo (default: latest)"
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default="pytorch",
+        choices=["pytorch", "onnx"],
+        help="Backend de inferência (default: pytorch)"
+    )
+    parser.add_argument(
+        "--amostras",
+        type=int,
+        default=50,
+        help="Redações usadas na medição de latência (default: 50)"
+    )
+
+    args = parser.parse_args()
+
+    comparar(args.version, args.backend, args.amostras)
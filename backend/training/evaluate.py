@@ -5,7 +5,10 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from typing import Any, Dict, List, Optional
+
 import numpy as np
+from torch.utils.data import DataLoader
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 from scipy.stats import pearsonr
 from loguru import logger
@@ -15,6 +18,30 @@ from app.core.config import settings
 from build_dataset import Corpus
 
 
+COMPETENCIAS = [f'c{i}' for i in range(1, 6)]
+
+
+def matriz_confusao(y_true, y_pred, min_rating=0, max_rating=1000):
+    """
+    Matriz de confusão entre notas reais e preditas (vetorizada)
+
+    Predições são arredondadas para o inteiro mais próximo e limitadas
+    ao intervalo [min_rating, max_rating].
+
+    Returns:
+        Matriz [num_ratings, num_ratings] (linhas: real, colunas: predita)
+    """
+    num_ratings = int(max_rating - min_rating + 1)
+
+    t = np.clip(np.rint(np.asarray(y_true)), min_rating, max_rating).astype(int) - min_rating
+    p = np.clip(np.rint(np.asarray(y_pred)), min_rating, max_rating).astype(int) - min_rating
+
+    return np.bincount(
+        t * num_ratings + p,
+        minlength=num_ratings * num_ratings
+    ).reshape(num_ratings, num_ratings).astype(float)
+
+
 def calcular_qwk(y_true, y_pred, min_rating=0, max_rating=1000):
     """
     Calcula Quadratic Weighted Kappa
@@ -28,138 +55,203 @@ def calcular_qwk(y_true, y_pred, min_rating=0, max_rating=1000):
     Returns:
         QWK score
     """
-    y_true = np.asarray(y_true)
-    y_pred = np.asarray(y_pred)
-
-    # Discretizar em bins
-    num_ratings = int(max_rating - min_rating + 1)
-    conf_mat = np.zeros((num_ratings, num_ratings))
+    conf_mat = matriz_confusao(y_true, y_pred, min_rating, max_rating)
+    num_ratings = conf_mat.shape[0]
+    num_scored_items = conf_mat.sum()
 
-    for t, p in zip(y_true, y_pred):
-        conf_mat[int(t - min_rating), int(p - min_rating)] += 1
+    if num_scored_items == 0:
+        return 0.0
 
     # Matriz de pesos quadráticos
-    num_scored_items = len(y_true)
-    hist_true = np.bincount(y_true.astype(int) - min_rating, minlength=num_ratings)
-    hist_pred = np.bincount(y_pred.astype(int) - min_rating, minlength=num_ratings)
+    indices = np.arange(num_ratings)
+    pesos = (indices[:, None] - indices[None, :]) ** 2 / (num_ratings - 1) ** 2
 
-    numerator = 0.0
-    denominator = 0.0
+    # Contagens esperadas pelos histogramas marginais
+    hist_true = conf_mat.sum(axis=1)
+    hist_pred = conf_mat.sum(axis=0)
+    expected = np.outer(hist_true, hist_pred) / num_scored_items
 
-    for i in range(num_ratings):
-        for j in range(num_ratings):
-            expected_count = (hist_true[i] * hist_pred[j] / num_scored_items)
-            d = (i - j) ** 2 / (num_ratings - 1) ** 2
-            numerator += d * conf_mat[i, j]
-            denominator += d * expected_count
+    numerator = (pesos * conf_mat).sum()
+    denominator = (pesos * expected).sum()
 
     if denominator == 0:
         return 0.0
 
-    return 1.0 - (numerator / denominator)
+    return float(1.0 - numerator / denominator)
+
+
+def extrair_textos(df) -> List[str]:
+    """Textos das redações (o corpus guarda cada redação como lista de parágrafos)"""
+    return [
+        ' '.join(essay) if isinstance(essay, list) else str(essay)
+        for essay in df['essay']
+    ]
 
 
-def avaliar_modelo(model_version: str = "latest"):
+def predizer_lotes(
+    ensemble: EnsembleRedacaoModel,
+    textos: List[str],
+    batch_size: int = 32
+) -> Dict[str, np.ndarray]:
+    """
+    Predições do ensemble em lotes (um forward por grupo de comprimento
+    parecido dentro de cada lote, via predict_batch)
+
+    Returns:
+        Dict com competencias [N, 5], score [N] e confianca [N]
+    """
+    loader = DataLoader(textos, batch_size=batch_size, shuffle=False, collate_fn=list)
+
+    competencias, scores, confiancas = [], [], []
+
+    for num_lote, lote in enumerate(loader, start=1):
+        for resultado in ensemble.predict_batch(lote):
+            competencias.append([resultado['competencias'][c]['nota'] for c in COMPETENCIAS])
+            scores.append(resultado['score_total']['nota'])
+            confiancas.append(resultado['confianca'])
+
+        if num_lote % 10 == 0:
+            logger.info(f"Processadas {len(scores)}/{len(textos)} amostras")
+
+    return {
+        "competencias": np.array(competencias),
+        "score": np.array(scores),
+        "confianca": np.array(confiancas)
+    }
+
+
+def calcular_metricas(
+    predicoes: Dict[str, np.ndarray],
+    targets_comp: np.ndarray,
+    targets_score: np.ndarray
+) -> Dict[str, Any]:
+    """
+    RMSE, MAE, correlação e QWK do score total e de cada competência
+
+    Args:
+        predicoes: Saída de predizer_lotes
+        targets_comp: Notas reais por competência [N, 5]
+        targets_score: Score total real [N]
+    """
+    pred_score = predicoes["score"]
+
+    metricas_comp = {}
+    for i, comp_key in enumerate(COMPETENCIAS):
+        y_true = targets_comp[:, i]
+        y_pred = predicoes["competencias"][:, i]
+        metricas_comp[comp_key] = {
+            "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+            "mae": float(mean_absolute_error(y_true, y_pred)),
+            "qwk": calcular_qwk(y_true, y_pred, min_rating=0, max_rating=200)
+        }
+
+    confiancas = predicoes["confianca"]
+
+    return {
+        "num_amostras": len(targets_score),
+        "rmse": float(np.sqrt(mean_squared_error(targets_score, pred_score))),
+        "mae": float(mean_absolute_error(targets_score, pred_score)),
+        "correlacao": float(pearsonr(targets_score, pred_score)[0]),
+        "qwk": calcular_qwk(targets_score, pred_score),
+        "competencias": metricas_comp,
+        "confianca_media": float(confiancas.mean()),
+        "alta_confianca": float((confiancas >= settings.CONFIDENCE_THRESHOLD).mean()),
+        "baixa_confianca": float((confiancas < settings.LOW_CONFIDENCE_THRESHOLD).mean())
+    }
+
+
+def avaliar_ensemble(
+    ensemble: EnsembleRedacaoModel,
+    df,
+    batch_size: int = 32
+) -> Dict[str, Any]:
+    """
+    Avalia um ensemble carregado em um DataFrame do corpus
+    (colunas essay, c1-c5 e score)
+
+    Returns:
+        Dict com as métricas (ver calcular_metricas)
+    """
+    textos = extrair_textos(df)
+    targets_comp = df[COMPETENCIAS].to_numpy(dtype=float)
+    targets_score = df['score'].to_numpy(dtype=float)
+
+    logger.info(f"Fazendo predições em lotes de {batch_size}...")
+    predicoes = predizer_lotes(ensemble, textos, batch_size=batch_size)
+
+    return calcular_metricas(predicoes, targets_comp, targets_score)
+
+
+def avaliar_modelo(
+    model_version: str = "latest",
+    ensemble: EnsembleRedacaoModel = None,
+    batch_size: int = 32
+) -> Optional[Dict[str, Any]]:
     """
     Avalia modelo em test set
 
     Args:
         model_version: Versão do modelo a avaliar
+        ensemble: Ensemble já carregado (ex: variante quantizada); se None,
+            carrega model_version com as configurações atuais
+        batch_size: Redações por lote de predição
+
+    Returns:
+        Dict com as métricas, ou None se o modelo não pôde ser carregado
     """
     logger.info("=" * 70)
     logger.info(f"AVALIAÇÃO DO MODELO - Versão: {model_version}")
     logger.info("=" * 70)
 
     # Carregar ensemble
-    ensemble = EnsembleRedacaoModel(num_models=settings.ENSEMBLE_SIZE)
-    success = ensemble.load_ensemble(settings.MODEL_BASE_PATH, model_version)
+    if ensemble is None:
+        ensemble = EnsembleRedacaoModel(num_models=settings.ENSEMBLE_SIZE)
+        success = ensemble.load_ensemble(settings.MODEL_BASE_PATH, model_version)
 
-    if not success:
-        logger.error(f"Falha ao carregar modelo {model_version}")
-        return
+        if not success:
+            logger.error(f"Falha ao carregar modelo {model_version}")
+            return None
 
     # Carregar test set
     logger.info("Carregando test set...")
-    _, _, test = Corpus().read_splits()
+    test = Corpus.load('test', columns=['essay'] + COMPETENCIAS + ['score'])
 
     logger.info(f"Test set: {len(test)} amostras")
 
-    # Fazer predições
-    logger.info("Fazendo predições...")
-    predicoes_score = []
-    predicoes_comp = {f'c{i}': [] for i in range(1, 6)}
-    targets_score = []
-    targets_comp = {f'c{i}': [] for i in range(1, 6)}
-    confiancas = []
-
-    for idx, row in test.iterrows():
-        # Extrair texto
-        if isinstance(row['essay'], list):
-            texto = ' '.join(row['essay'])
-        else:
-            texto = str(row['essay'])
-
-        # Predição
-        try:
-            resultado = ensemble.predict(texto)
-
-            # Armazenar predições
-            predicoes_score.append(resultado['score_total']['nota'])
-            confiancas.append(resultado['confianca'])
-
-            for i in range(1, 6):
-                comp_key = f'c{i}'
-                predicoes_comp[comp_key].append(resultado['competencias'][comp_key]['nota'])
-                targets_comp[comp_key].append(row[comp_key])
-
-            # Target
-            targets_score.append(row['score'])
+    metricas = avaliar_ensemble(ensemble, test, batch_size=batch_size)
+    logar_metricas(metricas)
 
-            if (idx + 1) % 50 == 0:
-                logger.info(f"Processadas {idx + 1}/{len(test)} amostras")
+    return metricas
 
-        except Exception as e:
-            logger.error(f"Erro na amostra {idx}: {str(e)}")
-            continue
 
-    # Calcular métricas
+def logar_metricas(metricas: Dict[str, Any]):
+    """Loga as métricas de avaliar_ensemble"""
     logger.info("\n" + "=" * 70)
     logger.info("MÉTRICAS DO MODELO")
     logger.info("=" * 70)
 
-    # Score total
-    rmse_total = np.sqrt(mean_squared_error(targets_score, predicoes_score))
-    mae_total = mean_absolute_error(targets_score, predicoes_score)
-    corr_total, _ = pearsonr(targets_score, predicoes_score)
-    qwk_total = calcular_qwk(
-        np.array(targets_score).astype(int),
-        np.array(predicoes_score).astype(int)
-    )
-
     logger.info("\nScore Total:")
-    logger.info(f"  RMSE: {rmse_total:.2f}")
-    logger.info(f"  MAE: {mae_total:.2f}")
-    logger.info(f"  Correlação: {corr_total:.3f}")
-    logger.info(f"  QWK: {qwk_total:.3f}")
+    logger.info(f"  RMSE: {metricas['rmse']:.2f}")
+    logger.info(f"  MAE: {metricas['mae']:.2f}")
+    logger.info(f"  Correlação: {metricas['correlacao']:.3f}")
+    logger.info(f"  QWK: {metricas['qwk']:.3f}")
 
-    # Por competência
     logger.info("\nPor Competência:")
-    for i in range(1, 6):
-        comp_key = f'c{i}'
-        rmse = np.sqrt(mean_squared_error(targets_comp[comp_key], predicoes_comp[comp_key]))
-        mae = mean_absolute_error(targets_comp[comp_key], predicoes_comp[comp_key])
-
-        logger.info(f"  C{i} - RMSE: {rmse:.2f} | MAE: {mae:.2f}")
-
-    # Confiança
-    confianca_media = np.mean(confiancas)
-    alta_confianca = sum(1 for c in confiancas if c >= settings.CONFIDENCE_THRESHOLD) / len(confiancas)
-    baixa_confianca = sum(1 for c in confiancas if c < settings.LOW_CONFIDENCE_THRESHOLD) / len(confiancas)
+    for comp_key, m in metricas["competencias"].items():
+        logger.info(
+            f"  {comp_key.upper()} - RMSE: {m['rmse']:.2f} | MAE: {m['mae']:.2f} | QWK: {m['qwk']:.3f}"
+        )
 
     logger.info("\nConfiança:")
-    logger.info(f"  Média: {confianca_media:.3f}")
-    logger.info(f"  Alta confiança (>={settings.CONFIDENCE_THRESHOLD}): {alta_confianca*100:.1f}%")
-    logger.info(f"  Baixa confiança (<{settings.LOW_CONFIDENCE_THRESHOLD}): {baixa_confianca*100:.1f}%")
+    logger.info(f"  Média: {metricas['confianca_media']:.3f}")
+    logger.info(
+        f"  Alta confiança (>={settings.CONFIDENCE_THRESHOLD}): "
+        f"{metricas['alta_confianca'] * 100:.1f}%"
+    )
+    logger.info(
+        f"  Baixa confiança (<{settings.LOW_CONFIDENCE_THRESHOLD}): "
+        f"{metricas['baixa_confianca'] * 100:.1f}%"
+    )
 
     logger.info("=" * 70)
 
@@ -175,6 +267,13 @@ if __name__ == "__main__":
         help="Versão do modelo a avaliar (default: latest)"
     )
 
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=32,
+        help="Redações por lote de predição (default: 32)"
+    )
+
     args = parser.parse_args()
 
-    avaliar_modelo(args.version)
+    avaliar_modelo(args.version, batch_size=args.batch_size)
@@ -0,0 +1,145 @@
+"""
+Script para exportar o ensemble treinado para ONNX e verificar a paridade
+com o modelo PyTorch
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from loguru import logger
+
+from app.ml.ensemble import EnsembleRedacaoModel
+from app.ml.export import (
+    ParidadeOnnxError, exportar_encoder_onnx, quantizar_onnx,
+    verificar_paridade, verificar_paridade_encoder
+)
+from app.core.config import settings
+from build_dataset import Corpus
+
+
+def exportar_modelo(
+    model_version: str = "latest",
+    num_amostras: int = 32,
+    quantizar: bool = False
+) -> bool:
+    """
+    Exporta os encoders da versão para ONNX e compara as predições
+
+    Args:
+        model_version: Versão do modelo a exportar
+        num_amostras: Redações do test set usadas na verificação de paridade
+        quantizar: Se True, grava também os encoders int8 (.int8.onnx)
+
+    Returns:
+        True se a paridade foi verificada
+    """
+    logger.info("=" * 70)
+    logger.info(f"EXPORTAÇÃO ONNX - Versão: {model_version}")
+    logger.info("=" * 70)
+
+    ensemble = EnsembleRedacaoModel(
+        num_models=settings.ENSEMBLE_SIZE,
+        device="cpu",
+        backend="pytorch",
+        quantizar=False
+    )
+    if not ensemble.load_ensemble(settings.MODEL_BASE_PATH, model_version):
+        logger.error(f"Falha ao carregar modelo {model_version}")
+        return False
+
+    ensemble.export_onnx(settings.MODEL_BASE_PATH, model_version, quantizar=quantizar)
+
+    # Paridade em redações reais (comprimentos variados)
+    test = Corpus.load('test', columns=['essay'])
+    textos = [
+        ' '.join(essay) if isinstance(essay, list) else str(essay)
+        for essay in test['essay'].head(num_amostras)
+    ]
+
+    resultado = verificar_paridade(settings.MODEL_BASE_PATH, model_version, textos)
+
+    logger.info("=" * 70)
+    return resultado["ok"]
+
+
+def autoteste(quantizar: bool = True) -> bool:
+    """
+    Exporta um BERT minúsculo com pesos aleatórios e confere a paridade
+    (fp32 e, se quantizar, int8) no mesmo lote com padding dinâmico usado
+    pelo export_onnx do ensemble
+
+    Não precisa de pesos treinados nem do corpus: serve para validar a
+    exportação no CI a cada mudança em app/ml/export.py ou no opset.
+
+    Returns:
+        True se todos os grafos ficaram dentro da tolerância
+    """
+    import tempfile
+    from pathlib import Path
+
+    import torch
+    from transformers import BertConfig, BertModel
+
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=128,
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        intermediate_size=64,
+        max_position_embeddings=64
+    )
+    bert = BertModel(config, add_pooling_layer=False).eval()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        onnx_file = exportar_encoder_onnx(bert, Path(tmp) / "autoteste.onnx")
+        try:
+            verificar_paridade_encoder(bert, onnx_file)
+            if quantizar:
+                int8_file = quantizar_onnx(onnx_file, Path(tmp) / "autoteste.int8.onnx")
+                verificar_paridade_encoder(
+                    bert,
+                    int8_file,
+                    similaridade_minima=settings.ONNX_PARITY_MIN_COSINE_INT8
+                )
+        except ParidadeOnnxError as e:
+            logger.error(str(e))
+            return False
+
+    logger.info("Autoteste de exportação ONNX ok")
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exportar ensemble para ONNX")
+    parser.add_argument(
+        "--version",
+        type=str,
+        default="latest",
+        help="Versão do modelo a exportar (default: latest)"
+    )
+    parser.add_argument(
+        "--amostras",
+        type=int,
+        default=32,
+        help="Redações usadas na verificação de paridade (default: 32)"
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="Gerar também os encoders quantizados em int8"
+    )
+    parser.add_argument(
+        "--autoteste",
+        action="store_true",
+        help="Só exportar e verificar um BERT aleatório minúsculo (sem pesos treinados)"
+    )
+
+    args = parser.parse_args()
+
+    if args.autoteste:
+        sys.exit(0 if autoteste(args.int8) else 1)
+
+    sys.exit(0 if exportar_modelo(args.version, args.amostras, args.int8) else 1)
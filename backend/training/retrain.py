@@ -0,0 +1,316 @@
+"""
+Re-treino incremental do ensemble
+
+Parte dos pesos da versão em produção (warm start) e faz fine-tuning
+apenas nas amostras novas (alta confiança + feedback humano) misturadas
+a um replay buffer do Essay-BR, para não esquecer o corpus original.
+A nova versão só é promovida se melhorar no conjunto de avaliação.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import torch
+from torch.utils.data import DataLoader
+from loguru import logger
+
+from app.ml.model import ModeloTokenizer
+from app.ml.ensemble import EnsembleRedacaoModel
+from app.ml.bucketing import LengthBucketBatchSampler, PadCollator
+from app.ml.promocao import registrar_promocao
+from app.core.config import settings
+from training.train_initial import RedacaoDataset, load_essay_br_dataset, train_single_model
+from training.evaluate import avaliar_ensemble
+
+
+COLUNAS = ['essay', 'c1', 'c2', 'c3', 'c4', 'c5', 'score']
+
+# Estado do re-treino em andamento: versão candidata, amostras e
+# checkpoints de cada membro (removido ao fim do re-treino)
+DIRETORIO_RETREINO = Path(settings.MODEL_BASE_PATH) / ".retreino"
+
+
+def retreino_pendente() -> Optional[Dict[str, Any]]:
+    """
+    Re-treino interrompido (limite de tempo da task, reinício do worker)
+
+    Returns:
+        Dict com "nova_versao" e "amostras", ou None
+    """
+    estado_file = DIRETORIO_RETREINO / "estado.json"
+    if not estado_file.exists():
+        return None
+
+    with open(estado_file) as f:
+        return json.load(f)
+
+
+def _registrar_retreino(nova_versao: str, amostras: List[Dict[str, Any]]):
+    """Grava versão e amostras para que o re-treino retome com os mesmos dados"""
+    DIRETORIO_RETREINO.mkdir(parents=True, exist_ok=True)
+
+    temporario = DIRETORIO_RETREINO / "estado.json.tmp"
+    with open(temporario, "w") as f:
+        json.dump({"nova_versao": nova_versao, "amostras": amostras}, f)
+    os.replace(temporario, DIRETORIO_RETREINO / "estado.json")
+
+
+def montar_dataframe(amostras: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Converte as amostras de _preparar_dataset_retreino para o formato do
+    Essay-BR (essay, c1-c5, score), descartando notas incompletas
+
+    Returns:
+        DataFrame com as colunas do corpus e "fonte"
+    """
+    df = pd.DataFrame(amostras).rename(columns={'texto': 'essay', 'score_total': 'score'})
+    if df.empty:
+        return pd.DataFrame(columns=COLUNAS + ['fonte'])
+
+    df = df.dropna(subset=COLUNAS)
+    return df[COLUNAS + ['fonte']].reset_index(drop=True)
+
+
+def separar_avaliacao(
+    novas: pd.DataFrame,
+    fracao: float = settings.RETRAIN_HOLDOUT_FRACTION,
+    seed: int = 42
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Separa parte do feedback humano (notas reais) para avaliação
+
+    Redações de alta confiança têm rótulos do próprio modelo e ficam
+    sempre no treino.
+
+    Returns:
+        (treino, avaliacao)
+    """
+    feedback = novas[novas['fonte'] == 'feedback_humano']
+    avaliacao = feedback.sample(frac=fracao, random_state=seed)
+    treino = novas.drop(avaliacao.index)
+    return treino.reset_index(drop=True), avaliacao.reset_index(drop=True)
+
+
+def criar_loader(
+    df: pd.DataFrame,
+    tokenizer: ModeloTokenizer,
+    shuffle: bool,
+    nome: str,
+    seed: int = 42
+) -> DataLoader:
+    """DataLoader com lotes por comprimento e padding dinâmico"""
+    dataset = RedacaoDataset(df, tokenizer)
+    return DataLoader(
+        dataset,
+        batch_sampler=LengthBucketBatchSampler(
+            dataset.comprimentos,
+            batch_size=settings.BATCH_SIZE,
+            shuffle=shuffle,
+            seed=seed
+        ),
+        collate_fn=PadCollator(tokenizer.tokenizer.pad_token_id, nome=nome),
+        num_workers=0
+    )
+
+
+def melhorou(metricas_nova: Dict[str, Any], metricas_base: Dict[str, Any]) -> bool:
+    """A nova versão precisa reduzir o RMSE sem piorar o QWK do score total"""
+    return (
+        metricas_nova['rmse'] < metricas_base['rmse']
+        and metricas_nova['qwk'] >= metricas_base['qwk']
+    )
+
+
+def _copiar_membros_nao_treinados(
+    ensemble: EnsembleRedacaoModel,
+    origem: Path,
+    destino: Path
+):
+    """
+    Copia da versão base os arquivos de membros que este re-treino não
+    carregou (ex: model_1.pt e model_2.pt em mc_dropout, que só usa o
+    model_0), para que trocar ENSEMBLE_MODE depois continue funcionando
+
+    Arquivos derivados dos membros re-treinados (.onnx, .int8.onnx) não
+    são copiados: seriam dos pesos antigos.
+    """
+    if not origem.is_dir():
+        return
+
+    treinados = {arquivo.stem for arquivo in ensemble._arquivos_membros(destino)}
+
+    for arquivo in origem.iterdir():
+        if not arquivo.is_file() or arquivo.name.split(".")[0] in treinados:
+            continue
+        if not (destino / arquivo.name).exists():
+            shutil.copy2(arquivo, destino / arquivo.name)
+            logger.info(f"Mantido da versão base: {arquivo.name}")
+
+
+def promover_versao(
+    ensemble: EnsembleRedacaoModel,
+    nova_versao: str,
+    destino: str = "latest",
+    versao_base: str = "latest"
+):
+    """
+    Salva a nova versão e a copia para `destino` (substituição atômica do
+    diretório, para o predictor nunca ler uma versão parcial)
+
+    Depois da troca, registra a promoção: os processos em execução
+    recarregam o predictor (ver app.ml.promocao).
+    """
+    ensemble.save_ensemble(settings.MODEL_BASE_PATH, nova_versao)
+
+    # Backend onnx serve os grafos exportados: exportá-los junto com os pesos
+    if settings.INFERENCE_BACKEND == "onnx":
+        ensemble.export_onnx(
+            settings.MODEL_BASE_PATH,
+            nova_versao,
+            quantizar=settings.INFERENCE_QUANTIZE_INT8
+        )
+
+    base = Path(settings.MODEL_BASE_PATH)
+    _copiar_membros_nao_treinados(ensemble, base / versao_base, base / nova_versao)
+
+    temporario = base / f".{destino}.tmp"
+    antigo = base / f".{destino}.old"
+
+    shutil.rmtree(temporario, ignore_errors=True)
+    shutil.rmtree(antigo, ignore_errors=True)
+    shutil.copytree(base / nova_versao, temporario)
+
+    if (base / destino).exists():
+        os.rename(base / destino, antigo)
+    os.rename(temporario, base / destino)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+    registrar_promocao(nova_versao, destino)
+
+    logger.info(f"Versão {nova_versao} promovida para {destino}")
+
+
+def retreinar_incremental(
+    amostras: List[Dict[str, Any]],
+    nova_versao: str,
+    versao_base: str = "latest",
+    num_epochs: int = settings.RETRAIN_EPOCHS,
+    learning_rate: float = settings.RETRAIN_LEARNING_RATE,
+    replay_ratio: float = settings.RETRAIN_REPLAY_RATIO
+) -> Dict[str, Any]:
+    """
+    Fine-tuning do ensemble em produção com as amostras novas
+
+    Cada membro grava checkpoints retomáveis em DIRETORIO_RETREINO; se a
+    execução for interrompida, retreino_pendente() devolve a versão e as
+    amostras para continuar de onde parou.
+
+    Args:
+        amostras: Saída de _preparar_dataset_retreino
+        nova_versao: Nome da versão candidata
+        versao_base: Versão de onde partem os pesos (warm start)
+        num_epochs: Épocas de fine-tuning
+        learning_rate: Taxa de aprendizado (menor que a do treino inicial)
+        replay_ratio: Redações do Essay-BR por amostra nova no treino
+
+    Returns:
+        Dict com status ("promovido" | "rejeitado" | "skipped"), métricas
+        da versão base e da candidata
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    # Warm start: pesos da versão em produção
+    ensemble = EnsembleRedacaoModel(
+        num_models=settings.ENSEMBLE_SIZE,
+        device=device,
+        backend="pytorch",
+        quantizar=False
+    )
+    if not ensemble.load_ensemble(settings.MODEL_BASE_PATH, versao_base):
+        logger.warning(f"Versão base {versao_base} não encontrada - execute o treino inicial")
+        return {"status": "skipped", "reason": "versao_base_nao_encontrada"}
+
+    pendente = retreino_pendente()
+    if pendente is None or pendente["nova_versao"] != nova_versao:
+        shutil.rmtree(DIRETORIO_RETREINO, ignore_errors=True)
+        _registrar_retreino(nova_versao, amostras)
+
+    # Dados: amostras novas + replay buffer do Essay-BR
+    train_df, val_df, test_df = load_essay_br_dataset()
+
+    novas = montar_dataframe(amostras)
+    novas_treino, novas_avaliacao = separar_avaliacao(novas)
+
+    num_replay = min(len(train_df), int(len(novas_treino) * replay_ratio))
+    replay = train_df.sample(n=num_replay, random_state=42)
+
+    treino = pd.concat([novas_treino[COLUNAS], replay[COLUNAS]], ignore_index=True)
+    avaliacao = pd.concat([test_df[COLUNAS], novas_avaliacao[COLUNAS]], ignore_index=True)
+
+    logger.info(
+        f"Fine-tuning: {len(novas_treino)} amostras novas + {num_replay} de replay | "
+        f"Avaliação: {len(test_df)} Essay-BR + {len(novas_avaliacao)} feedback humano"
+    )
+
+    # Métricas da versão em produção no mesmo conjunto de avaliação
+    logger.info("Avaliando versão base...")
+    metricas_base = avaliar_ensemble(ensemble, avaliacao)
+
+    tokenizer = ensemble.tokenizer
+    val_loader = criar_loader(val_df, tokenizer, shuffle=False, nome="validação")
+
+    for model_id, model in enumerate(ensemble.models):
+        # Ordem dos lotes diferente por membro mantém a diversidade do ensemble
+        train_loader = criar_loader(
+            treino, tokenizer, shuffle=True, nome="re-treino", seed=42 + model_id
+        )
+        train_single_model(
+            model_id,
+            train_loader,
+            val_loader,
+            device,
+            num_epochs=num_epochs,
+            model=model,
+            learning_rate=learning_rate,
+            checkpoint_dir=DIRETORIO_RETREINO / "checkpoints"
+        )
+        model.eval()
+
+    logger.info("Avaliando versão candidata...")
+    metricas_nova = avaliar_ensemble(ensemble, avaliacao)
+
+    resultado = {
+        "nova_versao": nova_versao,
+        "versao_base": versao_base,
+        "amostras_novas": len(novas_treino),
+        "amostras_replay": num_replay,
+        "amostras_avaliacao": len(avaliacao),
+        "metricas_base": metricas_base,
+        "metricas_nova": metricas_nova
+    }
+
+    # Candidata avaliada: o re-treino não precisa mais ser retomado
+    shutil.rmtree(DIRETORIO_RETREINO, ignore_errors=True)
+
+    if not melhorou(metricas_nova, metricas_base):
+        logger.warning(
+            f"Versão {nova_versao} não melhorou "
+            f"(RMSE {metricas_base['rmse']:.2f} -> {metricas_nova['rmse']:.2f}, "
+            f"QWK {metricas_base['qwk']:.3f} -> {metricas_nova['qwk']:.3f}) - descartada"
+        )
+        return {"status": "rejeitado", **resultado}
+
+    logger.info(
+        f"✓ Versão {nova_versao} melhorou "
+        f"(RMSE {metricas_base['rmse']:.2f} -> {metricas_nova['rmse']:.2f}, "
+        f"QWK {metricas_base['qwk']:.3f} -> {metricas_nova['qwk']:.3f})"
+    )
+    promover_versao(ensemble, nova_versao, versao_base=versao_base)
+
+    return {"status": "promovido", **resultado}
@@ -0,0 +1,193 @@
+"""
+Cache pré-tokenizado do corpus Essay-BR em arquivos memory-mapped
+
+Cada split é tokenizado uma única vez (por tokenizer e MAX_LENGTH) e
+gravado ao lado de extended-corpus/splits:
+
+    splits/cache/<tokenizer>_<max_length>/
+        <split>.ids.bin       input_ids concatenados (int32)
+        <split>.offsets.npy   início de cada redação em ids.bin [N + 1]
+        <split>.alvos.npy     c1-c5 e score [N, 6] (float32)
+        <split>.meta.json     origem do cache (gravado por último)
+
+A attention_mask não é armazenada: sem padding, ela é 1 em todas as
+posições da redação, e PadCollator a reconstrói ao montar o lote.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from loguru import logger
+
+from app.ml.model import ModeloTokenizer
+from app.core.config import settings
+
+
+DIRETORIO_SPLITS = Path(__file__).resolve().parents[2] / 'extended-corpus' / 'splits'
+
+SPLITS = ('train', 'dev', 'test')
+
+COLUNAS_ALVO = ['c1', 'c2', 'c3', 'c4', 'c5', 'score']
+
+
+def diretorio_cache(
+    model_name: str = settings.MODEL_NAME,
+    max_length: int = settings.MAX_LENGTH
+) -> Path:
+    """Diretório do cache para o par tokenizer / MAX_LENGTH"""
+    return DIRETORIO_SPLITS / 'cache' / f"{model_name.replace('/', '__')}_{max_length}"
+
+
+def _origem(split: str) -> Dict[str, int]:
+    """Tamanho e mtime do CSV de origem (invalidação do cache)"""
+    info = (DIRETORIO_SPLITS / f'{split}.csv').stat()
+    return {"tamanho": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def cache_valido(split: str, diretorio: Path) -> bool:
+    """True se o cache do split existe e foi gerado a partir do CSV atual"""
+    meta_file = diretorio / f'{split}.meta.json'
+    if not meta_file.exists():
+        return False
+
+    with open(meta_file) as f:
+        meta = json.load(f)
+
+    return meta.get("origem") == _origem(split)
+
+
+def construir_cache(
+    split: str,
+    tokenizer: ModeloTokenizer,
+    diretorio: Path,
+    tamanho_bloco: int = 1000
+) -> Path:
+    """
+    Tokeniza um split e grava os arquivos memory-mapped
+
+    Returns:
+        Diretório do cache
+    """
+    # build_dataset.py fica na raiz do repositório
+    sys.path.insert(0, str(DIRETORIO_SPLITS.parents[1]))
+    from build_dataset import Corpus
+    from training.train_initial import RedacaoDataset
+
+    logger.info(f"Construindo cache tokenizado: {split} -> {diretorio}")
+    diretorio.mkdir(parents=True, exist_ok=True)
+
+    df = Corpus.load(split, columns=['essay'] + COLUNAS_ALVO).reset_index(drop=True)
+    textos = [RedacaoDataset._extrair_texto(row) for _, row in df.iterrows()]
+
+    offsets = np.zeros(len(textos) + 1, dtype=np.int64)
+
+    with open(diretorio / f'{split}.ids.bin', 'wb') as f:
+        for inicio in range(0, len(textos), tamanho_bloco):
+            for i, ids in enumerate(tokenizer.tokenizar(textos[inicio:inicio + tamanho_bloco])):
+                np.asarray(ids, dtype=np.int32).tofile(f)
+                offsets[inicio + i + 1] = offsets[inicio + i] + len(ids)
+
+    alvos = df[COLUNAS_ALVO].to_numpy(dtype=np.float32)
+
+    np.save(diretorio / f'{split}.offsets.npy', offsets)
+    np.save(diretorio / f'{split}.alvos.npy', alvos)
+
+    # meta.json por último: só marca o cache como válido se tudo foi gravado
+    with open(diretorio / f'{split}.meta.json', 'w') as f:
+        json.dump({
+            "model_name": tokenizer.tokenizer.name_or_path,
+            "max_length": tokenizer.max_length,
+            "num_redacoes": len(textos),
+            "num_tokens": int(offsets[-1]),
+            "origem": _origem(split)
+        }, f)
+
+    logger.info(f"Cache {split}: {len(textos)} redações, {offsets[-1]} tokens")
+    return diretorio
+
+
+class TokenizedDataset(Dataset):
+    """
+    Dataset lido do cache pré-tokenizado, no mesmo formato de RedacaoDataset
+
+    Os memmaps são abertos sob demanda em cada processo, então o dataset
+    pode ser enviado a workers do DataLoader (num_workers > 0) sem copiar
+    o corpus: todos compartilham as páginas do arquivo via page cache.
+    """
+
+    def __init__(self, split: str, diretorio: Path):
+        self.split = split
+        self.diretorio = Path(diretorio)
+
+        # Offsets e alvos são pequenos: carregados inteiros
+        self.offsets = np.load(self.diretorio / f'{split}.offsets.npy')
+        self.alvos = np.load(self.diretorio / f'{split}.alvos.npy')
+        self._ids: Optional[np.memmap] = None
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        estado['_ids'] = None
+        return estado
+
+    @property
+    def ids(self) -> np.memmap:
+        if self._ids is None:
+            self._ids = np.memmap(
+                self.diretorio / f'{self.split}.ids.bin',
+                dtype=np.int32,
+                mode='r'
+            )
+        return self._ids
+
+    @property
+    def comprimentos(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        inicio, fim = self.offsets[idx], self.offsets[idx + 1]
+        input_ids = torch.from_numpy(self.ids[inicio:fim].astype(np.int64))
+        alvos = torch.from_numpy(self.alvos[idx])
+
+        return {
+            'input_ids': input_ids,
+            'attention_mask': torch.ones_like(input_ids),
+            'competencias': alvos[:5],
+            'score_total': alvos[5:]
+        }
+
+
+def carregar_split(split: str, tokenizer: ModeloTokenizer) -> TokenizedDataset:
+    """
+    Dataset pré-tokenizado do split, construindo o cache se necessário
+
+    Args:
+        split: train, dev ou test
+        tokenizer: Tokenizer do modelo (define o diretório do cache)
+    """
+    diretorio = diretorio_cache(tokenizer.tokenizer.name_or_path, tokenizer.max_length)
+
+    if not cache_valido(split, diretorio):
+        construir_cache(split, tokenizer, diretorio)
+
+    return TokenizedDataset(split, diretorio)
+
+
+if __name__ == "__main__":
+    tokenizer = ModeloTokenizer()
+    diretorio = diretorio_cache(tokenizer.tokenizer.name_or_path, tokenizer.max_length)
+
+    for split in SPLITS:
+        if cache_valido(split, diretorio):
+            logger.info(f"Cache {split} já está atualizado")
+        else:
+            construir_cache(split, tokenizer, diretorio)
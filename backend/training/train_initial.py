@@ -9,8 +9,14 @@ import os
 # Adicionar diretório raiz ao path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import random
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
 import torch
 import torch.nn as nn
+import torch.multiprocessing as mp
 from torch.utils.data import Dataset, DataLoader
 import pandas as pd
 import numpy as np
@@ -20,32 +26,51 @@ from scipy.stats import pearsonr
 from loguru import logger
 from datetime import datetime
 
-from app.ml.model import RedacaoModel, ModeloTokenizer
+from app.ml.model import RedacaoModel, MultiHeadRedacaoModel, ModeloTokenizer
 from app.ml.ensemble import EnsembleRedacaoModel
+from app.ml.bucketing import LengthBucketBatchSampler, PadCollator
 from app.core.config import settings
+from training.tokenized_cache import DIRETORIO_SPLITS, carregar_split
 
 
 class RedacaoDataset(Dataset):
-    """Dataset para redações do ENEM"""
+    """
+    Dataset para redações do ENEM
+
+    Os itens não têm padding; use PadCollator (padding dinâmico) e
+    LengthBucketBatchSampler (lotes de comprimento parecido) no DataLoader.
+    """
 
     def __init__(self, dataframe, tokenizer):
         self.data = dataframe.reset_index(drop=True)
         self.tokenizer = tokenizer
+        self._comprimentos = None
 
     def __len__(self):
         return len(self.data)
 
+    @staticmethod
+    def _extrair_texto(row) -> str:
+        # O formato do essay-br é uma lista de strings
+        if isinstance(row['essay'], list):
+            return ' '.join(row['essay'])
+        return str(row['essay'])
+
+    @property
+    def comprimentos(self):
+        """Número de tokens (truncado em MAX_LENGTH) de cada redação"""
+        if self._comprimentos is None:
+            textos = [self._extrair_texto(row) for _, row in self.data.iterrows()]
+            self._comprimentos = [len(ids) for ids in self.tokenizer.tokenizar(textos)]
+        return self._comprimentos
+
     def __getitem__(self, idx):
         row = self.data.iloc[idx]
 
         # Extrair texto da redação
-        # O formato do essay-br é uma lista de strings
-        if isinstance(row['essay'], list):
-            texto = ' '.join(row['essay'])
-        else:
-            texto = str(row['essay'])
+        texto = self._extrair_texto(row)
 
-        # Tokenizar
+        # Tokenizar (sem padding)
         encoding = self.tokenizer.encode(texto)
 
         # Competências (c1-c5) e score total
@@ -67,6 +92,19 @@ class RedacaoDataset(Dataset):
         }
 
 
+def criar_splits_se_necessario():
+    """Cria os splits do Essay-BR (build_dataset.py) se ainda não existirem"""
+    # Importar classe Corpus do build_dataset.py
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+    from build_dataset import Corpus
+
+    if not DIRETORIO_SPLITS.exists():
+        logger.info("Splits não encontrados. Criando splits...")
+        corpus = Corpus()
+        corpus.build_corpus('extended_essay-br.csv')
+
+
 def load_essay_br_dataset():
     """
     Carrega dataset Essay-BR
@@ -76,20 +114,13 @@ def load_essay_br_dataset():
     """
     logger.info("Carregando dataset Essay-BR...")
 
-    # Importar classe Corpus do build_dataset.py
-    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+    criar_splits_se_necessario()
 
     from build_dataset import Corpus
 
-    # Verificar se os splits já existem
-    splits_dir = '../extended-corpus/splits'
-    if not os.path.exists(splits_dir):
-        logger.info("Splits não encontrados. Criando splits...")
-        corpus = Corpus()
-        corpus.build_corpus('extended_essay-br.csv')
-
-    # Carregar splits
-    train, val, test = Corpus().read_splits()
+    # Carregar splits (Parquet quando disponível, apenas as colunas usadas)
+    colunas = ['essay', 'c1', 'c2', 'c3', 'c4', 'c5', 'score']
+    train, val, test = (Corpus.load(split, columns=colunas) for split in ('train', 'dev', 'test'))
 
     logger.info(f"Dataset carregado:")
     logger.info(f"  Train: {len(train)} amostras")
@@ -99,22 +130,93 @@ def load_essay_br_dataset():
     return train, val, test
 
 
+def calcular_loss(
+    criterion: nn.Module,
+    comp_pred: torch.Tensor,
+    score_pred: torch.Tensor,
+    comp_target: torch.Tensor,
+    score_target: torch.Tensor
+) -> torch.Tensor:
+    """
+    Loss combinado (priorizar score total)
+
+    Aceita predições [batch, ...] ou [num_cabecas, batch, ...] do
+    MultiHeadRedacaoModel; no segundo caso cada cabeça é treinada
+    contra o mesmo alvo.
+    """
+    if comp_pred.dim() == 3:
+        comp_target = comp_target.unsqueeze(0).expand_as(comp_pred)
+        score_target = score_target.unsqueeze(0).expand_as(score_pred)
+
+    loss_comp = criterion(comp_pred, comp_target)
+    loss_score = criterion(score_pred, score_target)
+
+    return 0.3 * loss_comp.mean() + 0.7 * loss_score
+
+
+def _estado_rng() -> Dict[str, Any]:
+    """Estados dos geradores aleatórios (torch, cuda, numpy, random)"""
+    return {
+        "torch": torch.get_rng_state(),
+        "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+        "numpy": np.random.get_state(),
+        "python": random.getstate()
+    }
+
+
+def _restaurar_rng(estado: Dict[str, Any]):
+    torch.set_rng_state(estado["torch"])
+    if estado["cuda"] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(estado["cuda"])
+    np.random.set_state(estado["numpy"])
+    random.setstate(estado["python"])
+
+
+def salvar_checkpoint(dados: Dict[str, Any], caminho: Path):
+    """
+    Grava o checkpoint em um arquivo temporário e o renomeia, para que um
+    processo interrompido no meio da escrita não deixe um arquivo corrompido
+    """
+    temporario = caminho.with_suffix(".tmp")
+    torch.save(dados, temporario)
+    os.replace(temporario, caminho)
+
+
 def train_single_model(
     model_id: int,
     train_loader: DataLoader,
     val_loader: DataLoader,
     device: str,
-    num_epochs: int = settings.NUM_EPOCHS
+    num_epochs: int = settings.NUM_EPOCHS,
+    model: nn.Module = None,
+    learning_rate: float = settings.LEARNING_RATE,
+    checkpoint_dir: Optional[Path] = None,
+    grad_accum_steps: int = settings.TRAIN_GRAD_ACCUM_STEPS,
+    usar_bf16: bool = settings.TRAIN_BF16,
+    checkpoint_steps: int = settings.TRAIN_CHECKPOINT_STEPS
 ):
     """
     Treina um único modelo
 
+    Com checkpoint_dir, o estado completo (pesos, otimizador, scheduler,
+    época, lote e geradores aleatórios) é salvo a cada checkpoint_steps
+    passos do otimizador e ao fim de cada época; uma nova chamada com o
+    mesmo diretório retoma o treino de onde parou.
+
     Args:
         model_id: ID do modelo no ensemble
         train_loader: DataLoader de treino
         val_loader: DataLoader de validação
         device: cpu ou cuda
         num_epochs: Número de épocas
+        model: Modelo a treinar (default: novo RedacaoModel); pesos já
+            treinados fazem fine-tuning (warm start)
+        learning_rate: Taxa de aprendizado do AdamW
+        checkpoint_dir: Diretório dos checkpoints retomáveis (None = sem checkpoint)
+        grad_accum_steps: Lotes acumulados por passo do otimizador
+            (batch efetivo = BATCH_SIZE x grad_accum_steps)
+        usar_bf16: Autocast bf16 no encoder; as cabeças e o loss ficam em fp32
+        checkpoint_steps: Passos do otimizador entre checkpoints (0 = só ao fim da época)
 
     Returns:
         Modelo treinado
@@ -124,12 +226,12 @@ def train_single_model(
     logger.info(f"=" * 60)
 
     # Criar modelo
-    model = RedacaoModel().to(device)
+    model = (model if model is not None else RedacaoModel()).to(device)
 
     # Otimizador
     optimizer = torch.optim.AdamW(
         model.parameters(),
-        lr=settings.LEARNING_RATE,
+        lr=learning_rate,
         weight_decay=0.01
     )
 
@@ -145,45 +247,111 @@ def train_single_model(
         verbose=True
     )
 
+    grad_accum_steps = max(1, grad_accum_steps)
+    tipo_device = torch.device(device).type
+    num_lotes = len(train_loader)
+
     best_val_loss = float('inf')
     best_model_state = None
 
+    epoca_inicial = 0
+    lote_inicial = 0
+    train_loss = 0.0
+
+    checkpoint_file = melhor_file = None
+    if checkpoint_dir is not None:
+        checkpoint_dir = Path(checkpoint_dir)
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        checkpoint_file = checkpoint_dir / f"checkpoint_{model_id}.pt"
+        melhor_file = checkpoint_dir / f"melhor_{model_id}.pt"
+
+    # Retomar treino interrompido
+    if checkpoint_file is not None and checkpoint_file.exists():
+        checkpoint = torch.load(checkpoint_file, map_location="cpu")
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        scheduler.load_state_dict(checkpoint["scheduler"])
+        _restaurar_rng(checkpoint["rng"])
+
+        epoca_inicial = checkpoint["epoca"]
+        lote_inicial = checkpoint["lote"]
+        train_loss = checkpoint["train_loss"]
+        best_val_loss = checkpoint["best_val_loss"]
+
+        logger.info(
+            f"Retomando modelo {model_id} do checkpoint - "
+            f"época {epoca_inicial + 1}, lote {lote_inicial}/{num_lotes}"
+        )
+
+    def salvar_estado(epoca: int, lote: int, loss_acumulado: float):
+        salvar_checkpoint({
+            "model": model.state_dict(),
+            "optimizer": optimizer.state_dict(),
+            "scheduler": scheduler.state_dict(),
+            "epoca": epoca,
+            "lote": lote,
+            "train_loss": loss_acumulado,
+            "best_val_loss": best_val_loss,
+            "rng": _estado_rng()
+        }, checkpoint_file)
+
     # Treino
-    for epoch in range(num_epochs):
+    for epoch in range(epoca_inicial, num_epochs):
         logger.info(f"\nÉpoca {epoch+1}/{num_epochs}")
 
+        # Ordem dos lotes determinística por época: a retomada no meio da
+        # época pula exatamente os lotes já treinados
+        if hasattr(train_loader.batch_sampler, 'set_epoch'):
+            train_loader.batch_sampler.set_epoch(epoch)
+
         # Fase de treino
         model.train()
-        train_loss = 0.0
+        passos = 0
+        optimizer.zero_grad()
 
         pbar = tqdm(train_loader, desc="Treino")
-        for batch in pbar:
+        for lote_idx, batch in enumerate(pbar):
+            if lote_idx < lote_inicial:
+                continue
+
             input_ids = batch['input_ids'].to(device)
             attention_mask = batch['attention_mask'].to(device)
             comp_target = batch['competencias'].to(device)
             score_target = batch['score_total'].to(device)
 
-            optimizer.zero_grad()
-
-            # Forward
-            comp_pred, score_pred = model(input_ids, attention_mask)
-
-            # Loss
-            loss_comp = criterion(comp_pred, comp_target)
-            loss_score = criterion(score_pred, score_target)
+            # Forward: encoder em bf16, cabeças e loss em fp32 (as notas
+            # vão até 1000 e perderiam resolução em bf16)
+            with torch.autocast(device_type=tipo_device, dtype=torch.bfloat16, enabled=usar_bf16):
+                pooled_output = model.codificar(input_ids, attention_mask)
+            comp_pred, score_pred = model.prever(pooled_output.float())
 
             # Loss combinado (priorizar score total)
-            loss = 0.3 * loss_comp.mean() + 0.7 * loss_score
+            loss = calcular_loss(criterion, comp_pred, score_pred, comp_target, score_target)
 
-            # Backward
-            loss.backward()
-            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
-            optimizer.step()
+            # Backward: o último grupo da época pode ter menos lotes
+            inicio_grupo = lote_idx - lote_idx % grad_accum_steps
+            tamanho_grupo = min(grad_accum_steps, num_lotes - inicio_grupo)
+            (loss / tamanho_grupo).backward()
 
             train_loss += loss.item()
             pbar.set_postfix({'loss': loss.item()})
 
-        train_loss /= len(train_loader)
+            if lote_idx + 1 == inicio_grupo + tamanho_grupo:
+                torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+                optimizer.step()
+                optimizer.zero_grad()
+                passos += 1
+
+                if (
+                    checkpoint_file is not None
+                    and checkpoint_steps > 0
+                    and passos % checkpoint_steps == 0
+                    and lote_idx + 1 < num_lotes
+                ):
+                    salvar_estado(epoch, lote_idx + 1, train_loss)
+
+        train_loss /= num_lotes
+        lote_inicial = 0
 
         # Fase de validação
         model.eval()
@@ -196,11 +364,11 @@ def train_single_model(
                 comp_target = batch['competencias'].to(device)
                 score_target = batch['score_total'].to(device)
 
-                comp_pred, score_pred = model(input_ids, attention_mask)
+                with torch.autocast(device_type=tipo_device, dtype=torch.bfloat16, enabled=usar_bf16):
+                    pooled_output = model.codificar(input_ids, attention_mask)
+                comp_pred, score_pred = model.prever(pooled_output.float())
 
-                loss_comp = criterion(comp_pred, comp_target)
-                loss_score = criterion(score_pred, score_target)
-                loss = 0.3 * loss_comp.mean() + 0.7 * loss_score
+                loss = calcular_loss(criterion, comp_pred, score_pred, comp_target, score_target)
 
                 val_loss += loss.item()
 
@@ -208,17 +376,35 @@ def train_single_model(
 
         logger.info(f"Train Loss: {train_loss:.4f} | Val Loss: {val_loss:.4f}")
 
+        # Fração de padding economizada pelo padding dinâmico
+        if isinstance(train_loader.collate_fn, PadCollator):
+            train_loader.collate_fn.estatisticas.logar()
+
         # Scheduler step
         scheduler.step(val_loss)
 
-        # Salvar melhor modelo
+        # Salvar melhor modelo (cópia dos tensores: state_dict() apenas
+        # referencia os pesos, que continuariam sendo atualizados)
         if val_loss < best_val_loss:
             best_val_loss = val_loss
-            best_model_state = model.state_dict().copy()
+            if melhor_file is not None:
+                salvar_checkpoint(model.state_dict(), melhor_file)
+            else:
+                best_model_state = {
+                    nome: tensor.detach().cpu().clone()
+                    for nome, tensor in model.state_dict().items()
+                }
             logger.info(f"✓ Novo melhor modelo! Val Loss: {val_loss:.4f}")
 
+        train_loss = 0.0
+        if checkpoint_file is not None:
+            salvar_estado(epoch + 1, 0, train_loss)
+
     # Carregar melhor modelo
-    model.load_state_dict(best_model_state)
+    if melhor_file is not None and melhor_file.exists():
+        best_model_state = torch.load(melhor_file, map_location="cpu")
+    if best_model_state is not None:
+        model.load_state_dict(best_model_state)
 
     logger.info(f"Modelo {model_id} treinado! Melhor Val Loss: {best_val_loss:.4f}")
 
@@ -301,8 +487,143 @@ def calcular_metricas(predictions, targets):
     }
 
 
-def main():
-    """Função principal de treino"""
+def criar_loaders(tokenizer: ModeloTokenizer, seed: int = 42):
+    """
+    DataLoaders de treino e validação lidos do cache pré-tokenizado
+
+    Args:
+        tokenizer: Tokenizer do modelo
+        seed: Semente da ordem dos lotes de treino
+
+    Returns:
+        train_loader, val_loader
+    """
+    train_dataset = carregar_split('train', tokenizer)
+    val_dataset = carregar_split('dev', tokenizer)
+
+    # Lotes por comprimento + padding dinâmico
+    pad_token_id = tokenizer.tokenizer.pad_token_id
+
+    train_loader = DataLoader(
+        train_dataset,
+        batch_sampler=LengthBucketBatchSampler(
+            train_dataset.comprimentos,
+            batch_size=settings.BATCH_SIZE,
+            shuffle=True,
+            seed=seed
+        ),
+        collate_fn=PadCollator(pad_token_id, nome="treino"),
+        num_workers=settings.TRAIN_NUM_WORKERS
+    )
+
+    val_loader = DataLoader(
+        val_dataset,
+        batch_sampler=LengthBucketBatchSampler(
+            val_dataset.comprimentos,
+            batch_size=settings.BATCH_SIZE,
+            shuffle=False
+        ),
+        collate_fn=PadCollator(pad_token_id, nome="validação"),
+        num_workers=settings.TRAIN_NUM_WORKERS
+    )
+
+    return train_loader, val_loader
+
+
+def _treinar_membro_processo(
+    model_id: int,
+    model_file: str,
+    device: str,
+    num_threads: int,
+    checkpoint_dir: Optional[str] = None
+):
+    """
+    Treina um membro do ensemble em um processo separado e salva o state_dict
+
+    Cada processo abre o mesmo cache memmap (sem copiar o corpus) e usa
+    uma fatia dos núcleos da máquina.
+    """
+    torch.set_num_threads(num_threads)
+    torch.manual_seed(42 + model_id)
+
+    tokenizer = ModeloTokenizer()
+    train_loader, val_loader = criar_loaders(tokenizer, seed=42 + model_id)
+
+    model = train_single_model(
+        model_id, train_loader, val_loader, device,
+        checkpoint_dir=Path(checkpoint_dir) if checkpoint_dir else None
+    )
+    torch.save(model.state_dict(), model_file)
+
+
+def treinar_membros_em_paralelo(
+    num_membros: int,
+    model_path: Path,
+    device: str,
+    num_processos: int = settings.TRAIN_PARALLEL_PROCESSES,
+    checkpoint_dir: Optional[Path] = None
+):
+    """
+    Treina os membros do ensemble independente em processos paralelos
+
+    Até num_processos membros treinam ao mesmo tempo, cada um com
+    cpu_count // num_processos threads; com várias GPUs, os membros são
+    distribuídos entre elas.
+
+    Args:
+        num_membros: Número de modelos do ensemble
+        model_path: Diretório da versão (recebe model_{i}.pt)
+        device: cpu ou cuda
+        num_processos: Processos simultâneos
+        checkpoint_dir: Diretório dos checkpoints retomáveis de cada membro
+    """
+    model_path.mkdir(parents=True, exist_ok=True)
+    num_processos = max(1, min(num_processos, num_membros))
+    num_threads = max(1, (os.cpu_count() or 1) // num_processos)
+    num_gpus = torch.cuda.device_count() if device == "cuda" else 0
+
+    logger.info(
+        f"Treinando {num_membros} membros em paralelo - "
+        f"{num_processos} processos, {num_threads} threads cada"
+    )
+
+    # spawn: CUDA e os tokenizers rápidos não suportam fork com segurança
+    contexto = mp.get_context("spawn")
+
+    for inicio in range(0, num_membros, num_processos):
+        processos = []
+        for model_id in range(inicio, min(inicio + num_processos, num_membros)):
+            device_membro = f"cuda:{model_id % num_gpus}" if num_gpus else device
+            processo = contexto.Process(
+                target=_treinar_membro_processo,
+                args=(
+                    model_id,
+                    str(model_path / f"model_{model_id}.pt"),
+                    device_membro,
+                    num_threads,
+                    str(checkpoint_dir) if checkpoint_dir else None
+                ),
+                name=f"treino-membro-{model_id}"
+            )
+            processo.start()
+            processos.append(processo)
+
+        for processo in processos:
+            processo.join()
+            if processo.exitcode != 0:
+                raise RuntimeError(
+                    f"Processo {processo.name} falhou (exit code {processo.exitcode})"
+                )
+
+
+def main(version: Optional[str] = None):
+    """
+    Função principal de treino
+
+    Args:
+        version: Versão a gerar; se já existirem checkpoints dessa versão
+            (treino interrompido), o treino é retomado deles
+    """
     logger.info("=" * 70)
     logger.info("TREINO INICIAL DO ENSEMBLE - Redator ENEM")
     logger.info("=" * 70)
@@ -311,42 +632,77 @@ def main():
     device = "cuda" if torch.cuda.is_available() else "cpu"
     logger.info(f"Device: {device}")
 
-    # Carregar dataset
-    train_df, val_df, test_df = load_essay_br_dataset()
+    version = version or f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    checkpoint_dir = Path(settings.MODEL_BASE_PATH) / version / "checkpoints"
+    logger.info(f"Checkpoints: {checkpoint_dir}")
 
     # Criar tokenizer
     tokenizer = ModeloTokenizer()
 
-    # Criar datasets
-    train_dataset = RedacaoDataset(train_df, tokenizer)
-    val_dataset = RedacaoDataset(val_df, tokenizer)
+    # Criar datasets a partir do cache pré-tokenizado (memmap): o corpus é
+    # tokenizado uma vez e reaproveitado por todas as épocas e modelos
+    criar_splits_se_necessario()
+    train_loader, val_loader = criar_loaders(tokenizer)
 
-    # Criar dataloaders
-    train_loader = DataLoader(
-        train_dataset,
-        batch_size=settings.BATCH_SIZE,
-        shuffle=True,
-        num_workers=0  # Windows compatível
-    )
-
-    val_loader = DataLoader(
-        val_dataset,
-        batch_size=settings.BATCH_SIZE,
-        shuffle=False,
-        num_workers=0
+    logger.info(f"Dataset carregado:")
+    logger.info(f"  Train: {len(train_loader.dataset)} amostras")
+    logger.info(f"  Val: {len(val_loader.dataset)} amostras")
+    logger.info(
+        f"  Batch efetivo: {settings.BATCH_SIZE} x {settings.TRAIN_GRAD_ACCUM_STEPS} | "
+        f"bf16: {settings.TRAIN_BF16}"
     )
 
     # Criar ensemble
-    ensemble = EnsembleRedacaoModel(num_models=settings.ENSEMBLE_SIZE, device=device)
+    ensemble = EnsembleRedacaoModel(
+        num_models=settings.ENSEMBLE_SIZE,
+        device=device,
+        backend="pytorch",
+        quantizar=False
+    )
 
-    # Treinar cada modelo do ensemble
-    for model_id in range(settings.ENSEMBLE_SIZE):
-        model = train_single_model(model_id, train_loader, val_loader, device)
+    if ensemble.modo == "multi_cabeca":
+        # Um BERT compartilhado com ENSEMBLE_SIZE cabeças, treinado de uma vez
+        model = train_single_model(
+            0, train_loader, val_loader, device,
+            model=MultiHeadRedacaoModel(num_cabecas=settings.ENSEMBLE_SIZE),
+            checkpoint_dir=checkpoint_dir
+        )
         ensemble.add_model(model)
+    elif ensemble.modo == "mc_dropout":
+        # MC-dropout precisa de apenas um modelo
+        model = train_single_model(
+            0, train_loader, val_loader, device, checkpoint_dir=checkpoint_dir
+        )
+        ensemble.add_model(model)
+    elif settings.TRAIN_PARALLEL_PROCESSES > 1:
+        # Membros independentes treinados ao mesmo tempo; cada processo
+        # salva o seu model_{i}.pt direto no diretório da versão
+        treinar_membros_em_paralelo(
+            settings.ENSEMBLE_SIZE,
+            Path(settings.MODEL_BASE_PATH) / version,
+            device,
+            checkpoint_dir=checkpoint_dir
+        )
+    else:
+        # Treinar cada modelo do ensemble (membros já concluídos são
+        # restaurados do checkpoint sem treinar de novo). Cada membro tem a
+        # sua semente de lotes, como no treino em paralelo: set_epoch fixa a
+        # ordem por época, então um loader compartilhado repetiria a mesma
+        # ordem em todos os membros
+        for model_id in range(settings.ENSEMBLE_SIZE):
+            train_loader_membro, _ = criar_loaders(tokenizer, seed=42 + model_id)
+            model = train_single_model(
+                model_id, train_loader_membro, val_loader, device,
+                checkpoint_dir=checkpoint_dir
+            )
+            ensemble.add_model(model)
 
     # Salvar ensemble
-    version = f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    ensemble.save_ensemble(settings.MODEL_BASE_PATH, version)
+    if ensemble.models:
+        ensemble.save_ensemble(settings.MODEL_BASE_PATH, version)
+
+    # Versão completa: checkpoints não são mais necessários
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
 
     logger.info("=" * 70)
     logger.info(f"✓ TREINO CONCLUÍDO - Versão: {version}")
@@ -354,4 +710,14 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Treino inicial do ensemble")
+    parser.add_argument(
+        "--retomar",
+        metavar="VERSION",
+        help="Retoma o treino interrompido da versão informada"
+    )
+    args = parser.parse_args()
+
+    main(args.retomar)
@@ -11,7 +11,8 @@ from app.core.config import settings
 celery_app = Celery(
     "redator_worker",
     broker=settings.CELERY_BROKER_URL,
-    backend=settings.CELERY_RESULT_BACKEND
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["workers.tasks"]
 )
 
 # Configuração
@@ -24,7 +25,14 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=3600 * 4,  # 4 horas max por task
     worker_prefetch_multiplier=1,
-    worker_max_tasks_per_child=50
+    worker_max_tasks_per_child=50,
+    result_expires=settings.JOB_RESULT_EXPIRES_SECONDS,
+    # Correções e webhooks vão para a fila dos workers de inferência
+    # (celery worker -Q correcoes); re-treino e manutenção ficam na padrão
+    task_routes={
+        "workers.tasks.corrigir_redacao": {"queue": settings.CORRECTION_QUEUE},
+        "workers.tasks.enviar_webhook": {"queue": settings.CORRECTION_QUEUE}
+    }
 )
 
 # Configurar tarefas periódicas
@@ -1,97 +1,152 @@
 """
 Celery Tasks para re-treino automático e manutenção
 """
+import asyncio
+import hashlib
+import hmac
+import json
 import os
-import shutil
 from datetime import datetime
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
+
+import httpx
 from loguru import logger
 
 from workers.celery_app import celery_app
 from app.core.config import settings
 from app.db.supabase_client import supabase_client
+from app.db.buffer_correcoes import fechar_buffer_correcoes_loop
+from app.utils.webhook import validar_url_webhook
+
+
+def _executar_async(corrotina):
+    """
+    Executa uma corrotina em um event loop próprio (asyncio.run)
+
+    Antes de o loop terminar, grava as correções pendentes do write-behind
+    e fecha o cliente HTTP/2 do Supabase criado para ele: um cliente de
+    loop encerrado não pode mais ser fechado e vazaria o pool de conexões.
+    """
+    async def executar():
+        try:
+            return await corrotina
+        finally:
+            await fechar_buffer_correcoes_loop()
+            await supabase_client.fechar()
 
+    return asyncio.run(executar())
 
-@celery_app.task(name="workers.tasks.retreinar_modelo_automatico")
+
+@celery_app.task(
+    name="workers.tasks.retreinar_modelo_automatico",
+    acks_late=True,
+    reject_on_worker_lost=True
+)
 def retreinar_modelo_automatico():
     """
     Task de re-treino automático do modelo
 
     1. Busca redações com alta confiança
     2. Busca feedback humano
-    3. Treina novo modelo
-    4. Valida performance
+    3. Fine-tuning a partir do modelo atual (warm start + replay do Essay-BR)
+    4. Valida performance contra o modelo atual
     5. Substitui modelo antigo se melhorou
+
+    Um re-treino interrompido (limite de tempo, reinício do worker) é
+    retomado dos checkpoints na execução seguinte, com as mesmas amostras.
     """
     logger.info("=" * 70)
     logger.info("INICIANDO RE-TREINO AUTOMÁTICO DO MODELO")
     logger.info("=" * 70)
 
     try:
-        # 1. Buscar dados para treino
-        logger.info("Buscando redações com alta confiança...")
-        redacoes_alta_confianca = supabase_client.buscar_redacoes_alta_confianca(
-            limite=500,
-            confianca_minima=settings.CONFIDENCE_THRESHOLD
-        )
-
-        logger.info("Buscando feedback humano...")
-        feedback_humano = supabase_client.buscar_feedback_para_treino(limite=200)
-
-        total_amostras = len(redacoes_alta_confianca) + len(feedback_humano)
-        logger.info(f"Total de amostras coletadas: {total_amostras}")
-        logger.info(f"  - Alta confiança: {len(redacoes_alta_confianca)}")
-        logger.info(f"  - Feedback humano: {len(feedback_humano)}")
-
-        # Verificar se tem amostras suficientes
-        if total_amostras < settings.MIN_SAMPLES_FOR_RETRAIN:
-            logger.warning(
-                f"Amostras insuficientes para re-treino "
-                f"({total_amostras} < {settings.MIN_SAMPLES_FOR_RETRAIN}). "
-                f"Pulando re-treino."
+        # Import local: torch/transformers só são carregados no worker de re-treino
+        from training.retrain import retreinar_incremental, retreino_pendente
+
+        pendente = retreino_pendente()
+
+        if pendente is not None:
+            nova_versao = pendente["nova_versao"]
+            dataset = pendente["amostras"]
+            total_amostras = len(dataset)
+            logger.info(
+                f"Retomando re-treino interrompido da versão {nova_versao} "
+                f"({total_amostras} amostras)"
+            )
+        else:
+            # 1. Buscar dados para treino
+            logger.info("Buscando redações com alta confiança...")
+            redacoes_alta_confianca = _executar_async(
+                supabase_client.buscar_redacoes_alta_confianca(
+                    limite=500,
+                    confianca_minima=settings.CONFIDENCE_THRESHOLD
+                )
             )
-            return {
-                "status": "skipped",
-                "reason": "amostras_insuficientes",
-                "amostras": total_amostras
-            }
-
-        # 2. Preparar dataset
-        logger.info("Preparando dataset para re-treino...")
-        dataset = _preparar_dataset_retreino(redacoes_alta_confianca, feedback_humano)
-
-        # 3. Treinar novo modelo
-        logger.info("Iniciando treino do novo modelo...")
-        nova_versao = f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-        # TODO: Implementar treino real
-        # Por enquanto, simular sucesso
-        logger.warning("⚠ Treino real ainda não implementado - usando modelo mock")
 
-        # 4. Validar novo modelo
-        logger.info("Validando novo modelo...")
-        # TODO: Calcular métricas e comparar com modelo atual
+            logger.info("Buscando feedback humano...")
+            feedback_humano = _executar_async(
+                supabase_client.buscar_feedback_para_treino(limite=200)
+            )
 
-        # 5. Salvar métricas
+            total_amostras = len(redacoes_alta_confianca) + len(feedback_humano)
+            logger.info(f"Total de amostras coletadas: {total_amostras}")
+            logger.info(f"  - Alta confiança: {len(redacoes_alta_confianca)}")
+            logger.info(f"  - Feedback humano: {len(feedback_humano)}")
+
+            # Verificar se tem amostras suficientes
+            if total_amostras < settings.MIN_SAMPLES_FOR_RETRAIN:
+                logger.warning(
+                    f"Amostras insuficientes para re-treino "
+                    f"({total_amostras} < {settings.MIN_SAMPLES_FOR_RETRAIN}). "
+                    f"Pulando re-treino."
+                )
+                return {
+                    "status": "skipped",
+                    "reason": "amostras_insuficientes",
+                    "amostras": total_amostras
+                }
+
+            # 2. Preparar dataset
+            logger.info("Preparando dataset para re-treino...")
+            dataset = _preparar_dataset_retreino(redacoes_alta_confianca, feedback_humano)
+            nova_versao = f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        # 3. Fine-tuning e 4. Validação contra o modelo atual
+        logger.info("Iniciando fine-tuning do modelo atual...")
+        resultado = retreinar_incremental(dataset, nova_versao)
+
+        if resultado["status"] == "skipped":
+            return resultado
+
+        # 5. Salvar métricas (inclusive de candidatas rejeitadas)
         logger.info("Salvando métricas do novo modelo...")
+        metricas_nova = resultado["metricas_nova"]
         metricas = {
             "version": nova_versao,
+            "versao_base": resultado["versao_base"],
+            "promovido": resultado["status"] == "promovido",
             "dataset_size": total_amostras,
-            "rmse_total": 45.2,  # Mock
-            "mae_total": 35.8,
-            "qwk_total": 0.89,
-            "num_retreinos": 1,
+            "amostras_replay": resultado["amostras_replay"],
+            "rmse_total": metricas_nova["rmse"],
+            "mae_total": metricas_nova["mae"],
+            "qwk_total": metricas_nova["qwk"],
+            "competencias": metricas_nova["competencias"],
+            "rmse_base": resultado["metricas_base"]["rmse"],
+            "qwk_base": resultado["metricas_base"]["qwk"],
             "ultimo_retreino": datetime.utcnow().isoformat()
         }
 
-        supabase_client.salvar_metricas_modelo(nova_versao, metricas)
+        _executar_async(supabase_client.salvar_metricas_modelo(nova_versao, metricas))
 
         logger.info("=" * 70)
-        logger.info(f"✓ RE-TREINO CONCLUÍDO - Nova versão: {nova_versao}")
+        if resultado["status"] == "promovido":
+            logger.info(f"✓ RE-TREINO CONCLUÍDO - Nova versão: {nova_versao}")
+        else:
+            logger.info(f"RE-TREINO CONCLUÍDO - Versão {nova_versao} rejeitada, mantendo a atual")
         logger.info("=" * 70)
 
         return {
-            "status": "success",
+            "status": "success" if resultado["status"] == "promovido" else "rejected",
             "nova_versao": nova_versao,
             "amostras_treinadas": total_amostras,
             "metricas": metricas
@@ -105,6 +160,124 @@ def retreinar_modelo_automatico():
         }
 
 
+@celery_app.task(
+    bind=True,
+    name="workers.tasks.corrigir_redacao",
+    acks_late=True,
+    time_limit=settings.CORRECTION_TASK_TIME_LIMIT
+)
+def corrigir_redacao(
+    self,
+    redacao: Dict[str, Any],
+    webhook_url: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Corrige uma redação enviada por POST /correcao/jobs
+
+    Roda no worker de inferência (fila CORRECTION_QUEUE), que mantém o
+    ensemble e o pool de LanguageTool carregados entre tarefas. Com
+    --pool threads, tarefas simultâneas compartilham o mesmo ensemble e o
+    InferenceExecutor do processo.
+
+    Args:
+        redacao: Campos de RedacaoInput (texto, titulo, prompt_id, usuario_id)
+        webhook_url: URL notificada ao concluir ou falhar (opcional)
+
+    Returns:
+        Correção serializada (formato de Correcao)
+    """
+    # Import local: o worker de re-treino não carrega o corrector
+    from app.services.corrector import get_corrector
+    from app.services.inference_executor import FilaInferenciaCheiaError
+
+    job_id = self.request.id
+    logger.info(f"Job de correção {job_id} iniciado")
+
+    try:
+        correcao = _executar_async(get_corrector().corrigir(**redacao))
+    except Exception as e:
+        # Pool de inferência deste worker cheio: devolver à fila, até
+        # CORRECTION_MAX_QUEUE_RETRIES vezes; depois, o job falha (e
+        # notifica o webhook) em vez de circular na fila indefinidamente
+        if (
+            isinstance(e, FilaInferenciaCheiaError)
+            and self.request.retries < settings.CORRECTION_MAX_QUEUE_RETRIES
+        ):
+            raise self.retry(exc=e, countdown=e.retry_after, max_retries=None)
+
+        logger.error(f"❌ Job de correção {job_id} falhou: {str(e)}", exc_info=True)
+        if webhook_url:
+            enviar_webhook.delay(webhook_url, {
+                "job_id": job_id,
+                "status": "falhou",
+                "erro": str(e)
+            })
+        raise
+
+    resultado = json.loads(correcao.json())
+
+    if webhook_url:
+        enviar_webhook.delay(webhook_url, {
+            "job_id": job_id,
+            "status": "concluido",
+            "correcao_id": correcao.id,
+            "redacao_id": correcao.redacao_id,
+            "score_total": correcao.score_total
+        })
+
+    logger.info(f"✓ Job de correção {job_id} concluído - Score: {correcao.score_total}")
+    return resultado
+
+
+@celery_app.task(
+    bind=True,
+    name="workers.tasks.enviar_webhook",
+    max_retries=settings.WEBHOOK_MAX_RETRIES
+)
+def enviar_webhook(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Envia o payload de conclusão de um job para o webhook do cliente
+
+    Com WEBHOOK_SECRET, o corpo é assinado em X-Redator-Signature
+    (sha256=<hmac hex>). Falhas são reenviadas com backoff exponencial.
+    A URL é validada de novo a cada tentativa (o DNS pode ter mudado desde
+    a criação do job) e redirecionamentos não são seguidos.
+    """
+    try:
+        validar_url_webhook(url)
+    except ValueError as e:
+        logger.warning(f"Webhook {url} recusado: {str(e)}")
+        return {"status": "rejected", "erro": str(e)}
+
+    corpo = json.dumps(payload, ensure_ascii=False)
+    headers = {"Content-Type": "application/json"}
+
+    if settings.WEBHOOK_SECRET:
+        assinatura = hmac.new(
+            settings.WEBHOOK_SECRET.encode("utf-8"),
+            corpo.encode("utf-8"),
+            hashlib.sha256
+        ).hexdigest()
+        headers["X-Redator-Signature"] = f"sha256={assinatura}"
+
+    try:
+        response = httpx.post(
+            url,
+            content=corpo.encode("utf-8"),
+            headers=headers,
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+            follow_redirects=False
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        tentativa = self.request.retries + 1
+        logger.warning(f"Webhook {url} falhou (tentativa {tentativa}): {str(e)}")
+        raise self.retry(exc=e, countdown=min(5 * 2 ** self.request.retries, 600))
+
+    logger.info(f"Webhook enviado: {url} - job {payload.get('job_id')}")
+    return {"status": "success", "status_code": response.status_code}
+
+
 @celery_app.task(name="workers.tasks.limpar_cache")
 def limpar_cache():
     """
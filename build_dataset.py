@@ -1,8 +1,10 @@
+import ast
 import logging
 import os
-from typing import Tuple
+from typing import Iterator, List, Optional, Tuple
 
 import pandas as pd
+import pyarrow.parquet as pq
 from pandas import DataFrame
 from sklearn.model_selection import train_test_split
 
@@ -10,6 +12,38 @@ from sklearn.model_selection import train_test_split
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('build_dataset')
 
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extended-corpus')
+SPLITS_PATH = os.path.join(CORPUS_PATH, 'splits')
+SPLITS = ('train', 'dev', 'test')
+
+# Columns stored as Python list literals in the CSV files
+LIST_COLUMNS = ('essay', 'competence')
+COMPETENCE_COLUMNS = ['c1', 'c2', 'c3', 'c4', 'c5']
+
+
+def parse_literal(value: str):
+    """
+    Parses a list literal from the CSV (e.g. "['paragraph 1', ...]") without
+    executing code, unlike eval
+    """
+    return ast.literal_eval(value)
+
+
+def _converters(columns: Optional[List[str]] = None) -> dict:
+    return {c: parse_literal for c in LIST_COLUMNS if columns is None or c in columns}
+
+
+def expand_competences(df_input: DataFrame) -> DataFrame:
+    """
+    Adds the c1..c5 columns from the competence list column
+    :param df_input: data frame with a competence column
+    :return: the same data frame with c1..c5
+    """
+    competences = pd.DataFrame(df_input['competence'].tolist(), index=df_input.index)
+    for i, column in enumerate(COMPETENCE_COLUMNS):
+        df_input[column] = competences[i]
+    return df_input
+
 
 class Corpus:
     """
@@ -31,22 +65,91 @@ class Corpus:
     @staticmethod
     def read_splits(split=None) -> Tuple[DataFrame, DataFrame, DataFrame]:
         """
-        Reads the splits of the corpus
+        Reads the splits of the corpus (Parquet when up to date, CSV otherwise)
         :return: training, development, and testing
         """
-        path = 'extended-corpus/splits'
         if split:
-            return pd.read_csv(os.path.join(path, split), converters={'essay': eval, 'competence': eval})
+            return Corpus.load(os.path.splitext(split)[0])
         else:
-            training = pd.read_csv(os.path.join(path, 'train.csv'), converters={'essay': eval, 'competence': eval})
-            development = pd.read_csv(os.path.join(path, 'dev.csv'), converters={'essay': eval, 'competence': eval})
-            testing = pd.read_csv(os.path.join(path, 'test.csv'), converters={'essay': eval, 'competence': eval})
+            training = Corpus.load('train')
+            development = Corpus.load('dev')
+            testing = Corpus.load('test')
             return training, development, testing
 
     @staticmethod
     def read_corpus(corpus: str) -> DataFrame:
-        path = 'extended-corpus'
-        return pd.read_csv(os.path.join(path, corpus), converters={'essay': eval, 'competence': eval})
+        return pd.read_csv(os.path.join(CORPUS_PATH, corpus), converters=_converters())
+
+    @staticmethod
+    def parquet_path(split: str) -> Optional[str]:
+        """
+        Path of the Parquet version of a split, if it exists and is not older than the CSV
+        :param split: train, dev or test
+        :return: path or None
+        """
+        csv_path = os.path.join(SPLITS_PATH, split + '.csv')
+        parquet_path = os.path.join(SPLITS_PATH, split + '.parquet')
+        if not os.path.exists(parquet_path):
+            return None
+        if os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(parquet_path):
+            return None
+        return parquet_path
+
+    @staticmethod
+    def load(split: str, columns: Optional[List[str]] = None) -> DataFrame:
+        """
+        Reads a split reading only the requested columns
+        :param split: train, dev or test
+        :param columns: columns to read (None = all); c1..c5 are derived from competence
+        :return: data frame with the requested columns
+        """
+        file_columns = None
+        if columns is not None:
+            file_columns = [c for c in columns if c not in COMPETENCE_COLUMNS]
+            if len(file_columns) < len(columns) and 'competence' not in file_columns:
+                file_columns.append('competence')
+
+        parquet_path = Corpus.parquet_path(split)
+        if parquet_path:
+            df = pd.read_parquet(parquet_path, columns=file_columns)
+        else:
+            df = pd.read_csv(os.path.join(SPLITS_PATH, split + '.csv'), usecols=file_columns,
+                             converters=_converters(file_columns))
+
+        if columns is None or any(c in COMPETENCE_COLUMNS for c in columns):
+            if 'competence' in df.columns and not set(COMPETENCE_COLUMNS) <= set(df.columns):
+                df = expand_competences(df)
+
+        return df[columns] if columns is not None else df
+
+    @staticmethod
+    def iter_batches(split: str, columns: Optional[List[str]] = None,
+                     batch_size: int = 1000) -> Iterator[DataFrame]:
+        """
+        Lazily reads a split in batches of rows (requires the Parquet version)
+        :param split: train, dev or test
+        :param columns: columns to read (None = all)
+        :param batch_size: rows per batch
+        :return: iterator of data frames
+        """
+        parquet_path = Corpus.parquet_path(split)
+        if not parquet_path:
+            raise FileNotFoundError('Parquet split not found, run convert_to_parquet: ' + split)
+
+        for batch in pq.ParquetFile(parquet_path).iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+    @staticmethod
+    def convert_to_parquet() -> None:
+        """
+        Converts the CSV splits to Parquet, storing essay and competence as native list columns
+        :return:
+        """
+        for split in SPLITS:
+            csv_path = os.path.join(SPLITS_PATH, split + '.csv')
+            df_input = pd.read_csv(csv_path, converters=_converters())
+            df_input.to_parquet(os.path.join(SPLITS_PATH, split + '.parquet'), index=False)
+            logger.info(split + '.parquet saved in ' + SPLITS_PATH)
 
     @staticmethod
     def save_split(name: str, df_input: DataFrame) -> None:
@@ -56,12 +159,13 @@ class Corpus:
         :param df_input: content of the splits as a data frame
         :return:
         """
-        path = 'extended-corpus/splits/'
+        path = SPLITS_PATH
         if not os.path.exists(path):
             os.mkdir(path)
         df_input.to_csv(os.path.join(path, name+'.csv'), index=False, header=True)
+        df_input.to_parquet(os.path.join(path, name+'.parquet'), index=False)
         # df_input.to_csv('splits/'+name+'.csv', index=False, header=True)
-        logger.info(name + '.csv saved in ' + path)
+        logger.info(name + '.csv and ' + name + '.parquet saved in ' + path)
 
 
 def split_stratified_into_train_val_test(df_input, stratify_colname='y', frac_train=0.7, frac_val=0.15, frac_test=0.15,
@@ -118,7 +222,10 @@ def split_stratified_into_train_val_test(df_input, stratify_colname='y', frac_tr
 
 
 if __name__ == '__main__':
-    Corpus().build_corpus('extended_essay-br.csv')
+    if os.path.exists(os.path.join(SPLITS_PATH, 'train.csv')):
+        Corpus.convert_to_parquet()
+    else:
+        Corpus().build_corpus('extended_essay-br.csv')
     train, valid, test = Corpus().read_splits()
     print(test.head())
     # print(test.loc[1:5, ['essay', 'competence']])
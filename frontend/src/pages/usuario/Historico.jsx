@@ -16,6 +16,8 @@ export default function Historico() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [page, setPage] = useState(0);
+  // Cursor de cada página já visitada (paginação por cursor na API)
+  const [cursores, setCursores] = useState([null]);
   const [searchTerm, setSearchTerm] = useState('');
   const [ordem, setOrdem] = useState('desc');
 
@@ -30,14 +32,20 @@ export default function Historico() {
       setLoading(true);
       setError(null);
 
-      const offset = page * LIMIT;
+      const cursor = cursores[page];
       const response = await axios.get(`${API_BASE_URL}/usuario/correcoes`, {
-        params: { limit: LIMIT, offset, ordem }
+        params: { limit: LIMIT, ordem, ...(cursor ? { cursor } : {}) }
       });
 
       if (response.data.success) {
+        const { pagination: paginacao } = response.data;
         setCorrecoes(response.data.correcoes);
-        setPagination(response.data.pagination);
+        setPagination(paginacao);
+        setCursores(c => {
+          const proximos = c.slice(0, page + 1);
+          if (paginacao.next_cursor) proximos.push(paginacao.next_cursor);
+          return proximos;
+        });
       }
     } catch (err) {
       console.error('Erro ao carregar histórico:', err);
@@ -122,6 +130,7 @@ export default function Historico() {
                 value={ordem}
                 onChange={(e) => {
                   setOrdem(e.target.value);
+                  setCursores([null]);
                   setPage(0);
                 }}
                 className="px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-primary-500 focus:border-transparent"
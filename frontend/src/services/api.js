@@ -64,6 +64,146 @@ export const corrigirRedacao = async (data) => {
   }
 };
 
+/**
+ * Corrige uma redação recebendo cada etapa assim que fica pronta (SSE)
+ *
+ * onEvento(evento, dados) é chamado para: notas, estrutura, gramatica,
+ * feedback, explicacao, concluido e erro. EventSource não aceita POST,
+ * então o stream é lido com fetch.
+ */
+export const corrigirRedacaoStream = async (data, onEvento) => {
+  const token = localStorage.getItem('token');
+  const response = await fetch(`${API_BASE_URL}/correcao/corrigir/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify({
+      texto: data.texto,
+      titulo: data.titulo || null,
+      prompt_id: data.promptId || null,
+      usuario_id: data.usuarioId || null,
+    }),
+  });
+
+  if (!response.ok) {
+    const erro = await response.json().catch(() => ({}));
+    throw new Error(erro.detail || `Erro ${response.status} ao corrigir redação`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    // Eventos são separados por linha em branco
+    let fim;
+    while ((fim = buffer.indexOf('\n\n')) !== -1) {
+      const bloco = buffer.slice(0, fim);
+      buffer = buffer.slice(fim + 2);
+
+      let evento = 'message';
+      let dados = '';
+      for (const linha of bloco.split('\n')) {
+        if (linha.startsWith('event: ')) evento = linha.slice(7);
+        else if (linha.startsWith('data: ')) dados += linha.slice(6);
+      }
+
+      onEvento(evento, dados ? JSON.parse(dados) : null);
+    }
+  }
+};
+
+/**
+ * Corrige as redações de um CSV ou ZIP, chamando onItem(linha) para cada
+ * linha NDJSON: { indice, sucesso, correcao | erro } e, ao final, { resumo }
+ */
+export const corrigirLoteArquivo = async (arquivo, options = {}, onItem) => {
+  const token = localStorage.getItem('token');
+  const form = new FormData();
+  form.append('arquivo', arquivo);
+  if (options.promptId) form.append('prompt_id', options.promptId);
+  if (options.usuarioId) form.append('usuario_id', options.usuarioId);
+
+  const response = await fetch(`${API_BASE_URL}/correcao/corrigir/lote/arquivo`, {
+    method: 'POST',
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+    body: form,
+  });
+
+  if (!response.ok) {
+    const erro = await response.json().catch(() => ({}));
+    throw new Error(erro.detail || `Erro ${response.status} ao corrigir redações`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    let fim;
+    while ((fim = buffer.indexOf('\n')) !== -1) {
+      const linha = buffer.slice(0, fim).trim();
+      buffer = buffer.slice(fim + 1);
+      if (linha) onItem(JSON.parse(linha));
+    }
+  }
+};
+
+/**
+ * Envia uma redação para a fila de correção (retorna o job imediatamente)
+ */
+export const criarJobCorrecao = async (data) => {
+  try {
+    const response = await api.post('/correcao/jobs', {
+      texto: data.texto,
+      titulo: data.titulo || null,
+      prompt_id: data.promptId || null,
+      usuario_id: data.usuarioId || null,
+      webhook_url: data.webhookUrl || null,
+    });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
+/**
+ * Busca o status de um job de correção
+ */
+export const buscarJob = async (jobId) => {
+  try {
+    const response = await api.get(`/correcao/jobs/${jobId}`);
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
+/**
+ * Busca a correção de um job concluído
+ */
+export const buscarResultadoJob = async (jobId) => {
+  try {
+    const response = await api.get(`/correcao/jobs/${jobId}/resultado`);
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
 /**
  * Busca uma correção por ID
  */